@@ -3,6 +3,11 @@ ASGI config for cleantrac_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The ASGI profile serves the traceability and file-streaming endpoints with the
+async views in core.async_views (see cleantrac_project.urls_asgi). Run it with:
+
+    gunicorn cleantrac_project.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +17,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cleantrac_project.settings")
+os.environ.setdefault("DJANGO_ROOT_URLCONF", "cleantrac_project.urls_asgi")
 
 application = get_asgi_application()
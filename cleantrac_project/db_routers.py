@@ -5,9 +5,16 @@ local dev.
 
 Any additional legacy apps that should point at the same database can be added
 to the `app_labels` set below.
+
+`ReplicaRouter` (further down) sends designated reporting reads to an
+optional read replica.
 """
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Optional, Type
-from django.db import models
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models
 
 
 class TraceabilityRouter:  # pylint: disable=too-few-public-methods
@@ -45,3 +52,107 @@ class TraceabilityRouter:  # pylint: disable=too-few-public-methods
         if app_label in self.app_labels:
             return False
         return None
+
+
+# --- Read replica -------------------------------------------------------
+# Reporting and dashboard reads (document generation, waste and recipe
+# summaries, temperature history) can be served by a read replica so they do
+# not compete with the tablets' writes on the primary. Only reads made inside
+# `reporting_reads()` are eligible, and only while the current request has
+# not written: after its first write a request reads from the primary, so it
+# always sees its own changes. ReplicaRoutingMiddleware also pins the same
+# client to the primary for REPLICA_PIN_SECONDS after a write, to cover the
+# follow-up poll arriving before the replica has caught up.
+REPLICA_ALIAS = "replica"
+
+# Writes to these apps (e.g. the database cache table) don't pin reads.
+_UNTRACKED_WRITE_APPS = {"django_cache", "sessions"}
+
+
+class _RoutingState:
+    __slots__ = ("reporting", "wrote", "pinned")
+
+    def __init__(self, pinned: bool = False):
+        self.reporting = 0
+        self.wrote = False
+        self.pinned = pinned
+
+
+_routing: ContextVar[Optional[_RoutingState]] = ContextVar("replica_routing", default=None)
+
+
+def _current_state() -> _RoutingState:
+    state = _routing.get()
+    if state is None:
+        # Outside a request (management commands, shell): one state per context.
+        state = _RoutingState()
+        _routing.set(state)
+    return state
+
+
+def replica_configured() -> bool:
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def request_routing(pinned: bool = False):
+    """
+    Fresh routing state for one request, optionally pinned to the primary from
+    the start. Yields the state so the caller can see whether the request wrote.
+    """
+    state = _RoutingState(pinned)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def reporting_reads():
+    """Let reads in this block go to the replica. Also usable as a decorator."""
+    state = _current_state()
+    state.reporting += 1
+    try:
+        yield
+    finally:
+        state.reporting -= 1
+
+
+def mark_written() -> None:
+    _current_state().wrote = True
+
+
+class ReplicaRouter:  # pylint: disable=too-few-public-methods
+    """Send reads inside `reporting_reads()` to the replica alias, when one is configured."""
+
+    def db_for_read(self, model: Type[models.Model], **hints) -> Optional[str]:
+        if not replica_configured():
+            return None
+        state = _routing.get()
+        if state is None or not state.reporting or state.wrote or state.pinned:
+            return None
+        if model._meta.app_label in TraceabilityRouter.app_labels:  # type: ignore[attr-defined]
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS, REPLICA_ALIAS):
+            return None
+        # Rows written earlier in an open transaction only exist on the primary.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model: Type[models.Model], **hints) -> Optional[str]:
+        if model._meta.app_label not in _UNTRACKED_WRITE_APPS:  # type: ignore[attr-defined]
+            mark_written()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA_ALIAS}:
+            return True
+        return None
+
+    # allow_migrate is left to the other routers: a streaming replica follows
+    # the primary's schema and `migrate` is never run against it, while the
+    # stand-in database used in development and tests needs the same tables.
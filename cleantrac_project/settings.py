@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from dotenv import load_dotenv
 import dj_database_url
@@ -107,6 +108,7 @@ TENANT_DOMAIN_MODEL = "customers.StoreDomain"
 # Database routing for django-tenants
 DATABASE_ROUTERS = [
     'django_tenants.routers.TenantSyncRouter',
+    'cleantrac_project.db_routers.ReplicaRouter',
 ]
 
 # CORS Configuration
@@ -133,15 +135,20 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 MIDDLEWARE = [
+    "core.health.InFlightRequestsMiddleware",
+    "core.slow_queries.SlowQueryMiddleware",  # outside the metrics, which then don't count its writes
+    "core.instrumentation.RequestMetricsMiddleware",  # near the top, so it times everything below
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # CORS middleware - place it high, especially before CommonMiddleware
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.profiling.RequestProfilerMiddleware",  # after auth, so it can tell who asked for a profile
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "core.middleware.AllowIframeForMedia",
+    "core.middleware.ReplicaRoutingMiddleware",
 ]
 
 # ------------------------------------------------------------------
@@ -156,7 +163,31 @@ if DEBUG:
 
 
 
-ROOT_URLCONF = "cleantrac_project.urls"
+# Per-route timing and query counts (core.instrumentation); requests slower
+# than SLOW_REQUEST_MS are logged with their most repeated SQL.
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED", "true").lower() == "true"
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "1000"))
+
+# Slow-query capture (core.slow_queries): statements slower than this are
+# recorded with their EXPLAIN plan in the SlowQuery table. 0 turns it off;
+# superusers can change it at runtime via /api/slow-queries/.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+# Sampling profiler (core.profiling): superusers profile a request with the
+# X-Profile: 1 header or ?__profile=1; REQUEST_PROFILING_SAMPLE_RATE (0-1)
+# additionally profiles that fraction of all requests.
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "true").lower() == "true"
+REQUEST_PROFILING_SAMPLE_RATE = float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0"))
+REQUEST_PROFILING_INTERVAL_MS = float(os.getenv("REQUEST_PROFILING_INTERVAL_MS", "5"))
+REQUEST_PROFILE_DIR = os.getenv("REQUEST_PROFILE_DIR", os.path.join(BASE_DIR, "request-profiles"))
+
+# Memory profiling (core.memory_profiling) of PDF generation and the document
+# ZIP download / bulk upload: peak RSS and top tracemalloc allocations per
+# request. Off by default because tracemalloc slows every allocation.
+MEMORY_PROFILING_ENABLED = os.getenv("MEMORY_PROFILING_ENABLED", "false").lower() == "true"
+
+# The ASGI entry point swaps in cleantrac_project.urls_asgi (async I/O-bound views).
+ROOT_URLCONF = os.getenv("DJANGO_ROOT_URLCONF", "cleantrac_project.urls")
 
 TEMPLATES = [
     {
@@ -180,11 +211,45 @@ WSGI_APPLICATION = "cleantrac_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connection pooling for the PostgreSQL aliases, using Django's native psycopg 3
+# pool. Each worker process keeps one pool per alias, capped at
+# <ALIAS>_POOL_MAX_SIZE connections, and (CONN_HEALTH_CHECKS) checks a
+# connection is alive before handing it out. Pooling replaces persistent
+# connections, so CONN_MAX_AGE must be 0. Without psycopg_pool installed, or
+# with DB_POOL_ENABLED=false, we fall back to persistent connections.
+DB_POOL_ENABLED = (
+    importlib.util.find_spec("psycopg_pool") is not None
+    and os.getenv("DB_POOL_ENABLED", "true").lower() == "true"
+)
+
+
+def _pool_options(prefix):
+    return {
+        "min_size": int(os.getenv(f"{prefix}_POOL_MIN_SIZE", "1")),
+        "max_size": int(os.getenv(f"{prefix}_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv(f"{prefix}_POOL_TIMEOUT", "10")),
+        "max_idle": float(os.getenv(f"{prefix}_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.getenv(f"{prefix}_POOL_MAX_LIFETIME", "1800")),
+    }
+
+
+def _with_pooling(database, prefix):
+    """Add pool OPTIONS to a PostgreSQL DATABASES entry, or persistent connections."""
+    database["CONN_HEALTH_CHECKS"] = True
+    if DB_POOL_ENABLED:
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = _pool_options(prefix)
+    else:
+        database["CONN_MAX_AGE"] = 600
+    return database
+
+
 DATABASES = {
     # CleanTrac primary DB
     "default": (
-        dj_database_url.parse(
-            os.environ["DATABASE_CLEANTRAC_URL"], conn_max_age=600, ssl_require=True
+        _with_pooling(
+            dj_database_url.parse(os.environ["DATABASE_CLEANTRAC_URL"], ssl_require=True),
+            "DEFAULT_DB",
         )
         if os.getenv("DATABASE_CLEANTRAC_URL")
         else {
@@ -194,7 +259,7 @@ DATABASES = {
     ),
 
     # Read-only Traceability database on the same RDS instance
-    "traceability": {
+    "traceability": _with_pooling({
         "ENGINE": "django.db.backends.postgresql",
         "NAME": os.getenv("TRACEABILITY_DB_NAME"),
         "USER": os.getenv("TRACEABILITY_DB_USER"),
@@ -206,14 +271,71 @@ DATABASES = {
             "options": "-c default_transaction_read_only=on",
             "connect_timeout": 5,
         },
-    },
+    }, "TRACEABILITY_DB"),
 }
 
+# Optional read replica for reporting queries (cleantrac_project.db_routers.ReplicaRouter).
+# Without DATABASE_REPLICA_URL, local SQLite development gets a second alias on
+# the same file; the test runner creates a separate database for it, so tests
+# see genuinely separate primary and replica data.
+if os.getenv("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = _with_pooling(
+        dj_database_url.parse(os.environ["DATABASE_REPLICA_URL"], ssl_require=True),
+        "REPLICA_DB",
+    )
+elif DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["replica"] = dict(DATABASES["default"])
+
+# After a write, keep that client's reads on the primary for this long.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+# /api/health/?deep=1 (core.health). Failing a critical check returns 503 so
+# the load balancer stops routing to this instance; other failures report
+# "degraded". Check names are "database:<alias>" and "storage".
+HEALTH_CRITICAL_CHECKS = [
+    name.strip() for name in os.getenv("HEALTH_CRITICAL_CHECKS", "database:default,storage").split(",") if name.strip()
+]
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+
 # Validate that required env vars for the traceability DB are present
 _required_keys = ["NAME", "USER", "PASSWORD", "HOST"]
 if not all(DATABASES["traceability"][k] for k in _required_keys):
     raise ValueError("Missing TRACEABILITY_DB_* environment variables")
 
+# Cache shared by every gunicorn worker. CACHE_BACKEND picks the store:
+#   file  (default) - files under CACHE_DIR, shared by workers on one host
+#   db    - the "cleantrac_cache" table; run `manage.py createcachetable` once
+#   redis - REDIS_URL; requires the `redis` package
+#   locmem - per-process memory, for tests only
+# core.caching.make_key prefixes every key with the tenant schema.
+_cache_backend = os.getenv("CACHE_BACKEND", "file").lower()
+if _cache_backend == "redis":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    }
+elif _cache_backend == "db":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cleantrac_cache",
+    }
+elif _cache_backend == "locmem":
+    _default_cache = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+else:
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / ".cache")),
+    }
+CACHES = {
+    "default": {
+        **_default_cache,
+        "KEY_PREFIX": "cleantrac",
+        "KEY_FUNCTION": "core.caching.make_key",
+        "TIMEOUT": 300,
+    },
+}
+
 # Route traceability app models to the read-only DB
 
 
@@ -269,7 +391,7 @@ LOGIN_REDIRECT_URL = '/api/'  # Redirect to API root after login
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.ProfileTokenAuthentication',  # TokenAuthentication + profile in one query
         'rest_framework.authentication.SessionAuthentication',  # For browsable API and Django Admin
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -277,6 +399,11 @@ REST_FRAMEWORK = {
     )
 }
 
+# Maximum concurrent recipe production tasks per department. Unset (None) means
+# unlimited; staff double-booking is always rejected.
+_capacity = os.getenv('PRODUCTION_DEPARTMENT_CAPACITY')
+PRODUCTION_DEPARTMENT_CAPACITY = int(_capacity) if _capacity else None
+
 # Optional: If you want to allow all origins (less secure, use for quick testing only)
 # CORS_ALLOW_ALL_ORIGINS = True
 
@@ -0,0 +1,24 @@
+"""
+URL configuration for the ASGI serving profile.
+
+Routes the traceability-backed and file-streaming endpoints to the async
+views in core.async_views (same paths, same responses) and serves the change
+feed as a server-sent events stream, then falls through to the regular
+URLconf (where the change feed is a short poll) for everything else. Selected by cleantrac_project.asgi
+through the DJANGO_ROOT_URLCONF environment variable.
+"""
+
+from django.urls import path
+
+from core import async_views
+from core.views import ChangeFeedView
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/receiving-records/', async_views.receiving_records),
+    path('api/receiving-records/<str:pk>/', async_views.receiving_record_detail),
+    path('api/documents/bulk-download/', async_views.documents_bulk_download),
+    path('api/events/', ChangeFeedView.as_view(stream=True), name='change-feed'),
+    *wsgi_urlpatterns,
+]
@@ -5,11 +5,11 @@ from .models import (
     Department, UserProfile, CleaningItem, TaskInstance, CompletionLog,
     AreaUnit, Thermometer, ThermometerVerificationRecord, 
     ThermometerVerificationAssignment, TemperatureCheckAssignment, TemperatureLog,
-    Folder, Document, DocumentTemplate, GeneratedDocument, Supplier
+    Folder, Document, DocumentTemplate, GeneratedDocument, Supplier, CommandRun, SlowQuery
 )
 from .recipe_models import (
     Recipe, RecipeIngredient, RecipeVersion, ProductionSchedule,
-    ProductionRecord, InventoryItem, InventoryTransaction, WasteRecord,
+    ProductionRecord, InventoryItem, InventoryTransaction, InventorySnapshot, WasteRecord,
     RecipeProductionTask
 )
 
@@ -148,10 +148,26 @@ class GeneratedDocumentAdmin(admin.ModelAdmin):
     list_filter = ('department', 'status', 'created_at')
     search_fields = ('template__name', 'department__name', 'generated_by__username')
     date_hierarchy = 'created_at'
-    readonly_fields = ('parameters',)
+    readonly_fields = ('parameters', 'memory_profile')
 
 admin.site.register(GeneratedDocument, GeneratedDocumentAdmin)
 
+class CommandRunAdmin(admin.ModelAdmin):
+    list_display = ('command', 'status', 'started_at', 'duration_seconds', 'rows')
+    list_filter = ('command', 'status', 'started_at')
+    date_hierarchy = 'started_at'
+    readonly_fields = ('command', 'status', 'started_at', 'duration_seconds', 'rows', 'summary')
+
+admin.site.register(CommandRun, CommandRunAdmin)
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('route', 'caller', 'alias', 'count', 'total_ms', 'max_ms', 'last_seen')
+    list_filter = ('alias', 'route')
+    search_fields = ('fingerprint', 'caller', 'route')
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
+
 @admin.register(ReceivingRecord)
 class ReceivingRecordAdmin(admin.ModelAdmin):
     """Read-only admin for inventory rows imported from the external traceability DB.
@@ -289,6 +305,14 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
 
 admin.site.register(InventoryTransaction, InventoryTransactionAdmin)
 
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ('inventory_item', 'department', 'snapshot_date', 'closing_stock')
+    list_filter = ('department', 'snapshot_date')
+    search_fields = ('inventory_item__ingredient_name', 'inventory_item__ingredient_code')
+    date_hierarchy = 'snapshot_date'
+
+admin.site.register(InventorySnapshot, InventorySnapshotAdmin)
+
 class WasteRecordAdmin(admin.ModelAdmin):
     list_display = ('department', 'recipe', 'inventory_item', 'quantity', 'unit', 'reason', 'cost', 'recorded_at')
     list_filter = ('department', 'reason', 'recorded_at')
@@ -7,3 +7,8 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+
+        from core import instrumentation, slow_queries
+        connection_created.connect(slow_queries.install, dispatch_uid='core.slow_queries.install')
+        connection_created.connect(instrumentation.install, dispatch_uid='core.instrumentation.install')
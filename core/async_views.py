@@ -0,0 +1,160 @@
+"""
+Async versions of the I/O-bound endpoints, for the ASGI serving profile.
+
+These views spend most of their time waiting on the remote traceability
+database or on file storage. Under ASGI (cleantrac_project.asgi, which loads
+cleantrac_project.urls_asgi) they are mounted over the sync DRF routes with
+the same paths and the same response bodies, so one process can overlap many
+slow reads instead of parking a gunicorn worker on each. The ORM and storage
+calls still run in Django's per-request sync thread; the event loop stays free.
+"""
+import json
+import shutil
+import tempfile
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+from . import memory_profiling
+from .models import Document, GeneratedDocument, ReceivingRecord
+from .serializers import ReceivingRecordSerializer
+from .views import ZIP_SPOOL_BYTES
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+@sync_to_async
+def _authenticate(request):
+    """
+    The user for *request* via the REST_FRAMEWORK authentication classes,
+    or None. Session users on unsafe methods must pass the CSRF check, as
+    they would on the DRF views.
+    """
+    drf_request = Request(request, authenticators=[cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+def _unauthorized():
+    return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+
+def _json(data, **kwargs):
+    # DRF's encoder handles the Decimal and date values serializers return.
+    return JsonResponse(data, encoder=encoders.JSONEncoder, safe=False, **kwargs)
+
+
+async def _stream_file(field_file):
+    """Yield a stored file in chunks without loading it into memory."""
+    handle = await sync_to_async(field_file.open)('rb')
+    try:
+        while True:
+            chunk = await sync_to_async(handle.read)(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(handle.close)()
+
+
+def _file_response(field_file, filename):
+    response = StreamingHttpResponse(_stream_file(field_file), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_GET
+async def receiving_records(request):
+    """Async GET /api/receiving-records/ (same body as ReceivingRecordViewSet.list)."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    # Resolving the profile queries the database, so not on the event loop.
+    scoped = await sync_to_async(ReceivingRecord.objects.for_user)(user, request)
+    records = [record async for record in scoped]
+    data = await sync_to_async(lambda: ReceivingRecordSerializer(records, many=True).data)()
+    return _json(data)
+
+
+@require_GET
+async def receiving_record_detail(request, pk):
+    """Async GET /api/receiving-records/<pk>/."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    scoped = await sync_to_async(ReceivingRecord.objects.for_user)(user, request)
+    record = await scoped.filter(pk=pk).afirst()
+    if record is None:
+        return _json({"detail": "Not found."}, status=404)
+    data = await sync_to_async(lambda: ReceivingRecordSerializer(record).data)()
+    return _json(data)
+
+
+@require_GET
+async def document_download(request, pk):
+    """Stream one uploaded document's file."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    document = await Document.objects.filter(pk=pk).afirst()
+    if document is None or not document.file:
+        raise Http404
+    return _file_response(document.file, document.file.name.rsplit('/', 1)[-1])
+
+
+@require_GET
+async def generated_document_download(request, pk):
+    """Stream a generated report the user's department may see."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    scoped = await sync_to_async(GeneratedDocument.objects.for_user)(user)
+    document = await scoped.filter(pk=pk).afirst()
+    if document is None or not document.generated_file:
+        raise Http404
+    return _file_response(document.generated_file, document.generated_file.name.rsplit('/', 1)[-1])
+
+
+@csrf_exempt  # checked in _authenticate for session users, like DRF
+@require_POST
+async def documents_bulk_download(request):
+    """Async POST /api/documents/bulk-download/: ZIP of the requested documents."""
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized()
+    try:
+        ids = json.loads(request.body or b'{}').get('ids', [])
+    except (ValueError, AttributeError):
+        ids = []
+    if not isinstance(ids, list) or not ids:
+        return _json({'detail': 'No document ids provided'}, status=400)
+    documents = [doc async for doc in Document.objects.filter(id__in=ids)]
+    if not documents:
+        return _json({'detail': 'No documents found'}, status=404)
+
+    def build_zip():
+        # Same chunked copy as DocumentViewSet.bulk_download: the archive
+        # spills to disk past ZIP_SPOOL_BYTES instead of growing in memory.
+        with memory_profiling.maybe_profile() as profiler:
+            buffer = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES)
+            with ZipFile(buffer, 'w', ZIP_DEFLATED) as zf:
+                for doc in documents:
+                    filename = doc.file.name.split('/', 1)[-1]
+                    with doc.file.open('rb') as source, zf.open(filename, 'w', force_zip64=True) as target:
+                        shutil.copyfileobj(source, target)
+            buffer.seek(0)
+        return buffer, profiler
+
+    buffer, profiler = await sync_to_async(build_zip)()
+    response = FileResponse(buffer, as_attachment=True, filename='documents.zip', content_type='application/zip')
+    return await sync_to_async(memory_profiling.attach_profile)(request, response, profiler, user=user)
@@ -0,0 +1,89 @@
+"""
+Request-scoped authorization context.
+
+Permission classes and get_queryset methods all need the same facts about
+the requesting user: their profile, role and department, and for some
+endpoints whether they hold an active thermometer verification assignment.
+AuthContext loads those once per request (profile with select_related) and
+caches them on the underlying HttpRequest, so DRF's Request wrapper, the
+permission classes and the view all share one copy.
+"""
+from functools import cached_property
+
+from .models import ThermometerVerificationAssignment, UserProfile
+
+_REQUEST_ATTR = '_cleantrac_auth_context'
+
+
+class AuthContext:
+    """What the current user is allowed to see, resolved lazily and only once."""
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = bool(user and user.is_authenticated)
+        self.is_superuser = self.is_authenticated and user.is_superuser
+
+    @cached_property
+    def profile(self):
+        if not self.is_authenticated:
+            return None
+        if 'profile' in self.user._state.fields_cache:
+            # Already loaded, e.g. by ProfileTokenAuthentication's select_related.
+            return self.user._state.fields_cache['profile']
+        profile = (
+            UserProfile.objects.select_related('department')
+            .filter(user_id=self.user.pk)
+            .first()
+        )
+        if profile is not None:
+            # Prime the reverse one-to-one cache so remaining `user.profile`
+            # lookups reuse this row instead of querying again.
+            self.user.profile = profile
+        return profile
+
+    @property
+    def role(self):
+        return self.profile.role if self.profile else None
+
+    @property
+    def department(self):
+        return self.profile.department if self.profile else None
+
+    @property
+    def department_id(self):
+        return self.profile.department_id if self.profile else None
+
+    @property
+    def is_manager(self):
+        return self.role == UserProfile.ROLE_MANAGER
+
+    @property
+    def is_staff_member(self):
+        return self.role == UserProfile.ROLE_STAFF
+
+    def in_department(self, department):
+        """True if *department* (instance or ID) is the user's department."""
+        if department is None or self.department_id is None:
+            return False
+        department_id = getattr(department, 'pk', department)
+        return department_id == self.department_id
+
+    @cached_property
+    def has_thermometer_verification_assignment(self):
+        if not self.is_authenticated or self.department_id is None:
+            return False
+        return ThermometerVerificationAssignment.objects.filter(
+            staff_member_id=self.user.pk,
+            department_id=self.department_id,
+            is_active=True,
+        ).exists()
+
+
+def get_auth_context(request):
+    """Return the AuthContext for *request*, building it on first use."""
+    http_request = getattr(request, '_request', request)
+    context = getattr(http_request, _REQUEST_ATTR, None)
+    if context is None or context.user is not request.user:
+        context = AuthContext(request.user)
+        setattr(http_request, _REQUEST_ATTR, context)
+    return context
@@ -0,0 +1,36 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class ProfileTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that loads the user's profile and department in the
+    same query as the token, so the request's AuthContext starts warm.
+    """
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user__profile__department').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+
+class QueryStringTokenAuthentication(ProfileTokenAuthentication):
+    """
+    Token passed as ``?token=`` for clients that cannot set headers, i.e. the
+    browser EventSource used by the change feed. Only enable it on streaming
+    endpoints: query strings end up in access logs.
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get('token')
+        if not key:
+            return None
+        return self.authenticate_credentials(key)
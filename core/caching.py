@@ -0,0 +1,177 @@
+"""
+Shared cache helpers.
+
+settings.CACHES points every worker at one backend (file-based by default,
+database or Redis via CACHE_BACKEND) and uses `make_key` as its KEY_FUNCTION,
+so every key is prefixed with the current django-tenants schema and callers
+never build tenant-aware keys by hand.
+
+Cached values are grouped into namespaces. Each namespace has a version
+number that is part of every key stored under it; saving or deleting any
+model registered for the namespace bumps the version once the write commits,
+which retires all of its entries at once without having to enumerate keys.
+Hits and misses are counted per namespace for the cache stats endpoint.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .auth_context import get_auth_context
+
+# model class -> namespaces to invalidate when one of its rows changes
+_dependents = defaultdict(set)
+_namespaces = set()
+_schema_override = ContextVar('cache_schema_override', default=None)
+
+
+def current_schema():
+    return _schema_override.get() or getattr(connection, 'schema_name', None) or 'public'
+
+
+def make_key(key, key_prefix, version):
+    """KEY_FUNCTION for CACHES: prefix keys with the active tenant schema."""
+    return f'{current_schema()}:{key_prefix}:{version}:{key}'
+
+
+@contextmanager
+def tenant_keys(schema):
+    """
+    Build keys for *schema* regardless of the connection's current schema, for
+    code running outside the request that selected the tenant (e.g. a
+    streaming response body).
+    """
+    token = _schema_override.set(schema)
+    try:
+        yield
+    finally:
+        _schema_override.reset(token)
+
+
+def register(namespace, *models):
+    """Invalidate *namespace* whenever an instance of one of *models* is saved or deleted."""
+    _namespaces.add(namespace)
+    for model in models:
+        _dependents[model].add(namespace)
+        post_save.connect(_invalidate_after_commit, sender=model)
+        post_delete.connect(_invalidate_after_commit, sender=model)
+
+
+def _invalidate_after_commit(sender, **kwargs):
+    # Invalidating before the commit would let a concurrent request re-cache
+    # the rows as they were before it.
+    schema = current_schema()
+
+    def invalidate():
+        with tenant_keys(schema):
+            invalidate_for_model(sender)
+
+    transaction.on_commit(invalidate)
+
+
+def namespaces():
+    return sorted(_namespaces)
+
+
+def _incr(key, initial=1):
+    # incr is atomic on Redis; on the file and database backends concurrent
+    # bumps can collapse into one, which is fine for versions and counters.
+    if not cache.add(key, initial, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, initial, None)
+
+
+def namespace_version(namespace):
+    return cache.get_or_set(f'ns:{namespace}:version', 1, None)
+
+
+def invalidate(namespace):
+    """Retire every entry cached under *namespace* for the current tenant."""
+    # A missing version reads as 1, so start a fresh counter at 2.
+    _incr(f'ns:{namespace}:version', initial=2)
+
+
+def invalidate_for_model(model):
+    for namespace in _dependents.get(model, ()):
+        invalidate(namespace)
+
+
+def get_or_compute(namespace, key, compute, timeout=300):
+    """Return the cached value for *key* in *namespace*, computing and storing it on a miss."""
+    full_key = f'ns:{namespace}:v{namespace_version(namespace)}:{key}'
+    value = cache.get(full_key)
+    if value is not None:
+        _incr(f'ns:{namespace}:hits')
+        return value
+    _incr(f'ns:{namespace}:misses')
+    value = compute()
+    if value is not None:
+        cache.set(full_key, value, timeout)
+    return value
+
+
+def stats():
+    """Hit/miss counts and hit rate per namespace for the current tenant."""
+    counters = cache.get_many(
+        [f'ns:{ns}:{kind}' for ns in _namespaces for kind in ('hits', 'misses')]
+    )
+    result = {}
+    for namespace in namespaces():
+        hits = counters.get(f'ns:{namespace}:hits', 0)
+        misses = counters.get(f'ns:{namespace}:misses', 0)
+        result[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return result
+
+
+def reset_stats():
+    cache.delete_many([f'ns:{ns}:{kind}' for ns in _namespaces for kind in ('hits', 'misses')])
+
+
+def cache_response(namespace, depends_on=(), timeout=300):
+    """
+    Cache a read-only viewset action's response data.
+
+    The key covers the request path and query string, the caller's scope
+    (superuser, or their department) and today's local date, so endpoints
+    that default to "today" roll over at midnight. Only 200 responses are
+    stored. Saving or deleting any model in *depends_on* invalidates the
+    namespace.
+    """
+    register(namespace, *depends_on)
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return view_method(self, request, *args, **kwargs)
+            auth = get_auth_context(request)
+            scope = 'all' if auth.is_superuser else f'd{auth.department_id}:{auth.role}'
+            key = f'{scope}:{timezone.localdate()}:{request.get_full_path()}'
+            uncached = []
+
+            def compute():
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    # Don't cache errors; hand the response back untouched.
+                    uncached.append(response)
+                    return None
+                return response.data
+
+            data = get_or_compute(namespace, key, compute, timeout)
+            if uncached:
+                return uncached[0]
+            return Response(data)
+        return wrapper
+    return decorator
@@ -0,0 +1,211 @@
+"""
+Timed management commands for imports and other bulk jobs.
+
+Subclass TimedCommand instead of BaseCommand, wrap each stage of the work in
+``self.phase(name)`` and iterate rows through ``self.progress()``:
+
+    class Command(TimedCommand):
+        def handle(self, *args, **options):
+            with self.phase("import"):
+                for row in self.progress(rows, total=len(rows)):
+                    ...
+                    self.count("created")
+                    self.log(f"Created {row}")
+
+Every run then gets:
+
+* a progress bar with rows/sec on stderr when it is a terminal;
+* ``--quiet``, which drops the per-row ``self.log()`` lines (warnings from
+  ``self.warn()`` and the final summary are still printed);
+* a table of per-phase rows, seconds and rows/sec at the end;
+* a JSON summary (command, arguments, phases, counters, error) stored as a
+  CommandRun row for trending, and written to a file with ``--summary-json``.
+"""
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.utils import timezone
+
+PROGRESS_INTERVAL = 0.2
+BAR_WIDTH = 30
+
+# BaseCommand's own options; not worth storing with every run.
+_BASE_OPTIONS = {
+    "verbosity", "settings", "pythonpath", "traceback", "no_color", "force_color",
+    "skip_checks", "stdout", "stderr", "quiet", "summary_json",
+}
+
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.started = time.perf_counter()
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "rows": self.rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds, 1) if self.rows and self.seconds else None,
+        }
+
+
+class TimedCommand(BaseCommand):
+    """BaseCommand with phases, progress, --quiet and a persisted run summary; see the module docstring."""
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument("--quiet", action="store_true",
+                            help="Don't print a line per row; only warnings and the summary.")
+        parser.add_argument("--summary-json", metavar="PATH",
+                            help="Also write the run summary as JSON to PATH.")
+        return parser
+
+    def execute(self, *args, **options):
+        self.quiet = options.get("quiet", False)
+        self._verbosity = options.get("verbosity", 1)
+        self._phases = []
+        self._current = None
+        self.counters = Counter()
+        self._bar_visible = False
+        started_at = timezone.now()
+        started = time.perf_counter()
+        error = None
+        try:
+            return super().execute(*args, **options)
+        except BaseException as exc:  # Ctrl-C runs are recorded as failed too
+            error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            summary = self._summary(options, started_at, time.perf_counter() - started, error)
+            self._clear_bar()
+            if self._verbosity > 0:
+                self._print_summary(summary)
+            self._save(summary, started_at, options.get("summary_json"))
+
+    # -- API for subclasses ---------------------------------------------
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one phase of the run."""
+        outer = self._current
+        self._current = _Phase(name)
+        self._phases.append(self._current)
+        try:
+            yield self._current
+        finally:
+            self._current.seconds = time.perf_counter() - self._current.started
+            self._clear_bar()
+            self._current = outer
+
+    def progress(self, iterable, total=None):
+        """
+        Yield from *iterable*, counting rows in the current phase and drawing a
+        progress bar. Rows and rows/sec accumulate over every progress() call
+        in the phase; *total*, if given, is the phase's expected row count.
+        """
+        if self._current is None:
+            with self.phase("rows"):
+                yield from self.progress(iterable, total)
+            return
+        phase = self._current
+        show = self._verbosity > 0 and self.stderr.isatty()
+        last_drawn = time.perf_counter()
+        for item in iterable:
+            yield item
+            phase.rows += 1
+            if show:
+                now = time.perf_counter()
+                if now - last_drawn >= PROGRESS_INTERVAL:
+                    self._draw_bar(phase.name, phase.rows, total, now - phase.started)
+                    last_drawn = now
+        if show and phase.rows:
+            self._draw_bar(phase.name, phase.rows, total, time.perf_counter() - phase.started)
+
+    def count(self, counter, n=1):
+        """Add *n* to a named counter (created, updated, skipped...); totals are in self.counters and the summary."""
+        self.counters[counter] += n
+
+    def log(self, message, style_func=None):
+        """Per-row output: dropped by --quiet and at verbosity 0."""
+        if self.quiet or self._verbosity < 1:
+            return
+        self._clear_bar()
+        self.stdout.write(message, style_func)
+
+    def warn(self, message):
+        """A warning that --quiet does not suppress."""
+        self._clear_bar()
+        self.stdout.write(self.style.WARNING(message))
+
+    # -- internals ------------------------------------------------------
+
+    def _draw_bar(self, name, rows, total, elapsed):
+        rate = rows / elapsed if elapsed else 0.0
+        if total:
+            done = min(rows / total, 1.0)
+            filled = int(BAR_WIDTH * done)
+            eta = f"  ETA {(total - rows) / rate:.0f}s" if rate and rows < total else ""
+            line = (f"{name} [{'#' * filled}{'.' * (BAR_WIDTH - filled)}] "
+                    f"{rows}/{total} {done:4.0%}  {rate:,.0f} rows/s{eta}")
+        else:
+            line = f"{name} {rows} rows  {rate:,.0f} rows/s"
+        self.stderr.write(f"\r{line}\x1b[K", style_func=str, ending="")  # not styled as an error
+        self.stderr.flush()
+        self._bar_visible = True
+
+    def _clear_bar(self):
+        if self._bar_visible:
+            self.stderr.write("\r\x1b[K", style_func=str, ending="")
+            self.stderr.flush()
+            self._bar_visible = False
+
+    def _summary(self, options, started_at, seconds, error):
+        arguments = {key: value for key, value in options.items() if key not in _BASE_OPTIONS}
+        return {
+            "command": self.__module__.rsplit(".", 1)[-1],
+            "status": "failed" if error else "succeeded",
+            "started_at": started_at.isoformat(),
+            "duration_seconds": round(seconds, 3),
+            "rows": sum(phase.rows for phase in self._phases),
+            "arguments": json.loads(json.dumps(arguments, default=str)),
+            "phases": [phase.as_dict() for phase in self._phases],
+            "counters": dict(self.counters),
+            "error": error,
+        }
+
+    def _print_summary(self, summary):
+        if not summary["phases"]:
+            return
+        self.stdout.write(f"\n{'phase':<28} {'rows':>9} {'seconds':>9} {'rows/s':>10}")
+        for phase in summary["phases"]:
+            rate = phase["rows_per_second"]
+            self.stdout.write(f"{phase['name']:<28} {phase['rows']:>9} {phase['seconds']:>9.2f} "
+                              f"{rate if rate is not None else '-':>10}")
+        self.stdout.write(f"{'total':<28} {summary['rows']:>9} {summary['duration_seconds']:>9.2f}")
+        if summary["counters"]:
+            self.stdout.write(", ".join(f"{name}: {value}" for name, value in summary["counters"].items()))
+
+    def _save(self, summary, started_at, path):
+        from core.models import CommandRun
+
+        if path:
+            with open(path, "w") as handle:
+                json.dump(summary, handle, indent=2)
+        try:
+            CommandRun.objects.create(
+                command=summary["command"],
+                status=summary["status"],
+                started_at=started_at,
+                duration_seconds=summary["duration_seconds"],
+                rows=summary["rows"],
+                summary=summary,
+            )
+        except DatabaseError as exc:  # e.g. migrations not applied yet; don't fail the import for it
+            self.stderr.write(f"Could not record the run in CommandRun: {exc}")
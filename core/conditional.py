@@ -0,0 +1,135 @@
+"""
+Conditional GET (ETag / Last-Modified) for endpoints that tablets poll.
+
+Once a save or delete of a tracked model commits, it stamps a change
+watermark (the time of the write) in the shared cache, per tenant (via core.caching.make_key) and
+per department. A polled endpoint derives its ETag from the watermarks of the
+tables it reads, so deciding that nothing changed costs one cache lookup and
+none of the endpoint's own queries; an unchanged poll gets a bare 304.
+
+Writes whose department is unknown, and bulk writes that bypass signals
+(call `touch` explicitly), stamp the "unscoped" watermark, which every
+department's readers also consult. Superusers read the tenant-wide watermark.
+Watermarks keep sub-second precision, so If-Modified-Since (whole seconds)
+only short-circuits for dates after the last write; clients should send
+If-None-Match.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import caching
+from .auth_context import get_auth_context
+
+_ALL = 'all'
+_UNSCOPED = 'unscoped'
+_tracked = set()
+
+
+def _key(model, scope):
+    return f'watermark:{model._meta.db_table}:{scope}'
+
+
+def track(*models):
+    """Stamp the watermark of each of *models* whenever one of its rows is saved or deleted."""
+    for model in models:
+        _tracked.add(model)
+        post_save.connect(_touch_after_commit, sender=model)
+        post_delete.connect(_touch_after_commit, sender=model)
+
+
+def _touch_after_commit(sender, instance, **kwargs):
+    # Stamping before the commit would let a poll in between pin an ETag to
+    # the old rows.
+    schema = caching.current_schema()
+
+    def stamp():
+        with caching.tenant_keys(schema):
+            touch_instance(sender, instance)
+
+    transaction.on_commit(stamp)
+
+
+def touch(model, department_id=None):
+    """Record that rows of *model* in *department_id* (None: unknown/any) just changed."""
+    now = time.time()
+    scope = department_id if department_id is not None else _UNSCOPED
+    cache.set_many({_key(model, _ALL): now, _key(model, scope): now}, None)
+
+
+def touch_instance(model, instance):
+    if model in _tracked:
+        touch(model, getattr(instance, 'department_id', None))
+
+
+def watermark(models, department_id=None, all_departments=False):
+    """Latest change time across *models* for one department (or the whole tenant)."""
+    scopes = [_ALL] if all_departments else [department_id, _UNSCOPED]
+    keys = [_key(model, scope) for model in models for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # Nothing recorded yet (cold or evicted cache): start the clock now,
+        # which costs clients one full response instead of risking a stale 304.
+        now = time.time()
+        cache.set_many({key: now for key in missing}, None)
+        found.update(dict.fromkeys(missing, now))
+    return max(found.values())
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def conditional_response(*models):
+    """
+    Add ETag/Last-Modified to a GET viewset action and answer 304 when the
+    client's copy is current. The ETag covers the watermarks of *models*, the
+    caller and their scope, the full request path and today's local date.
+    """
+    track(*models)
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return view_method(self, request, *args, **kwargs)
+            auth = get_auth_context(request)
+            changed_at = watermark(models, auth.department_id, all_departments=auth.is_superuser)
+            fingerprint = (
+                f'{request.get_full_path()}|{request.user.pk}|{auth.role}|{auth.department_id}|'
+                f'{timezone.localdate()}|{changed_at!r}'
+            )
+            etag = '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match is not None:
+                not_modified = _etag_matches(if_none_match, etag)
+            else:
+                since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+                not_modified = since is not None and changed_at <= since
+
+            if not_modified:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(changed_at)
+            # Clients may keep the copy but must revalidate before reusing it.
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,31 @@
+"""
+Connection pool metrics for the database aliases.
+
+Pools are per worker process, so the numbers describe the process that
+served the request (its PID is included); poll a few times to sample others.
+"""
+import os
+
+from django.db import connections
+
+
+def pool_stats():
+    """Per-alias pool configuration and psycopg_pool statistics."""
+    result = {'pid': os.getpid(), 'databases': {}}
+    for alias in connections:
+        wrapper = connections[alias]
+        entry = {
+            'vendor': wrapper.vendor,
+            'conn_max_age': wrapper.settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': wrapper.settings_dict.get('CONN_HEALTH_CHECKS'),
+            'pooled': False,
+        }
+        pool_options = wrapper.settings_dict.get('OPTIONS', {}).get('pool')
+        if wrapper.vendor == 'postgresql' and pool_options:
+            entry['pooled'] = True
+            entry['config'] = pool_options if isinstance(pool_options, dict) else {}
+            # Django creates the pool lazily on first use; don't open one just to report on it.
+            pool = wrapper._connection_pools.get(alias) if hasattr(wrapper, '_connection_pools') else None
+            entry['stats'] = pool.get_stats() if pool is not None else None
+        result['databases'][alias] = entry
+    return result
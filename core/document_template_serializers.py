@@ -64,8 +64,9 @@ class GeneratedDocumentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'template_id', 'template_name', 'generated_file',
             'generated_by_id', 'generated_by_username', 'department_id', 'department_name',
-            'status', 'status_display', 'error_message', 'parameters', 'created_at'
+            'status', 'status_display', 'error_message', 'parameters', 'memory_profile', 'created_at'
         ]
+        read_only_fields = ['memory_profile']
     
     def create(self, validated_data):
         # If generated_by is not provided, use the requesting user
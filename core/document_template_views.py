@@ -10,20 +10,13 @@ import io
 from datetime import datetime, timedelta
 import json
 import traceback
-import pandas as pd
 import os
 
-# ReportLab Imports
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, SimpleDocTemplate, PageBreak, Frame, PageTemplate, NextPageTemplate
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.lib import colors
-
 from .models import DocumentTemplate, GeneratedDocument, TaskInstance, ThermometerVerificationRecord, TemperatureLog
 from .document_template_serializers import DocumentTemplateSerializer, GeneratedDocumentSerializer
 from .permissions import IsManagerForWriteOrAuthenticatedReadOnly
+from . import memory_profiling
+from cleantrac_project.db_routers import reporting_reads
 
 class DocumentTemplateViewSet(viewsets.ModelViewSet):
     """
@@ -34,29 +27,14 @@ class DocumentTemplateViewSet(viewsets.ModelViewSet):
     permission_classes = [IsManagerForWriteOrAuthenticatedReadOnly]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return DocumentTemplate.objects.none()
-            
+        # Managers and staff can only see templates for their department
+        queryset = DocumentTemplate.objects.for_user(self.request.user, self.request)
+        
         # Filter by template_type if provided
         template_type = self.request.query_params.get('template_type', None)
-        queryset = DocumentTemplate.objects.all()
-        
         if template_type:
             queryset = queryset.filter(template_type=template_type)
-            
-        # Superusers can see all templates
-        if user.is_superuser:
-            return queryset
-        
-        # Managers and staff can only see templates for their department
-        try:
-            if user.profile.department:
-                return queryset.filter(department=user.profile.department)
-            else:
-                return DocumentTemplate.objects.none()
-        except:
-            return DocumentTemplate.objects.none()
+        return queryset
     
     def perform_create(self, serializer):
         # Set created_by to the requesting user
@@ -196,9 +174,7 @@ class DocumentTemplateViewSet(viewsets.ModelViewSet):
             end_date = datetime.strptime(parameters.get('endDate'), '%Y-%m-%d').date()
             
             # Check if there are any temperature logs in the date range
-            count = TemperatureLog.objects.filter(
-                log_datetime__date__gte=start_date,
-                log_datetime__date__lte=end_date,
+            count = TemperatureLog.objects.on_dates(start_date, end_date).filter(
                 department=template.department
             ).count()
             
@@ -216,9 +192,7 @@ class DocumentTemplateViewSet(viewsets.ModelViewSet):
             end_date = datetime.strptime(parameters.get('endDate'), '%Y-%m-%d').date()
             
             # Get temperature logs for the specified date range and department
-            logs = TemperatureLog.objects.filter(
-                log_datetime__date__gte=start_date,
-                log_datetime__date__lte=end_date,
+            logs = TemperatureLog.objects.on_dates(start_date, end_date).filter(
                 department=template.department
             ).select_related(
                 'area_unit',
@@ -409,6 +383,7 @@ class DocumentTemplateViewSet(viewsets.ModelViewSet):
             return []
 
 
+@reporting_reads()
 def generate_document_file(template, parameters, user):
     """
     Prepare data for a document file based on the template and parameters.
@@ -466,9 +441,7 @@ def generate_document_file(template, parameters, user):
         if template.template_type == 'temperature' and parameters.get('includeTemperatureLogs', True):
             date_format = parameters.get('dateFormat', '%Y-%m-%d') # Keep for potential display formatting
             
-            logs = TemperatureLog.objects.filter(
-                log_datetime__date__gte=start_date,
-                log_datetime__date__lte=end_date,
+            logs = TemperatureLog.objects.on_dates(start_date, end_date).filter(
                 department=template.department
             ).select_related(
                 'area_unit',
@@ -526,6 +499,15 @@ def generate_document_file(template, parameters, user):
             })
 
         # --- PDF Generation using ReportLab ---
+        # Imported here rather than at module level: ReportLab is only needed
+        # for this path and every worker would otherwise load it on boot.
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, SimpleDocTemplate, PageBreak, Frame, PageTemplate, NextPageTemplate
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.lib import colors
+
         buffer = io.BytesIO()
         # Adjust margins for header/footer
         doc = SimpleDocTemplate(buffer, pagesize=letter,
@@ -815,29 +797,14 @@ class GeneratedDocumentViewSet(viewsets.ModelViewSet):
     permission_classes = [IsManagerForWriteOrAuthenticatedReadOnly]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return GeneratedDocument.objects.none()
-            
+        # Managers and staff can only see documents for their department
+        queryset = GeneratedDocument.objects.for_user(self.request.user, self.request)
+        
         # Filter by status if provided
         status_filter = self.request.query_params.get('status', None)
-        queryset = GeneratedDocument.objects.all()
-        
         if status_filter:
             queryset = queryset.filter(status=status_filter)
-            
-        # Superusers can see all generated documents
-        if user.is_superuser:
-            return queryset
-        
-        # Managers and staff can only see documents for their department
-        try:
-            if user.profile.department:
-                return queryset.filter(department=user.profile.department)
-            else:
-                return GeneratedDocument.objects.none()
-        except:
-            return GeneratedDocument.objects.none()
+        return queryset
     
     def create(self, request, *args, **kwargs):
         # Extract data from request
@@ -857,7 +824,9 @@ class GeneratedDocumentViewSet(viewsets.ModelViewSet):
             template = DocumentTemplate.objects.get(id=template_id)
             
             # Generate the document file
-            file_content, filename, error_message = generate_document_file(template, parameters, request.user)
+            with memory_profiling.maybe_profile() as profiler:
+                file_content, filename, error_message = generate_document_file(template, parameters, request.user)
+            memory_profile = profiler.result if profiler else None
             
             if error_message:
                 # Create a failed document record
@@ -867,7 +836,8 @@ class GeneratedDocumentViewSet(viewsets.ModelViewSet):
                     generated_by=request.user,
                     status='failed',
                     error_message=error_message,
-                    parameters=parameters
+                    parameters=parameters,
+                    memory_profile=memory_profile
                 )
                 
                 return Response(
@@ -881,7 +851,8 @@ class GeneratedDocumentViewSet(viewsets.ModelViewSet):
                 department_id=department_id,
                 generated_by=request.user,
                 status='completed',
-                parameters=parameters
+                parameters=parameters,
+                memory_profile=memory_profile
             )
             
             # Save the generated file
@@ -0,0 +1,208 @@
+"""
+Change feed for live dashboards.
+
+Writes to task instances, completion logs, temperature logs and the two
+assignment models publish a small delta event to a per-tenant, per-department
+stream kept in the shared cache: a sequence counter plus one short-lived key
+per event. Every worker can publish and every worker can serve the stream.
+The stream body is an async iterator, so one ASGI process holds many open
+connections.
+
+Under ASGI, ChangeFeedView (GET /api/events/) streams the stream as
+server-sent events. Under WSGI, where each stream would occupy a worker, it
+answers a short poll for the events since last_event_id. Each event
+carries its sequence number as the SSE id, so a reconnecting EventSource
+resumes from Last-Event-ID. When a client has fallen further behind than the
+stream retains, it gets a ``resync`` event (``"resync": true`` when polling)
+and should reload its data over REST.
+
+Staff only receive events for rows they could read over REST. Task,
+completion log and assignment events reach the staff member who owns the
+row (the model's SCOPE owner) and the department's managers. Temperature
+logs go to the whole department.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching
+from .models import (
+    CompletionLog, TaskInstance, TemperatureCheckAssignment,
+    TemperatureLog, ThermometerVerificationAssignment, UserProfile,
+)
+
+EVENT_TTL = 10 * 60
+MAX_BATCH = 100
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+# Close the stream after this long; EventSource reconnects with Last-Event-ID,
+# which also lets long-lived connections pick up a changed role or department.
+STREAM_LIFETIME = 5 * 60
+
+_ALL = 'all'
+
+FEED_MODELS = (
+    TaskInstance, CompletionLog, TemperatureLog,
+    ThermometerVerificationAssignment, TemperatureCheckAssignment,
+)
+_BY_NAME = {model._meta.model_name: model for model in FEED_MODELS}
+
+
+def _stream(department_id):
+    return department_id if department_id is not None else _ALL
+
+
+def _seq_key(stream):
+    return f'events:{stream}:seq'
+
+
+def _event_key(stream, seq):
+    return f'events:{stream}:{seq}'
+
+
+def _append(stream, event):
+    # incr is a get and a set on the file and database backends, so two
+    # publishers can be handed the same number. Claim the event key with add,
+    # which is atomic everywhere, and take the next number when it is taken.
+    key = _seq_key(stream)
+    while True:
+        cache.add(key, 0, None)
+        try:
+            seq = cache.incr(key)
+        except ValueError:  # evicted between add and incr
+            continue
+        if cache.add(_event_key(stream, seq), event, EVENT_TTL):
+            return seq
+
+
+def publish(event_type, department_id, payload, owner=None):
+    """Queue an event for *department_id* (and the tenant-wide stream) once the transaction commits."""
+    event = {'type': event_type, 'department_id': department_id, 'owner': owner, 'at': time.time(), **payload}
+    schema = caching.current_schema()
+
+    def send():
+        with caching.tenant_keys(schema):
+            if department_id is not None:
+                _append(_stream(department_id), event)
+            _append(_ALL, event)
+
+    transaction.on_commit(send)
+
+
+def _describe(instance):
+    """(event name, department ID, payload) for a tracked instance, or None."""
+    if isinstance(instance, TaskInstance):
+        return 'taskinstance', instance.department_id, {
+            'id': instance.pk, 'status': instance.status, 'due_date': str(instance.due_date),
+            'assigned_to': instance.assigned_to_id,
+        }
+    if isinstance(instance, CompletionLog):
+        # The view that writes a log has the task (and usually its item) loaded.
+        task = instance.task_instance
+        return 'completionlog', task.department_id or task.cleaning_item.department_id, {
+            'id': instance.pk, 'task_instance': instance.task_instance_id, 'user': instance.user_id,
+        }
+    if isinstance(instance, TemperatureLog):
+        return 'temperaturelog', instance.department_id, {
+            'id': instance.pk, 'area_unit': instance.area_unit_id, 'time_period': instance.time_period,
+            'temperature_reading': str(instance.temperature_reading),
+        }
+    if isinstance(instance, (ThermometerVerificationAssignment, TemperatureCheckAssignment)):
+        name = instance._meta.model_name
+        return name, instance.department_id, {
+            'id': instance.pk, 'staff_member': instance.staff_member_id,
+            'time_period': instance.time_period, 'is_active': instance.is_active,
+        }
+    return None
+
+
+def publish_instance(instance, action):
+    described = _describe(instance)
+    if described:
+        name, department_id, payload = described
+        owner = instance.SCOPE.owner
+        publish(f'{name}.{action}', department_id, payload,
+                owner=getattr(instance, f'{owner}_id') if owner else None)
+
+
+def visible_to(event, user, profile):
+    """Whether *user* (with *profile*) may see *event*, by the same rules as the model's for_user()."""
+    if user.is_superuser:
+        return True
+    model = _BY_NAME.get(event['type'].split('.')[0])
+    scope = model.SCOPE if model else None
+    if scope is None or not scope.owner:
+        return True
+    if profile is None:
+        return False
+    if profile.role == UserProfile.ROLE_STAFF:
+        return event.get('owner') == (profile.pk if scope.owner_is_profile else user.pk)
+    return profile.role == UserProfile.ROLE_MANAGER
+
+
+def read_since(schema, department_id, last_seq):
+    """
+    (events, new last_seq, needs_resync) for the stream after *last_seq*.
+    A last_seq of None starts at the current end of the stream.
+    """
+    stream = _stream(department_id)
+    with caching.tenant_keys(schema):
+        seq = cache.get(_seq_key(stream), 0)
+        if last_seq is None or last_seq > seq:
+            # New subscriber, or the counter was lost (cache flush): start fresh.
+            return [], seq, last_seq is not None
+        if seq == last_seq:
+            return [], seq, False
+        if seq - last_seq > MAX_BATCH:
+            return [], seq, True
+        wanted = range(last_seq + 1, seq + 1)
+        found = cache.get_many([_event_key(stream, n) for n in wanted])
+    events = []
+    for n in wanted:
+        event = found.get(_event_key(stream, n))
+        if event is None:
+            return [], seq, True
+        events.append((n, event))
+    return events, seq, False
+
+
+def _sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream_events(schema, department_id, last_seq, visible=None):
+    """
+    Async iterator of SSE frames, polling the shared cache for new events.
+    Events for which *visible* returns False are skipped.
+    """
+    read = sync_to_async(read_since)
+    yield 'retry: 3000\n\n'
+    started = last_beat = time.monotonic()
+    first = True
+    while time.monotonic() - started < STREAM_LIFETIME:
+        if not first:
+            await asyncio.sleep(POLL_INTERVAL)
+        events, last_seq, resync = await read(schema, department_id, last_seq)
+        if first:
+            # Tell the client where the stream is; any replayed events follow.
+            yield _sse('ready', {'last_event_id': last_seq})
+            first = False
+        if resync:
+            yield _sse('resync', {}, last_seq)
+        for seq, event in events:
+            if visible is None or visible(event):
+                yield _sse(event['type'], event, seq)
+        if events or resync:
+            last_beat = time.monotonic()
+        elif time.monotonic() - last_beat >= HEARTBEAT_INTERVAL:
+            yield ': keep-alive\n\n'
+            last_beat = time.monotonic()
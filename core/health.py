@@ -0,0 +1,164 @@
+"""
+Deep health checks for the load balancer.
+
+``GET /api/health/?deep=1`` times a ``SELECT 1`` against every database
+alias, a write/read/delete round trip through the default file storage, and
+reports how many requests this worker is serving. Each probe runs in a
+small thread pool and is abandoned after HEALTH_PROBE_TIMEOUT seconds, so a
+database that hangs instead of refusing connections (or a pool with no free
+connections) shows up as a failed check instead of a hung health check.
+An abandoned probe keeps its thread until it returns, so a check whose last
+probe is still running isn't probed again (it reports timed out) and cannot
+fill the pool; on PostgreSQL the probe also sets a statement_timeout.
+
+The response is 503 when a check listed in HEALTH_CRITICAL_CHECKS fails,
+which takes this instance out of the target group; other failures (e.g. the
+read-only traceability database) report "degraded" with a 200 because every
+instance would fail them alike. Results are cached in the worker for
+HEALTH_CACHE_SECONDS so frequent probes stay cheap; the shared cache isn't
+used because it may be what's broken, and the in-flight count is per worker
+anyway.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health-probe')
+_running = {}  # check name -> future of its latest probe
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_cached = (0.0, None)
+_cache_lock = threading.Lock()
+
+
+def in_flight_requests():
+    return _in_flight
+
+
+def _enter():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+
+
+def _leave():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+class InFlightRequestsMiddleware:
+    """Counts the requests this worker (sync or ASGI) is currently serving."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _enter()
+        try:
+            return self.get_response(request)
+        finally:
+            _leave()
+
+    async def __acall__(self, request):
+        _enter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _leave()
+
+
+def _probe_database(alias):
+    connection = connections[alias]
+    try:
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # SET LOCAL ends with the transaction, so pooled connections don't keep it.
+                cursor.execute('SET LOCAL statement_timeout = %s', [int(settings.HEALTH_PROBE_TIMEOUT * 1000)])
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    finally:
+        # Probe threads are reused; hand the connection (or pool slot) back.
+        connections[alias].close()
+
+
+def _probe_storage():
+    name = default_storage.save(f'health/{uuid.uuid4().hex}.txt', ContentFile(b'ok'))
+    try:
+        with default_storage.open(name, 'rb') as handle:
+            if handle.read() != b'ok':
+                raise OSError('read back different content')
+    finally:
+        default_storage.delete(name)
+
+
+def _timed(probe, *args):
+    started = time.perf_counter()
+    probe(*args)
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def run_checks():
+    """Probe every dependency now; see the module docstring for the result's meaning."""
+    probes = {f'database:{alias}': (_probe_database, alias) for alias in connections}
+    probes['storage'] = (_probe_storage,)
+    timed_out = {'ok': False, 'error': f'timed out after {settings.HEALTH_PROBE_TIMEOUT:g}s'}
+    checks = {}
+    futures = {}
+    # Run the probes concurrently, so a hung dependency costs one timeout in total.
+    for name, probe in probes.items():
+        previous = _running.get(name)
+        if previous is not None and not previous.done():
+            checks[name] = {**timed_out, 'still_running': True}
+            continue
+        futures[name] = _running[name] = _executor.submit(_timed, *probe)
+    deadline = time.monotonic() + settings.HEALTH_PROBE_TIMEOUT
+    for name, future in futures.items():
+        try:
+            checks[name] = {'ok': True, 'ms': future.result(timeout=max(0.0, deadline - time.monotonic()))}
+        except FutureTimeout:
+            checks[name] = {**timed_out}
+        except Exception as exc:
+            # Only the exception type is returned: the endpoint is unauthenticated
+            # and messages can name hosts and users.
+            logger.warning('Health check %s failed: %s', name, exc)
+            checks[name] = {'ok': False, 'error': type(exc).__name__}
+    critical = set(settings.HEALTH_CRITICAL_CHECKS)
+    failed = [name for name, check in checks.items() if not check['ok']]
+    if any(name in critical for name in failed):
+        status = 'unhealthy'
+    elif failed:
+        status = 'degraded'
+    else:
+        status = 'ok'
+    return {'status': status, 'checks': checks}
+
+
+def deep_health():
+    """run_checks(), reused for HEALTH_CACHE_SECONDS, plus the live in-flight request count."""
+    global _cached
+    with _cache_lock:
+        checked_at, result = _cached
+        age = time.monotonic() - checked_at
+        if result is None or age >= settings.HEALTH_CACHE_SECONDS:
+            result = run_checks()
+            _cached = (time.monotonic(), result)
+            age = 0.0
+    return {**result, 'cached_seconds': round(age, 1), 'in_flight_requests': in_flight_requests()}
@@ -0,0 +1,240 @@
+"""
+Per-endpoint request metrics.
+
+RequestMetricsMiddleware times every request that resolves to a URL route and
+records, per route and tenant: wall time, number of SQL queries, time spent
+in the database and response size. Responses get a Server-Timing header
+(visible in the browser's network panel). Requests slower than
+SLOW_REQUEST_MS are logged with their most repeated SQL statements, which
+is usually enough to spot an N+1 loop.
+
+Samples are buffered in each worker and merged into the shared cache every
+FLUSH_INTERVAL seconds, keeping the latest SAMPLE_LIMIT per route, so the
+metrics endpoint reports percentiles across all workers.
+
+Queries reach the request's QueryRecorder through an execute wrapper that
+every connection gets on connection_created and a ContextVar naming the
+recorder. Under ASGI the ORM runs in sync_to_async threads, which inherit
+the request's context, so async views are measured the same way.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_LIMIT = 500
+FLUSH_INTERVAL = 10.0
+TOP_STATEMENTS = 3
+
+_ROUTES_KEY = 'metrics:routes'
+_pending = defaultdict(list)
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+_recorder = ContextVar('request_metrics_recorder', default=None)
+
+# Collapses "IN (%s, %s, %s)" so lookups of different sizes share a fingerprint.
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+# DRF router routes are regexes: "^task-instances/(?P<pk>[^/.]+)/$" -> "task-instances/<pk>/"
+_NAMED_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+def fingerprint(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times queries and fingerprints their SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[fingerprint(sql)] += 1
+
+    def repeated(self, limit=TOP_STATEMENTS):
+        """The most-run statements that ran more than once, as (count, sql)."""
+        return [(count, sql) for sql, count in self.statements.most_common(limit) if count > 1]
+
+
+def record_queries(execute, sql, params, many, context):
+    """execute_wrapper: pass the statement to the current request's QueryRecorder, if any."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: add record_queries once per connection wrapper."""
+    if record_queries not in connection.execute_wrappers:
+        # At the front, for the same reason as slow_queries.install.
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+def route_label(request):
+    match = request.resolver_match
+    route = _NAMED_GROUP.sub(r'<\1>', match.route).replace('^', '').replace('$', '')
+    return f'{request.method} /{route}'
+
+
+def _route_key(route):
+    return 'metrics:route:' + hashlib.md5(route.encode()).hexdigest()
+
+
+def record(schema, route, sample):
+    """Buffer one (wall_ms, queries, db_ms, size) sample; flush when due."""
+    with _pending_lock:
+        _pending[(schema, route)].append(sample)
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def flush():
+    """Merge this worker's buffered samples into the shared cache."""
+    global _last_flush
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    by_schema = defaultdict(dict)
+    for (schema, route), samples in pending.items():
+        by_schema[schema][route] = samples
+    for schema, routes in by_schema.items():
+        with caching.tenant_keys(schema):
+            known = cache.get(_ROUTES_KEY, set())
+            if not known.issuperset(routes):
+                cache.set(_ROUTES_KEY, known | set(routes), None)
+            stored = cache.get_many([_route_key(route) for route in routes])
+            updates = {}
+            for route, samples in routes.items():
+                entry = stored.get(_route_key(route)) or {'count': 0, 'samples': []}
+                updates[_route_key(route)] = {
+                    'count': entry['count'] + len(samples),
+                    'samples': (entry['samples'] + samples)[-SAMPLE_LIMIT:],
+                }
+            cache.set_many(updates, None)
+
+
+def percentile(values, pct):
+    """Nearest-rank *pct* percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summary():
+    """Per-route percentiles for the current tenant, slowest p95 first."""
+    flush()
+    routes = cache.get(_ROUTES_KEY, set())
+    entries = cache.get_many([_route_key(route) for route in routes])
+    result = []
+    for route in routes:
+        entry = entries.get(_route_key(route))
+        if not entry or not entry['samples']:
+            continue
+        walls, queries, db_times, sizes = zip(*entry['samples'])
+        sizes = [size for size in sizes if size is not None]
+        result.append({
+            'route': route,
+            'requests': entry['count'],
+            'sampled': len(walls),
+            'wall_ms': {pct: round(percentile(walls, n), 1) for pct, n in (('p50', 50), ('p95', 95), ('p99', 99))},
+            'queries': {'p50': percentile(queries, 50), 'p95': percentile(queries, 95), 'max': max(queries)},
+            'db_ms': {'p50': round(percentile(db_times, 50), 1), 'p95': round(percentile(db_times, 95), 1)},
+            'response_bytes': {'p50': percentile(sizes, 50), 'max': max(sizes)} if sizes else None,
+        })
+    result.sort(key=lambda row: row['wall_ms']['p95'], reverse=True)
+    return result
+
+
+def reset():
+    with _pending_lock:
+        _pending.clear()
+    routes = cache.get(_ROUTES_KEY, set())
+    cache.delete_many([_route_key(route) for route in routes] + [_ROUTES_KEY])
+
+
+class RequestMetricsMiddleware:
+    """Time each request and its SQL; see the module docstring. Sync and async."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, recorder, (time.perf_counter() - started) * 1000)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        wall_ms = (time.perf_counter() - started) * 1000
+        # Recording can flush to the cache, which may be database-backed.
+        return await sync_to_async(self._finish)(request, response, recorder, wall_ms)
+
+    def _finish(self, request, response, recorder, wall_ms):
+        db_ms = recorder.seconds * 1000
+
+        response['Server-Timing'] = (
+            f'app;dur={wall_ms:.1f}, db;dur={db_ms:.1f};desc="{recorder.count} queries"'
+        )
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        route = route_label(request)
+        size = None if response.streaming else len(response.content)
+        schema = caching.current_schema()
+        record(schema, route, (round(wall_ms, 1), recorder.count, round(db_ms, 1), size))
+
+        if wall_ms >= settings.SLOW_REQUEST_MS:
+            repeated = recorder.repeated()
+            logger.warning(
+                'Slow request %s %s [%s] %.0f ms, %d queries (%.0f ms in DB)%s',
+                request.method, request.path, schema, wall_ms, recorder.count, db_ms,
+                ''.join(f'\n  {count}x {sql[:300]}' for count, sql in repeated),
+            )
+        return response
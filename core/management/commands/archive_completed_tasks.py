@@ -10,6 +10,7 @@ updated without making changes.
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
+from core import caching, conditional
 from core.models import TaskInstance
 from core.recipe_models import RecipeProductionTask
 
@@ -42,5 +43,9 @@ class Command(BaseCommand):
         # Update in bulk
         cleaning_updated = cleaning_qs.update(status="archived", completed_at=now)
         recipe_updated = recipe_qs.update(status="archived", completed_at=now)
+        # update() skips model signals, so refresh caches and ETags by hand.
+        for model in (TaskInstance, RecipeProductionTask):
+            caching.invalidate_for_model(model)
+            conditional.touch(model)
 
         self.stdout.write(self.style.SUCCESS("Archived %s cleaning tasks and %s recipe production tasks." % (cleaning_updated, recipe_updated)))
@@ -0,0 +1,171 @@
+"""Time worker boot: django.setup(), the WSGI handler and the first URL resolution.
+
+Usage:
+    python manage.py benchmark_startup [--runs 5] [--output benchmark-results/startup.json]
+        [--compare benchmark-results/startup-base.json] [--threshold 0.2] [--max-ms 1500]
+
+Every gunicorn worker (and every worker recycled by --max-requests) pays for
+this before it serves a request. Each run starts a fresh interpreter with the
+current settings, and times three phases:
+- importing Django and running django.setup(), which imports every app's
+  models;
+- get_wsgi_application(), which loads the middleware;
+- resolving a few API paths, which imports the URLconf and through it every
+  view module.
+One extra run with ``-X importtime`` lists the slowest imports.
+
+The command fails when a heavy optional dependency (HEAVY_MODULES) is
+imported during startup. Those belong inside the code paths that use them.
+It also fails when the median total is over --max-ms, or more than
+--threshold slower than the --compare baseline. Results go to
+benchmark-results/startup-<commit>.json unless --output is given.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.management.commands.run_benchmarks import _git_commit
+
+HEAVY_MODULES = ("pandas", "numpy", "reportlab", "openpyxl")
+RESOLVE_PATHS = ("/api/health/", "/api/taskinstances/", "/api/generated-documents/", "/api/recipes/")
+SLOWEST_IMPORTS = 15
+
+# Runs in the child interpreter: argv[1] is the JSON list of heavy modules, the rest are paths.
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+wsgi_done = time.perf_counter()
+from django.urls import resolve
+for path in sys.argv[2:]:
+    resolve(path)
+urls_done = time.perf_counter()
+heavy = set(json.loads(sys.argv[1]))
+print(json.dumps({
+    "setup_ms": (setup_done - started) * 1000,
+    "wsgi_ms": (wsgi_done - setup_done) * 1000,
+    "urls_ms": (urls_done - wsgi_done) * 1000,
+    "total_ms": (urls_done - started) * 1000,
+    "modules": len(sys.modules),
+    "heavy_modules": sorted({name.split(".")[0] for name in sys.modules} & heavy),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Benchmark worker start-up time and check that heavy dependencies load lazily."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time.")
+        parser.add_argument("--output", help="Results file (default: benchmark-results/startup-<commit>.json).")
+        parser.add_argument("--compare", help="Earlier results file to compare against.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Relative slowdown of the median total flagged as a regression (default 0.2 = 20%%).")
+        parser.add_argument("--max-ms", type=float, help="Fail when the median total exceeds this many ms.")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1.")
+        self.stdout.write(f"Timing {options['runs']} start-ups with {settings.SETTINGS_MODULE}...")
+        runs = [self._probe()[0] for _ in range(options["runs"])]
+        importtime = self._probe(importtime=True)[1]
+
+        report = {
+            "commit": _git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "python": sys.version.split()[0],
+            "runs": options["runs"],
+            "results": {
+                phase: round(statistics.median(run[phase] for run in runs), 1)
+                for phase in ("setup_ms", "wsgi_ms", "urls_ms", "total_ms")
+            },
+            "min_total_ms": round(min(run["total_ms"] for run in runs), 1),
+            "modules": runs[0]["modules"],
+            "heavy_modules": runs[0]["heavy_modules"],
+            "slowest_imports": _slowest_imports(importtime),
+        }
+        self._print_report(report)
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmark-results" / f"startup-{report['commit']}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        problems = []
+        if report["heavy_modules"]:
+            problems.append(f"imported at start-up: {', '.join(report['heavy_modules'])}")
+        total = report["results"]["total_ms"]
+        if options["max_ms"] is not None and total > options["max_ms"]:
+            problems.append(f"median start-up {total:.0f} ms is over --max-ms {options['max_ms']:.0f}")
+        if options["compare"] and self._regressed(report, options["compare"], options["threshold"]):
+            problems.append(f"median start-up more than {options['threshold']:.0%} slower than {options['compare']}")
+        if problems:
+            raise CommandError("; ".join(problems))
+
+    def _probe(self, importtime=False):
+        """(timings, -X importtime output) from one fresh interpreter."""
+        command = [sys.executable]
+        if importtime:
+            command += ["-X", "importtime"]
+        command += ["-c", _PROBE, json.dumps(HEAVY_MODULES), *RESOLVE_PATHS]
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CommandError(f"Start-up failed:\n{result.stderr[-2000:]}")
+        # Settings may print to stdout; the probe's JSON is the last line.
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def _print_report(self, report):
+        results = report["results"]
+        self.stdout.write(
+            f"  setup {results['setup_ms']:>8.1f} ms  wsgi {results['wsgi_ms']:>7.1f} ms  "
+            f"urls {results['urls_ms']:>8.1f} ms  total {results['total_ms']:>8.1f} ms (median), "
+            f"{report['modules']} modules"
+        )
+        if report["heavy_modules"]:
+            self.stdout.write(self.style.ERROR(f"  heavy modules loaded: {', '.join(report['heavy_modules'])}"))
+        self.stdout.write("  slowest imports (self ms, with -X importtime overhead):")
+        for entry in report["slowest_imports"]:
+            self.stdout.write(f"    {entry['self_ms']:>7.1f}  {entry['module']}")
+
+    def _regressed(self, report, baseline_path, threshold):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text())
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {baseline_path}: {exc}") from exc
+        self.stdout.write(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+        regressed = False
+        for phase, now in report["results"].items():
+            before = baseline.get("results", {}).get(phase)
+            if not before:
+                continue
+            change = (now - before) / before
+            line = f"  {phase:<10} {before:>8.1f} -> {now:>8.1f} ms ({change:+.0%})"
+            if phase == "total_ms" and change > threshold:
+                regressed = True
+                self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+            else:
+                self.stdout.write(line)
+        return regressed
+
+
+def _slowest_imports(importtime_output):
+    """Modules with the highest self time from ``-X importtime`` output."""
+    entries = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:"):].split("|", 2)
+        entries.append({"module": name.strip(), "self_ms": int(self_us) / 1000})
+    entries.sort(key=lambda entry: entry["self_ms"], reverse=True)
+    return entries[:SLOWEST_IMPORTS]
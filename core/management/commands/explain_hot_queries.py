@@ -0,0 +1,133 @@
+"""Check that the main API endpoints' queries are served by indexes.
+
+Usage:
+    python manage.py explain_hot_queries [--department ID] [--verbose-plans]
+
+Runs EXPLAIN for the filters behind the busiest endpoints (today's tasks,
+temperature logs, assignments, production schedules, completion logs) and
+flags any plan that falls back to a sequential scan of the queried table.
+Run it against a seeded dataset so the IDs and dates look like production.
+
+On PostgreSQL the check runs with enable_seqscan turned off for the
+transaction: the planner then only picks a sequential scan when no usable
+index exists, so the result does not depend on how many rows are seeded.
+Exits with an error when any query is flagged, so it can gate CI.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import (
+    AreaUnit,
+    CompletionLog,
+    Department,
+    TaskInstance,
+    TemperatureCheckAssignment,
+    TemperatureLog,
+    ThermometerVerificationAssignment,
+    UserProfile,
+)
+from core.recipe_models import ProductionSchedule, RecipeProductionTask
+
+
+def _first_id(queryset):
+    return queryset.values_list("id", flat=True).first() or 0
+
+
+def hot_queries(department_id):
+    """(label, queryset) pairs mirroring the viewset filters."""
+    today = timezone.localdate()
+    profile_id = _first_id(UserProfile.objects.filter(department_id=department_id))
+    staff_id = UserProfile.objects.filter(id=profile_id).values_list("user_id", flat=True).first() or 0
+    area_unit_id = _first_id(AreaUnit.objects.filter(department_id=department_id))
+
+    return [
+        ("task instances due today", TaskInstance.objects.filter(
+            department_id=department_id, due_date=today, status__in=["pending", "in_progress"])),
+        ("staff task list", TaskInstance.objects.filter(
+            assigned_to_id=profile_id, department_id=department_id).exclude(status="archived")),
+        ("department tasks (unarchived)", TaskInstance.objects.filter(
+            department_id=department_id, due_date__gte=today).exclude(status="archived")),
+        ("recent completion logs", CompletionLog.objects.filter(
+            completed_at__gte=timezone.now() - timedelta(days=7)).order_by("-completed_at")),
+        ("temperature logs today", TemperatureLog.objects.on_dates(today).filter(department_id=department_id)),
+        ("temperature logs by area", TemperatureLog.objects.on_dates(today - timedelta(days=30), today).filter(
+            area_unit_id=area_unit_id)),
+        ("production schedule (next 7 days)", ProductionSchedule.objects.filter(
+            department_id=department_id, scheduled_date__gte=today, scheduled_date__lte=today + timedelta(days=7))),
+        ("production tasks by status", RecipeProductionTask.objects.filter(
+            department_id=department_id, status="scheduled")),
+        ("current thermometer verification assignment", ThermometerVerificationAssignment.objects.filter(
+            department_id=department_id, is_active=True).order_by("-assigned_date")[:1]),
+        ("my thermometer verification assignment", ThermometerVerificationAssignment.objects.filter(
+            staff_member_id=staff_id, is_active=True).order_by("-assigned_date")[:1]),
+        ("current temperature check assignment", TemperatureCheckAssignment.objects.filter(
+            department_id=department_id, time_period="AM", is_active=True).order_by("-assigned_date")[:1]),
+        ("my temperature check assignment", TemperatureCheckAssignment.objects.filter(
+            staff_member_id=staff_id, time_period="AM", is_active=True).order_by("-assigned_date")[:1]),
+    ]
+
+
+def sequential_scans(plan, table):
+    """Plan lines that read *table* without an index."""
+    flagged = []
+    for line in plan.splitlines():
+        text = line.strip()
+        if connection.vendor == "postgresql":
+            if text.lstrip("-> ").startswith(f"Seq Scan on {table}"):
+                flagged.append(text)
+        elif connection.vendor == "sqlite":
+            # "SCAN core_taskinstance" vs "SCAN core_taskinstance USING INDEX ..."
+            words = text.split()
+            if "SCAN" in words and table in words and "USING" not in words:
+                flagged.append(text)
+    return flagged
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the main endpoint queries and flag sequential scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--department",
+            type=int,
+            help="Department ID to plan with. Defaults to the first department.",
+        )
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print every plan, not just the flagged ones.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise CommandError(f"Unsupported database backend: {connection.vendor}")
+
+        department_id = options["department"] or _first_id(Department.objects.order_by("id"))
+        if not department_id:
+            self.stdout.write(self.style.WARNING("No departments found; plans will use placeholder IDs. Seed data first."))
+
+        flagged_count = 0
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for label, queryset in hot_queries(department_id):
+                plan = queryset.explain()
+                flagged = sequential_scans(plan, queryset.model._meta.db_table)
+                if flagged:
+                    flagged_count += 1
+                    self.stdout.write(self.style.ERROR(f"SEQ SCAN  {label}"))
+                    for line in flagged:
+                        self.stdout.write(f"    {line}")
+                else:
+                    self.stdout.write(f"ok        {label}")
+                if options["verbose_plans"]:
+                    self.stdout.write(plan)
+
+        if flagged_count:
+            raise CommandError(f"{flagged_count} hot quer{'y' if flagged_count == 1 else 'ies'} fell back to a sequential scan.")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
@@ -0,0 +1,55 @@
+"""Materialise upcoming occurrences of recurring recipe production tasks.
+
+Usage:
+    python manage.py generate_recurring_production_tasks [--days N] [--department ID]
+
+Run it daily for every tenant schema, e.g. from cron:
+    python manage.py all_tenants_command generate_recurring_production_tasks --days 30
+
+Each run tops up a rolling horizon of --days days from now. Occurrences that
+already exist are skipped, so overlapping or repeated runs create nothing new.
+Occurrences are not checked for staff or department-capacity conflicts.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.recipe_models import RecipeProductionTask
+
+
+class Command(BaseCommand):
+    help = "Create missing child occurrences of recurring production tasks up to a rolling horizon."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Horizon in days from now to generate occurrences for (1-365, default 30).",
+        )
+        parser.add_argument(
+            "--department",
+            type=int,
+            help="Only generate for the department with this ID.",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days < 1 or days > 365:
+            raise CommandError("--days must be between 1 and 365.")
+
+        parents = RecipeProductionTask.objects.filter(
+            is_recurring=True, parent_task__isnull=True
+        ).exclude(status__in=["cancelled", "archived"])
+        if options["department"]:
+            parents = parents.filter(department_id=options["department"])
+
+        now = timezone.now()
+        created = RecipeProductionTask.generate_recurring_children(
+            parents, now + timedelta(days=days), since=now
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} recurring production task occurrences up to {timezone.localdate(now + timedelta(days=days))}."
+        ))
@@ -1,10 +1,11 @@
 import csv
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 from django.conf import settings
 import os
+from core.command_runs import TimedCommand
 from core.models import Department, CleaningItem
 
-class Command(BaseCommand):
+class Command(TimedCommand):
     help = 'Adds the Bakery department and imports its cleaning schedule from a CSV file.'
 
     def handle(self, *args, **options):
@@ -31,11 +32,8 @@ class Command(BaseCommand):
                 # Adjust for the header having a trailing comma
                 header = file.readline().strip().rstrip(',').split(',') 
                 reader = csv.DictReader(file, fieldnames=header)
-                
-                items_created_count = 0
-                items_updated_count = 0
 
-                for row_number, row in enumerate(reader, start=2): # start=2 because header is line 1
+                for row_number, row in enumerate(self.progress(reader), start=2): # start=2 because header is line 1
                     item_name = row.get('ITEM', '').strip()
                     frequency_raw = row.get('FREQUENCY OF CLEANING', '').strip()
                     equipment = row.get('CLEANING EQUIPMENT', '').strip()
@@ -43,7 +41,7 @@ class Command(BaseCommand):
                     method = row.get('METHOD', '').strip()
 
                     if not item_name:
-                        self.stdout.write(self.style.WARNING(f'Skipping row {row_number} due to missing ITEM name.'))
+                        self.warn(f'Skipping row {row_number} due to missing ITEM name.')
                         continue
                     
                     # Handle potential trailing hyphen in the last column if it's method
@@ -65,7 +63,7 @@ class Command(BaseCommand):
                         elif "as needed" in frequency_raw.lower() or "visibly soiled" in frequency_raw.lower():
                             frequency_cleaned = 'as_needed'
                         else:
-                            self.stdout.write(self.style.WARNING(f'Could not map frequency "{frequency_raw}" for item "{item_name}". Using "as_needed" as default.'))
+                            self.warn(f'Could not map frequency "{frequency_raw}" for item "{item_name}". Using "as_needed" as default.')
                             frequency_cleaned = 'as_needed' # Default fallback
 
                     # Create or update CleaningItem
@@ -81,13 +79,13 @@ class Command(BaseCommand):
                     )
 
                     if item_created:
-                        items_created_count += 1
+                        self.count('created')
                     else:
-                        items_updated_count += 1
+                        self.count('updated')
             
             self.stdout.write(self.style.SUCCESS(f'Successfully processed CSV file.'))
-            self.stdout.write(self.style.SUCCESS(f'{items_created_count} new cleaning items created for Bakery.'))
-            self.stdout.write(self.style.SUCCESS(f'{items_updated_count} existing cleaning items updated for Bakery.'))
+            self.stdout.write(self.style.SUCCESS(f'{self.counters["created"]} new cleaning items created for Bakery.'))
+            self.stdout.write(self.style.SUCCESS(f'{self.counters["updated"]} existing cleaning items updated for Bakery.'))
 
         except FileNotFoundError:
             raise CommandError(f'Error: The file {csv_file_path} was not found.')
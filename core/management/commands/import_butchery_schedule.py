@@ -2,12 +2,13 @@ import csv
 import os
 
 from django.conf import settings
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 
+from core.command_runs import TimedCommand
 from core.models import Department, CleaningItem
 
 
-class Command(BaseCommand):
+class Command(TimedCommand):
     """Import Butchery cleaning schedule from CSV into CleaningItem records.
 
     The command will:
@@ -44,17 +45,15 @@ class Command(BaseCommand):
         # ------------------------------------------------------------------
         # 3. Read CSV & upsert CleaningItem records
         # ------------------------------------------------------------------
-        created_count = 0
-        updated_count = 0
         with open(csv_path, mode='r', encoding='utf-8') as csvfile:
             # The first line may include a trailing comma → strip it.
             header = csvfile.readline().strip().rstrip(',').split(',')
             reader = csv.DictReader(csvfile, fieldnames=header)
 
-            for line_no, row in enumerate(reader, start=2):  # header is line 1
+            for line_no, row in enumerate(self.progress(reader), start=2):  # header is line 1
                 item_name = row.get('ITEM', '').strip()
                 if not item_name:
-                    self.stdout.write(self.style.WARNING(f'Skipping row {line_no}: ITEM is empty'))
+                    self.warn(f'Skipping row {line_no}: ITEM is empty')
                     continue
 
                 # ------------------------------------------------------------------
@@ -78,16 +77,16 @@ class Command(BaseCommand):
                     },
                 )
                 if was_created:
-                    created_count += 1
+                    self.count('created')
                 else:
-                    updated_count += 1
+                    self.count('updated')
 
         # ------------------------------------------------------------------
         # 4. Summary output
         # ------------------------------------------------------------------
         self.stdout.write(self.style.SUCCESS('Import completed successfully'))
-        self.stdout.write(self.style.SUCCESS(f'Created {created_count} new items'))
-        self.stdout.write(self.style.SUCCESS(f'Updated {updated_count} existing items'))
+        self.stdout.write(self.style.SUCCESS(f'Created {self.counters["created"]} new items'))
+        self.stdout.write(self.style.SUCCESS(f'Updated {self.counters["updated"]} existing items'))
 
     # ------------------------------------------------------------------
     # Helper Methods
@@ -1,10 +1,11 @@
 import csv
-from django.core.management.base import BaseCommand, CommandError
+from django.core.management.base import CommandError
 from django.conf import settings
 import os
+from core.command_runs import TimedCommand
 from core.models import Department, CleaningItem
 
-class Command(BaseCommand):
+class Command(TimedCommand):
     help = 'Adds the HMR department (if not exists) and imports its cleaning schedule from a CSV file.'
 
     def handle(self, *args, **options):
@@ -29,11 +30,8 @@ class Command(BaseCommand):
         try:
             with open(csv_file_path, mode='r', encoding='utf-8') as file:
                 reader = csv.DictReader(file)
-                
-                items_created_count = 0
-                items_updated_count = 0
 
-                for row_number, row in enumerate(reader, start=2): # start=2 because header is line 1
+                for row_number, row in enumerate(self.progress(reader), start=2): # start=2 because header is line 1
                     item_name = row.get('ITEM', '').strip()
                     frequency_raw = row.get('FREQUENCY OF CLEANING', '').strip()
                     equipment = row.get('CLEANING EQUIPMENT', '').strip()
@@ -41,7 +39,7 @@ class Command(BaseCommand):
                     method = row.get('METHOD', '').strip()
 
                     if not item_name:
-                        self.stdout.write(self.style.WARNING(f'Skipping row {row_number} due to missing ITEM name.'))
+                        self.warn(f'Skipping row {row_number} due to missing ITEM name.')
                         continue
                     
                     # Map frequency
@@ -57,7 +55,7 @@ class Command(BaseCommand):
                         elif "as needed" in frequency_raw.lower() or "visibly soiled" in frequency_raw.lower():
                             frequency_cleaned = 'as_needed'
                         else:
-                            self.stdout.write(self.style.WARNING(f'Could not map frequency "{frequency_raw}" for item "{item_name}". Using "as_needed" as default.'))
+                            self.warn(f'Could not map frequency "{frequency_raw}" for item "{item_name}". Using "as_needed" as default.')
                             frequency_cleaned = 'as_needed' # Default fallback
 
                     # Create or update CleaningItem
@@ -73,13 +71,13 @@ class Command(BaseCommand):
                     )
 
                     if item_created:
-                        items_created_count += 1
+                        self.count('created')
                     else:
-                        items_updated_count += 1
+                        self.count('updated')
             
             self.stdout.write(self.style.SUCCESS(f'Successfully processed HMR CSV file.'))
-            self.stdout.write(self.style.SUCCESS(f'{items_created_count} new cleaning items created for HMR.'))
-            self.stdout.write(self.style.SUCCESS(f'{items_updated_count} existing cleaning items updated for HMR.'))
+            self.stdout.write(self.style.SUCCESS(f'{self.counters["created"]} new cleaning items created for HMR.'))
+            self.stdout.write(self.style.SUCCESS(f'{self.counters["updated"]} existing cleaning items updated for HMR.'))
 
         except FileNotFoundError:
             raise CommandError(f'Error: The file {csv_file_path} was not found.')
@@ -1,15 +1,16 @@
 import csv
 import json
 import os
+from collections import Counter
 from decimal import Decimal, InvalidOperation
-from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db import transaction
 from django.contrib.auth.models import User
+from core.command_runs import TimedCommand
 from core.models import Department
 from core.recipe_models import Recipe, RecipeIngredient, RecipeVersion
 
-class Command(BaseCommand):
+class Command(TimedCommand):
     help = 'Import recipes from CSV and JSON files'
 
     def add_arguments(self, parser):
@@ -43,13 +44,15 @@ class Command(BaseCommand):
 
         # Process JSON file first as it's more structured
         if os.path.exists(json_path):
-            self.import_from_json(json_path, admin_user)
+            with self.phase('json'):
+                self.import_from_json(json_path, admin_user)
         else:
             self.stdout.write(self.style.WARNING(f"JSON file not found at {json_path}"))
 
         # Then process CSV file to supplement or update data
         if os.path.exists(csv_path):
-            self.import_from_csv(csv_path, admin_user)
+            with self.phase('csv'):
+                self.import_from_csv(csv_path, admin_user)
         else:
             self.stdout.write(self.style.WARNING(f"CSV file not found at {csv_path}"))
 
@@ -63,7 +66,7 @@ class Command(BaseCommand):
             if created:
                 self.stdout.write(self.style.SUCCESS(f"Created department: {dept_name}"))
             else:
-                self.stdout.write(f"Department already exists: {dept_name}")
+                self.log(f"Department already exists: {dept_name}")
 
     @transaction.atomic
     def import_from_json(self, json_path, admin_user):
@@ -73,11 +76,10 @@ class Command(BaseCommand):
         try:
             with open(json_path, 'r') as file:
                 recipes_data = json.load(file)
-                
-            recipe_count = 0
-            ingredient_count = 0
-            
-            for recipe_data in recipes_data:
+
+            before = Counter(self.counters)
+
+            for recipe_data in self.progress(recipes_data, total=len(recipes_data)):
                 department_name = recipe_data.get('department')
                 product_code = recipe_data.get('product_code')
                 description = recipe_data.get('description')
@@ -86,21 +88,21 @@ class Command(BaseCommand):
                 
                 # Skip if missing essential data
                 if not all([department_name, product_code, description]):
-                    self.stdout.write(self.style.WARNING(f"Skipping recipe with incomplete data: {recipe_data}"))
+                    self.warn(f"Skipping recipe with incomplete data: {recipe_data}")
                     continue
                 
                 # Get department
                 try:
                     department = Department.objects.get(name=department_name)
                 except Department.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(f"Department not found: {department_name}, creating it"))
+                    self.warn(f"Department not found: {department_name}, creating it")
                     department = Department.objects.create(name=department_name)
                 
                 # Convert cost to Decimal
                 try:
                     unit_cost = Decimal(cost_excl) if cost_excl else None
                 except InvalidOperation:
-                    self.stdout.write(self.style.WARNING(f"Invalid cost value: {cost_excl} for {description}"))
+                    self.warn(f"Invalid cost value: {cost_excl} for {description}")
                     unit_cost = None
                 
                 # Calculate yield from ingredients if available
@@ -128,10 +130,11 @@ class Command(BaseCommand):
                 )
                 
                 if created:
-                    self.stdout.write(f"Created recipe: {recipe}")
-                    recipe_count += 1
+                    self.log(f"Created recipe: {recipe}")
+                    self.count('recipes_created')
                 else:
-                    self.stdout.write(f"Updated recipe: {recipe}")
+                    self.log(f"Updated recipe: {recipe}")
+                    self.count('recipes_updated')
                 
                 # Create recipe version for audit trail
                 RecipeVersion.objects.create(
@@ -162,7 +165,7 @@ class Command(BaseCommand):
                         unit_cost_val = Decimal(cost) if cost else Decimal('0')
                         total_cost_val = Decimal(total_cost) if total_cost else (quantity * unit_cost_val)
                     except InvalidOperation:
-                        self.stdout.write(self.style.WARNING(f"Invalid numeric value for ingredient: {ing_description}"))
+                        self.warn(f"Invalid numeric value for ingredient: {ing_description}")
                         continue
                     
                     # Create or update ingredient
@@ -180,12 +183,16 @@ class Command(BaseCommand):
                     )
                     
                     if ing_created:
-                        ingredient_count += 1
+                        self.count('ingredients_created')
                 
                 # Update recipe unit cost based on ingredients
                 recipe.update_unit_cost()
             
-            self.stdout.write(self.style.SUCCESS(f"Imported {recipe_count} recipes and {ingredient_count} ingredients from JSON"))
+            added = self.counters - before
+            self.stdout.write(self.style.SUCCESS(
+                f"Imported {added['recipes_created']} new and {added['recipes_updated']} updated recipes "
+                f"and {added['ingredients_created']} ingredients from JSON"
+            ))
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error importing from JSON: {str(e)}"))
@@ -205,11 +212,10 @@ class Command(BaseCommand):
                 current_product_code = None
                 current_description = None
                 current_cost_excl = None
-                
-                recipe_count = 0
-                ingredient_count = 0
-                
-                for row in csv_reader:
+
+                before = Counter(self.counters)
+
+                for row in self.progress(csv_reader):
                     if not row or len(row) < 2:
                         continue
                     
@@ -234,7 +240,7 @@ class Command(BaseCommand):
                         try:
                             department = Department.objects.get(name=current_department)
                         except Department.DoesNotExist:
-                            self.stdout.write(self.style.WARNING(f"Department not found: {current_department}, creating it"))
+                            self.warn(f"Department not found: {current_department}, creating it")
                             department = Department.objects.create(name=current_department)
                         
                         # Convert cost to Decimal
@@ -259,8 +265,8 @@ class Command(BaseCommand):
                             )
                             
                             if created:
-                                self.stdout.write(f"Created recipe from CSV: {current_recipe}")
-                                recipe_count += 1
+                                self.log(f"Created recipe from CSV: {current_recipe}")
+                                self.count('recipes_created')
                                 
                                 # Create recipe version for audit trail
                                 RecipeVersion.objects.create(
@@ -271,7 +277,8 @@ class Command(BaseCommand):
                                     previous_data={}  # Empty for initial import
                                 )
                             else:
-                                self.stdout.write(f"Updated recipe from CSV: {current_recipe}")
+                                self.log(f"Updated recipe from CSV: {current_recipe}")
+                                self.count('recipes_updated')
                         
                         continue
                     
@@ -295,7 +302,7 @@ class Command(BaseCommand):
                             unit_cost_val = Decimal(cost) if cost else Decimal('0')
                             total_cost_val = Decimal(total_cost) if total_cost else (quantity * unit_cost_val)
                         except InvalidOperation:
-                            self.stdout.write(self.style.WARNING(f"Invalid numeric value for ingredient: {ing_description}"))
+                            self.warn(f"Invalid numeric value for ingredient: {ing_description}")
                             continue
                         
                         # Create or update ingredient
@@ -313,7 +320,7 @@ class Command(BaseCommand):
                         )
                         
                         if ing_created:
-                            ingredient_count += 1
+                            self.count('ingredients_created')
                     
                     # Check for yield information
                     if current_recipe and row[0] == current_department and row[4] and row[4].strip().lower() == 'yield':
@@ -329,7 +336,11 @@ class Command(BaseCommand):
                 for recipe in Recipe.objects.all():
                     recipe.update_unit_cost()
                 
-                self.stdout.write(self.style.SUCCESS(f"Imported/updated {recipe_count} recipes and {ingredient_count} ingredients from CSV"))
+                added = self.counters - before
+                self.stdout.write(self.style.SUCCESS(
+                    f"Imported {added['recipes_created']} new and {added['recipes_updated']} updated recipes "
+                    f"and {added['ingredients_created']} ingredients from CSV"
+                ))
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error importing from CSV: {str(e)}"))
@@ -1,9 +1,9 @@
 import json
 import os
-from django.core.management.base import BaseCommand
+from core.command_runs import TimedCommand
 from core.models import Supplier, Department
 
-class Command(BaseCommand):
+class Command(TimedCommand):
     help = 'Import suppliers from JSON file'
 
     def add_arguments(self, parser):
@@ -23,61 +23,59 @@ class Command(BaseCommand):
             'HMR': Department.objects.get_or_create(name='HMR')[0]
         }
         
-        with open(json_file, 'r') as f:
+        with self.phase('load'), open(json_file, 'r') as f:
             suppliers_data = json.load(f)
             
-        created_count = 0
-        updated_count = 0
-        skipped_count = 0
-        
-        for supplier_data in suppliers_data:
-            supplier_code = supplier_data.get('supplier_code')
-            supplier_name = supplier_data.get('supplier_name')
-            
-            if not supplier_code or not supplier_name:
-                self.stdout.write(self.style.WARNING(f'Skipping supplier with missing code or name: {supplier_data}'))
-                skipped_count += 1
-                continue
-            
-            # Try to find existing supplier by code
-            supplier, created = Supplier.objects.get_or_create(
-                supplier_code=supplier_code,
-                defaults={
-                    'supplier_name': supplier_name,
-                    'contact_info': supplier_data.get('contact_info', ''),
-                    'address': supplier_data.get('address', ''),
-                    'country_of_origin': supplier_data.get('country_of_origin', 'South Africa')
-                }
-            )
-            
-            if created:
-                created_count += 1
-                self.stdout.write(f'Created supplier: {supplier_name} ({supplier_code})')
-            else:
-                # Update existing supplier
-                supplier.supplier_name = supplier_name
-                supplier.contact_info = supplier_data.get('contact_info', '')
-                supplier.address = supplier_data.get('address', '')
-                supplier.country_of_origin = supplier_data.get('country_of_origin', 'South Africa')
-                supplier.save()
-                updated_count += 1
-                self.stdout.write(f'Updated supplier: {supplier_name} ({supplier_code})')
-            
-            # Add department if specified in JSON
-            dept_name = supplier_data.get('department', '').upper()
-            if dept_name and dept_name in departments:
-                supplier.departments.add(departments[dept_name])
-                self.stdout.write(f'  - Added to department: {dept_name}')
-                
-            # Special handling for department names in supplier names
-            supplier_name_upper = supplier_name.upper()
-            for dept_key in departments:
-                if dept_key in supplier_name_upper and "IN HOUSE" in supplier_name_upper:
-                    supplier.departments.add(departments[dept_key])
-                    self.stdout.write(f'  - Added to department based on name: {dept_key}')
-                
+        with self.phase('import'):
+            for supplier_data in self.progress(suppliers_data, total=len(suppliers_data)):
+                supplier_code = supplier_data.get('supplier_code')
+                supplier_name = supplier_data.get('supplier_name')
+
+                if not supplier_code or not supplier_name:
+                    self.warn(f'Skipping supplier with missing code or name: {supplier_data}')
+                    self.count('skipped')
+                    continue
+
+                # Try to find existing supplier by code
+                supplier, created = Supplier.objects.get_or_create(
+                    supplier_code=supplier_code,
+                    defaults={
+                        'supplier_name': supplier_name,
+                        'contact_info': supplier_data.get('contact_info', ''),
+                        'address': supplier_data.get('address', ''),
+                        'country_of_origin': supplier_data.get('country_of_origin', 'South Africa')
+                    }
+                )
+
+                if created:
+                    self.count('created')
+                    self.log(f'Created supplier: {supplier_name} ({supplier_code})')
+                else:
+                    # Update existing supplier
+                    supplier.supplier_name = supplier_name
+                    supplier.contact_info = supplier_data.get('contact_info', '')
+                    supplier.address = supplier_data.get('address', '')
+                    supplier.country_of_origin = supplier_data.get('country_of_origin', 'South Africa')
+                    supplier.save()
+                    self.count('updated')
+                    self.log(f'Updated supplier: {supplier_name} ({supplier_code})')
+
+                # Add department if specified in JSON
+                dept_name = supplier_data.get('department', '').upper()
+                if dept_name and dept_name in departments:
+                    supplier.departments.add(departments[dept_name])
+                    self.log(f'  - Added to department: {dept_name}')
+
+                # Special handling for department names in supplier names
+                supplier_name_upper = supplier_name.upper()
+                for dept_key in departments:
+                    if dept_key in supplier_name_upper and "IN HOUSE" in supplier_name_upper:
+                        supplier.departments.add(departments[dept_key])
+                        self.log(f'  - Added to department based on name: {dept_key}')
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Import complete: {created_count} created, {updated_count} updated, {skipped_count} skipped'
+                f"Import complete: {self.counters['created']} created, {self.counters['updated']} updated, "
+                f"{self.counters['skipped']} skipped"
             )
         )
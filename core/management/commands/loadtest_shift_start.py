@@ -0,0 +1,292 @@
+"""Replay a store's shift start against a running server and report latency per endpoint.
+
+Usage:
+    python manage.py loadtest_shift_start [--base-url http://127.0.0.1:8000]
+        [--prefix Bench] [--tablets-per-department 9] [--ramp 10] [--rounds 1]
+        [--password loadtest] [--schema store1] [--output loadtest.json] [--keep-logs]
+
+At 06:00 every tablet in every department signs in at once. Each virtual
+tablet here is one user of the seeded benchmark dataset (seed_benchmark_data)
+and walks through what the staff page does on load:
+
+    login                 POST /api/token-auth/
+    current-user          GET  /api/users/me/
+    my-tasks              GET  /api/taskinstances/?assigned_to=<id>&due_date=<today>
+    my-assignments        GET  /api/temperature-check-assignments/my-assignments/
+    my-assignment         GET  /api/thermometer-verification-assignments/my-assignment/
+    verified-thermometers GET  /api/thermometers/verified/
+    todays-logs           GET  /api/temperature-logs/by-date/<today>/
+
+and, for the user holding the department's AM temperature-check assignment,
+lists the area units and posts an AM log for each (log-temperature).
+Tablets start at random points within --ramp seconds and run concurrently.
+With --rounds N the shift start is replayed N times, one round after the
+other: a round's tablets all finish before the next round's ramp begins, so
+concurrency stays at one session per tablet.
+
+Before the run the command prepares the dataset through the ORM: it gives
+the tablet users --password (one hash shared by all of them, so preparing
+stays fast) and today's AM temperature-check and thermometer-verification
+assignments. The server must use the same database (and, with --schema, a
+hostname that resolves to that tenant). The logs posted by the run are
+deleted afterwards unless --keep-logs is given. Only the standard library is
+used for HTTP, so the test runs offline.
+"""
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.instrumentation import percentile
+from core.models import (
+    Department, TemperatureCheckAssignment, TemperatureLog, Thermometer,
+    ThermometerVerificationAssignment, UserProfile,
+)
+
+STEPS = [
+    "login", "current-user", "my-tasks", "my-assignments", "my-assignment",
+    "verified-thermometers", "todays-logs", "area-units", "log-temperature",
+]
+
+
+class _Tablet:
+    """One signed-in device: an HTTP client that records every request's latency."""
+
+    def __init__(self, base_url, timeout, results, lock):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.results = results
+        self.lock = lock
+        self.token = None
+
+    def request(self, step, method, path, body=None, expect=(200,)):
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, content = exc.code, exc.read()
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as exc:
+            status, content = None, str(exc).encode()
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = status in expect
+        with self.lock:
+            entry = self.results[step]
+            entry["timings"].append(elapsed)
+            entry["statuses"][str(status)] += 1
+            if not ok:
+                entry["errors"] += 1
+                if len(entry["samples"]) < 3:
+                    detail = " ".join(content[:300].decode(errors="replace").split())[:160]
+                    entry["samples"].append(f"{method} {path}: {status} {detail}")
+        if not ok:
+            return None
+        return json.loads(content) if content else {}
+
+
+class Command(BaseCommand):
+    help = "Load-test the shift-start traffic pattern against a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to test.")
+        parser.add_argument("--prefix", default="Bench", help="Prefix of the seeded dataset (seed_benchmark_data).")
+        parser.add_argument("--tablets-per-department", type=int, default=9,
+                            help="Users per department that sign in (default: the manager and 8 staff).")
+        parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which the tablets start.")
+        parser.add_argument("--rounds", type=int, default=1,
+                            help="Times the shift start is replayed, one round after the other.")
+        parser.add_argument("--password", default="loadtest", help="Password given to the tablet users.")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for start times and readings.")
+        parser.add_argument("--schema", help="Tenant schema holding the dataset (django-tenants).")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+        parser.add_argument("--keep-logs", action="store_true", help="Don't delete the temperature logs the run posts.")
+
+    def handle(self, *args, **options):
+        if options["tablets_per_department"] < 1 or options["rounds"] < 1:
+            raise CommandError("--tablets-per-department and --rounds must be at least 1.")
+        self.options = options
+        self.random = random.Random(options["seed"])
+        if options["schema"]:
+            from django_tenants.utils import schema_context
+            context = schema_context(options["schema"])
+        else:
+            context = nullcontext()
+        with context:
+            tablets = self._prepare()
+            started_at = timezone.now()
+            try:
+                report = self._run(tablets)
+            finally:
+                if not options["keep_logs"]:
+                    deleted, _ = TemperatureLog.objects.filter(
+                        logged_by__in=[user for user, _ in tablets], created_at__gte=started_at,
+                    ).delete()
+                    self.stdout.write(f"Removed {deleted} temperature logs posted by the run.")
+        if options["output"]:
+            output = Path(options["output"])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    def _prepare(self):
+        """(user, has AM checks) for every tablet, with passwords and today's assignments in place."""
+        prefix = self.options["prefix"]
+        departments = list(Department.objects.filter(name__startswith=f"{prefix} Dept ").order_by("pk"))
+        if not departments:
+            raise CommandError(f"No '{prefix}' dataset; run seed_benchmark_data first.")
+        today = timezone.localdate()
+        password = make_password(self.options["password"])
+        tablets = []
+        for department in departments:
+            profiles = list(
+                UserProfile.objects.filter(department=department)
+                .select_related("user").order_by("role", "user__username")[:self.options["tablets_per_department"]]
+            )
+            staff = [profile.user for profile in profiles if profile.role == UserProfile.ROLE_STAFF]
+            manager = next((profile.user for profile in profiles if profile.role == UserProfile.ROLE_MANAGER), None)
+            if not staff:
+                raise CommandError(f"'{department.name}' has no staff among its first tablets.")
+            if not Thermometer.objects.filter(department=department, status="verified",
+                                              verification_expiry_date__gte=today).exists():
+                raise CommandError(f"'{department.name}' has no verified thermometer; reseed the dataset.")
+            check, _ = TemperatureCheckAssignment.objects.update_or_create(
+                department=department, assigned_date=today, time_period="AM",
+                defaults={"staff_member": staff[0], "assigned_by": manager, "is_active": True},
+            )
+            ThermometerVerificationAssignment.objects.filter(department=department, is_active=True).update(is_active=False)
+            ThermometerVerificationAssignment.objects.create(
+                department=department, staff_member=staff[-1], assigned_by=manager, assigned_date=today,
+            )
+            tablets.extend((profile.user, profile.user == check.staff_member) for profile in profiles)
+        User.objects.filter(pk__in=[user.pk for user, _ in tablets]).update(password=password, is_active=True)
+        self.stdout.write(
+            f"Prepared {len(tablets)} tablets in {len(departments)} departments "
+            f"({sum(1 for _, logs in tablets if logs)} logging AM temperatures)."
+        )
+        return tablets
+
+    def _shift_start(self, tablet, user, logs_temperatures, today):
+        """One tablet's requests at sign-in; stops at the first failed step it depends on."""
+        auth = tablet.request("login", "POST", "/api/token-auth/",
+                              {"username": user.username, "password": self.options["password"]})
+        if auth is None:
+            return
+        tablet.token = auth["token"]
+        me = tablet.request("current-user", "GET", "/api/users/me/")
+        if me is None:
+            return
+        tablet.request("my-tasks", "GET", f"/api/taskinstances/?assigned_to={me['id']}&due_date={today}")
+        assignments = tablet.request("my-assignments", "GET", "/api/temperature-check-assignments/my-assignments/")
+        # 404 is the normal answer for users who aren't verifying thermometers today.
+        tablet.request("my-assignment", "GET", "/api/thermometer-verification-assignments/my-assignment/",
+                       expect=(200, 404))
+        thermometers = tablet.request("verified-thermometers", "GET", "/api/thermometers/verified/")
+        tablet.request("todays-logs", "GET", f"/api/temperature-logs/by-date/{today}/")
+        if not (logs_temperatures and assignments and assignments.get("am_assignment") and thermometers):
+            return
+        areas = tablet.request("area-units", "GET", "/api/area-units/")
+        if areas is None:
+            return
+        for area in areas.get("results", areas) if isinstance(areas, dict) else areas:
+            low, high = Decimal(area["target_temperature_min"]), Decimal(area["target_temperature_max"])
+            reading = low + (high - low) * Decimal(self.random.random())
+            tablet.request("log-temperature", "POST", "/api/temperature-logs/", {
+                "area_unit_id": area["id"],
+                "thermometer_used_id": thermometers[0]["id"],
+                "temperature_reading": str(reading.quantize(Decimal("0.01"))),
+                "time_period": "AM",
+            }, expect=(201,))
+
+    def _run(self, tablets):
+        options = self.options
+        results = defaultdict(lambda: {"timings": [], "statuses": defaultdict(int), "errors": 0, "samples": []})
+        lock = threading.Lock()
+        today = timezone.localdate().isoformat()
+        started = time.perf_counter()
+        for round_number in range(1, options["rounds"] + 1):
+            self.stdout.write(f"Round {round_number}/{options['rounds']}: starting {len(tablets)} tablet sessions "
+                              f"against {options['base_url']} over {options['ramp']:g}s...")
+            self._run_round(tablets, results, lock, today)
+        elapsed = time.perf_counter() - started
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "base_url": options["base_url"],
+            "tablets": len(tablets),
+            "rounds": options["rounds"],
+            "ramp_seconds": options["ramp"],
+            "duration_seconds": round(elapsed, 2),
+            "requests": sum(len(entry["timings"]) for entry in results.values()),
+            "results": {},
+        }
+        for step in STEPS:
+            entry = results.get(step)
+            if entry is None:
+                continue
+            timings = entry["timings"]
+            report["results"][step] = {
+                "requests": len(timings),
+                "errors": entry["errors"],
+                "statuses": dict(entry["statuses"]),
+                "p50_ms": round(statistics.median(timings), 1),
+                "p95_ms": round(percentile(timings, 95), 1),
+                "p99_ms": round(percentile(timings, 99), 1),
+                "max_ms": round(max(timings), 1),
+                "error_samples": entry["samples"],
+            }
+        self._print_report(report)
+        return report
+
+    def _run_round(self, tablets, results, lock, today):
+        """Start every tablet once within --ramp seconds and wait for all of them."""
+        options = self.options
+        runs = list(tablets)
+        offsets = sorted(self.random.uniform(0, options["ramp"]) for _ in runs)
+        self.random.shuffle(runs)
+
+        def run_tablet(index):
+            user, logs_temperatures = runs[index]
+            delay = offsets[index] - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            tablet = _Tablet(options["base_url"], options["timeout"], results, lock)
+            self._shift_start(tablet, user, logs_temperatures, today)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(runs), thread_name_prefix="tablet") as pool:
+            list(pool.map(run_tablet, range(len(runs))))
+
+    def _print_report(self, report):
+        header = f"{'endpoint':<24} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        self.stdout.write("\n" + header)
+        self.stdout.write("-" * len(header))
+        for step, result in report["results"].items():
+            line = (f"{step:<24} {result['requests']:>8} {result['errors']:>6} {result['p50_ms']:>9.1f} "
+                    f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['max_ms']:>9.1f}")
+            self.stdout.write(self.style.ERROR(line) if result["errors"] else line)
+            for sample in result["error_samples"]:
+                self.stdout.write(f"    {sample}")
+        rate = report["requests"] / report["duration_seconds"] if report["duration_seconds"] else 0.0
+        self.stdout.write(f"\n{report['requests']} requests in {report['duration_seconds']:.1f}s ({rate:.1f} req/s)")
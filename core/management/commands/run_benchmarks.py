@@ -0,0 +1,243 @@
+"""Time the key API endpoints in-process and record the results as JSON.
+
+Usage:
+    python manage.py run_benchmarks [--department "Bench Dept 1"] [--iterations 5]
+        [--output benchmark-results/run.json] [--compare benchmark-results/base.json]
+        [--only task-list,recipe-list] [--warm-cache] [--fail-on-regression]
+
+Seed a dataset first with `seed_benchmark_data`. Each endpoint is requested
+through the full middleware and view stack as the department's manager;
+the command records latency percentiles, SQL query count and response size.
+By default the shared response cache is invalidated before every request
+so the numbers reflect the work the endpoint does; --warm-cache measures
+cached responses instead. Results go to benchmark-results/<commit>.json
+unless --output is given. A response with status 400 or above makes the
+endpoint an error result rather than a timing. --compare prints the change
+against an earlier results file and flags endpoints whose median got more
+than --threshold slower, or that now fail.
+"""
+import json
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import caching
+from core.instrumentation import QueryRecorder, percentile
+from core.models import Department, DocumentTemplate, GeneratedDocument, TaskInstance, TemperatureLog, UserProfile
+from core.recipe_models import Recipe, WasteRecord
+
+
+def _benchmarks(department, template, today):
+    """(name, method, path, body) for each benchmarked endpoint."""
+    report_start = (today - timedelta(days=30)).isoformat()
+    return [
+        ("task-list", "get", "/api/taskinstances/", None),
+        ("task-list-pending", "get", "/api/taskinstances/?status=pending", None),
+        ("temperature-manager-summary", "get", "/api/temperature-logs/manager-summary/", None),
+        ("temperature-areas-with-status", "get", "/api/temperature-logs/areas-with-status/", None),
+        ("temperature-logs-by-date", "get", f"/api/temperature-logs/by-date/{(today - timedelta(days=1)).isoformat()}/", None),
+        ("pdf-generation", "post", "/api/generated-documents/", {
+            "template_id": template.pk if template else None,
+            "department_id": department.pk,
+            "parameters": {"startDate": report_start, "endDate": today.isoformat()},
+        }),
+        ("recipe-list", "get", "/api/recipes/", None),
+        ("waste-summary", "get", "/api/waste-records/summary_by_department/", None),
+        ("receiving-list", "get", "/api/receiving-records/", None),
+    ]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Command(BaseCommand):
+    help = "Benchmark the key API endpoints and write the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--department", help="Department name to benchmark as (default: first 'Bench Dept').")
+        parser.add_argument("--iterations", type=int, default=5, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=1, help="Untimed requests per endpoint first.")
+        parser.add_argument("--only", help="Comma-separated benchmark names to run.")
+        parser.add_argument("--warm-cache", action="store_true", help="Don't invalidate the response cache between requests.")
+        parser.add_argument("--output", help="Results file (default: benchmark-results/<commit>.json).")
+        parser.add_argument("--compare", help="Earlier results file to compare against.")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="Relative p50 slowdown flagged as a regression (default 0.2 = 20%%).")
+        parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero on regressions.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        department = self._department(options["department"])
+        manager = (
+            UserProfile.objects.filter(department=department, role=UserProfile.ROLE_MANAGER)
+            .select_related("user").first()
+        )
+        if manager is None:
+            raise CommandError(f"Department '{department.name}' has no manager to benchmark as.")
+        template = DocumentTemplate.objects.filter(department=department, template_type="temperature").first()
+
+        benchmarks = _benchmarks(department, template, timezone.localdate())
+        if options["only"]:
+            wanted = {name.strip() for name in options["only"].split(",")}
+            unknown = wanted - {name for name, *_ in benchmarks}
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+            benchmarks = [benchmark for benchmark in benchmarks if benchmark[0] in wanted]
+
+        client = APIClient()
+        client.force_authenticate(manager.user)
+        last_document = GeneratedDocument.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+        self.stdout.write(f"Benchmarking as {manager.user.username} ({department.name}), "
+                          f"{options['iterations']} iterations, {connection.vendor}...")
+        setup_test_environment(debug=False)  # allows the test client's host
+        try:
+            results = {}
+            for name, method, path, body in benchmarks:
+                results[name] = self._run(client, method, path, body, options)
+                self._print_result(name, results[name])
+        finally:
+            teardown_test_environment()
+            self._remove_generated_documents(last_document)
+
+        report = {
+            "commit": _git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "department": department.name,
+            "iterations": options["iterations"],
+            "warm_cache": options["warm_cache"],
+            "dataset": {
+                "task_instances": TaskInstance.objects.filter(department=department).count(),
+                "temperature_logs": TemperatureLog.objects.filter(department=department).count(),
+                "recipes": Recipe.objects.filter(department=department).count(),
+                "waste_records": WasteRecord.objects.filter(department=department).count(),
+            },
+            "results": results,
+        }
+        output = Path(options["output"] or Path(settings.BASE_DIR) / "benchmark-results" / f"{report['commit']}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options["compare"]:
+            regressions = self._compare(report, options["compare"], options["threshold"])
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"Regressions: {', '.join(regressions)}")
+
+    def _department(self, name):
+        if name:
+            department = Department.objects.filter(name=name).first()
+        else:
+            department = Department.objects.filter(name__startswith="Bench Dept ").order_by("pk").first()
+        if department is None:
+            raise CommandError("No department to benchmark; run seed_benchmark_data or pass --department.")
+        return department
+
+    def _request(self, client, method, path, body, warm_cache):
+        if not warm_cache:
+            for namespace in caching.namespaces():
+                caching.invalidate(namespace)
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(recorder))
+            started = time.perf_counter()
+            if body is None:
+                response = getattr(client, method)(path)
+            else:
+                response = getattr(client, method)(path, body, format="json")
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+            elapsed = (time.perf_counter() - started) * 1000
+        return response.status_code, elapsed, recorder.count, len(content)
+
+    def _run(self, client, method, path, body, options):
+        for _ in range(options["warmup"]):
+            try:
+                self._request(client, method, path, body, options["warm_cache"])
+            except Exception:  # reported by the timed run below
+                pass
+        timings, queries, sizes, statuses = [], [], [], set()
+        for _ in range(options["iterations"]):
+            try:
+                status, elapsed, query_count, size = self._request(client, method, path, body, options["warm_cache"])
+            except Exception as exc:  # e.g. the traceability DB is unreachable
+                return {"method": method.upper(), "path": path, "error": f"{type(exc).__name__}: {exc}"}
+            if status >= 400:
+                # An error page is not a timing of the endpoint's work.
+                return {"method": method.upper(), "path": path, "status": [status], "error": f"HTTP {status}"}
+            statuses.add(status)
+            timings.append(elapsed)
+            queries.append(query_count)
+            sizes.append(size)
+        return {
+            "method": method.upper(),
+            "path": path,
+            "status": sorted(statuses),
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "min_ms": round(min(timings), 2),
+            "max_ms": round(max(timings), 2),
+            "queries": max(queries),
+            "response_bytes": max(sizes),
+        }
+
+    def _print_result(self, name, result):
+        if "error" in result:
+            self.stdout.write(self.style.WARNING(f"  {name:<32} error: {result['error'][:100]}"))
+            return
+        self.stdout.write(
+            f"  {name:<32} p50 {result['p50_ms']:>9.1f} ms  p95 {result['p95_ms']:>9.1f} ms  "
+            f"{result['queries']:>4} queries  {result['response_bytes']:>9} B  status {result['status']}"
+        )
+
+    def _remove_generated_documents(self, last_pk):
+        """Delete the documents (and files) created by the PDF benchmark."""
+        for document in GeneratedDocument.objects.filter(pk__gt=last_pk):
+            if document.generated_file:
+                document.generated_file.delete(save=False)
+            document.delete()
+
+    def _compare(self, report, baseline_path, threshold):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text())
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {baseline_path}: {exc}") from exc
+        self.stdout.write(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+        regressions = []
+        for name, result in report["results"].items():
+            before = baseline.get("results", {}).get(name)
+            if not before or "error" in before:
+                continue
+            if "error" in result:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"  {name:<32} now fails: {result['error'][:100]}  REGRESSION"))
+                continue
+            change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] if before["p50_ms"] else 0.0
+            line = (f"  {name:<32} p50 {before['p50_ms']:>9.1f} -> {result['p50_ms']:>9.1f} ms ({change:+.0%})  "
+                    f"queries {before['queries']} -> {result['queries']}")
+            if change > threshold or result["queries"] > before["queries"]:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+            else:
+                self.stdout.write(line)
+        return regressions
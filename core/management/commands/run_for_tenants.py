@@ -0,0 +1,101 @@
+"""Run a management command in every tenant schema in parallel.
+
+Usage:
+    python manage.py run_for_tenants [--workers 4] [--schemas a,b] [--exclude c]
+        [--include-public] <command> [command args...]
+
+Examples:
+    python manage.py run_for_tenants --workers 8 generate_tasks
+    python manage.py run_for_tenants archive_completed_tasks --dry-run
+
+Options for this runner go before the command name; everything after the
+command name is passed to the command. Each schema runs in its own worker
+process, so one store's failure doesn't stop the others. The command prints
+a line per schema as it finishes, then a summary with per-schema timings,
+and exits non-zero if any schema failed. Use -v 2 to also print each
+schema's command output.
+"""
+import argparse
+import time
+
+from django.core.management import get_commands
+from django.core.management.base import BaseCommand, CommandError
+
+from core.tenant_runner import run_across_tenants, tenant_schemas
+
+
+def _schema_list(value):
+    return [schema.strip() for schema in value.split(',') if schema.strip()]
+
+
+class Command(BaseCommand):
+    help = "Run a management command across all tenant schemas using a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Parallel worker processes (default: CPU count).")
+        parser.add_argument("--schemas", type=_schema_list, default=None,
+                            help="Comma-separated schemas to run in (default: all tenants).")
+        parser.add_argument("--exclude", type=_schema_list, default=None,
+                            help="Comma-separated schemas to skip.")
+        parser.add_argument("--include-public", action="store_true",
+                            help="Also run in the public schema.")
+        parser.add_argument("command_name", help="Management command to run in each schema.")
+        parser.add_argument("command_args", nargs=argparse.REMAINDER,
+                            help="Arguments passed through to the command.")
+
+    def handle(self, *args, **options):
+        command_name = options["command_name"]
+        if command_name not in get_commands():
+            raise CommandError(f"Unknown command: {command_name}")
+        if command_name == "run_for_tenants":
+            raise CommandError("run_for_tenants cannot run itself.")
+        if options["workers"] is not None and options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        schemas = tenant_schemas(
+            include_public=options["include_public"],
+            only=options["schemas"],
+            exclude=options["exclude"],
+        )
+        if options["schemas"]:
+            missing = sorted(set(options["schemas"]) - set(schemas))
+            if missing:
+                self.stdout.write(self.style.WARNING(f"Skipping unknown or excluded schemas: {', '.join(missing)}"))
+        if not schemas:
+            raise CommandError("No tenant schemas to run in.")
+
+        verbosity = options["verbosity"]
+        self.stdout.write(f"Running '{command_name}' in {len(schemas)} schema(s)...")
+
+        def report(result):
+            status = self.style.SUCCESS("ok") if result.ok else self.style.ERROR("FAILED")
+            self.stdout.write(f"  {result.schema_name}: {status} in {result.seconds:.1f}s")
+            if verbosity >= 2 and result.output:
+                for line in result.output.rstrip().splitlines():
+                    self.stdout.write(f"    [{result.schema_name}] {line}")
+
+        started = time.monotonic()
+        results = run_across_tenants(
+            command_name, options["command_args"], schemas,
+            workers=options["workers"], on_result=report,
+        )
+        elapsed = time.monotonic() - started
+
+        failed = [result for result in results if not result.ok]
+        slowest = max(results, key=lambda result: result.seconds)
+        total = sum(result.seconds for result in results)
+        self.stdout.write("")
+        self.stdout.write(f"{'schema':<30} {'status':<8} {'seconds':>8}")
+        for result in results:
+            self.stdout.write(f"{result.schema_name:<30} {'ok' if result.ok else 'FAILED':<8} {result.seconds:>8.1f}")
+        self.stdout.write(
+            f"\n{len(results) - len(failed)} succeeded, {len(failed)} failed in {elapsed:.1f}s "
+            f"(sum of per-schema time {total:.1f}s, slowest {slowest.schema_name} {slowest.seconds:.1f}s)."
+        )
+        for result in failed:
+            self.stderr.write(f"\n--- {result.schema_name} ---\n{result.error.rstrip()}")
+        if failed:
+            raise CommandError(f"'{command_name}' failed in {len(failed)} schema(s): "
+                               + ", ".join(result.schema_name for result in failed))
+        self.stdout.write(self.style.SUCCESS("All schemas completed."))
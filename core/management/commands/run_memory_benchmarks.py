@@ -0,0 +1,215 @@
+"""Check that the document endpoints' memory stays bounded as their input grows.
+
+Usage:
+    python manage.py run_memory_benchmarks [--department "Bench Dept 1"]
+        [--files 4,16] [--file-kb 512] [--pdf-days 7,28]
+        [--max-bytes-per-byte 0.25] [--max-kb-per-row 50] [--output memory.json]
+
+Runs each endpoint in-process, as the department's manager, at every input
+size with memory profiling on (core.memory_profiling). It then compares the
+Python allocation peaks at the smallest and largest sizes:
+
+* bulk-download: POST /api/documents/bulk-download/ with --files documents
+  of --file-kb random bytes each. The extra peak per extra byte of input must
+  stay under --max-bytes-per-byte. An archive built in memory costs more than
+  1.0; a streamed one costs close to 0.
+* bulk-upload: POST /api/documents/bulk_upload/ with the same files, under
+  the same budget.
+* pdf-generation: POST /api/generated-documents/ for the last --pdf-days
+  days of temperature logs (seed the dataset with seed_benchmark_data). The
+  extra peak per extra log row must stay under --max-kb-per-row.
+
+The command exits non-zero when a scenario is over budget. Documents and
+files created by the run are deleted afterwards.
+"""
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import memory_profiling
+from core.models import Department, Document, DocumentTemplate, GeneratedDocument, TemperatureLog, UserProfile
+
+
+def _sizes(value):
+    sizes = sorted({int(size) for size in value.split(",") if size.strip()})
+    if len(sizes) < 2 or sizes[0] < 1:
+        raise CommandError(f"Need at least two positive sizes, got '{value}'.")
+    return sizes
+
+
+class Command(BaseCommand):
+    help = "Assert that memory stays bounded as the PDF and ZIP endpoints' input grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--department", help="Department name to run as (default: first 'Bench Dept').")
+        parser.add_argument("--files", default="4,16", help="Comma-separated document counts for the ZIP scenarios.")
+        parser.add_argument("--file-kb", type=int, default=512, help="Size of each document in KB.")
+        parser.add_argument("--pdf-days", default="7,28", help="Comma-separated report ranges in days.")
+        parser.add_argument("--max-bytes-per-byte", type=float, default=0.25,
+                            help="ZIP budget: extra peak bytes per extra input byte.")
+        parser.add_argument("--max-kb-per-row", type=float, default=50.0,
+                            help="PDF budget: extra peak KB per extra temperature log row.")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.department = self._department(options["department"])
+        manager = (
+            UserProfile.objects.filter(department=self.department, role=UserProfile.ROLE_MANAGER)
+            .select_related("user").first()
+        )
+        if manager is None:
+            raise CommandError(f"Department '{self.department.name}' has no manager to run as.")
+        self.manager = manager.user
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+        scenarios = [
+            ("bulk-download", "input_mb", self._bulk_download, _sizes(options["files"]), options["max_bytes_per_byte"]),
+            ("bulk-upload", "input_mb", self._bulk_upload, _sizes(options["files"]), options["max_bytes_per_byte"]),
+            ("pdf-generation", "rows", self._pdf_generation, _sizes(options["pdf_days"]), options["max_kb_per_row"]),
+        ]
+        setup_test_environment(debug=False)  # allows the test client's host
+        report = {"created_at": timezone.now().isoformat(), "department": self.department.name, "scenarios": {}}
+        failures = []
+        try:
+            with override_settings(MEMORY_PROFILING_ENABLED=True):
+                for name, unit, run, sizes, budget in scenarios:
+                    runs = [run(size) for size in sizes]
+                    result = self._evaluate(unit, runs, budget)
+                    report["scenarios"][name] = result
+                    self._print_result(name, unit, result)
+                    if not result["bounded"]:
+                        failures.append(name)
+        finally:
+            teardown_test_environment()
+
+        if options["output"]:
+            output = Path(options["output"])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+        if failures:
+            raise CommandError(f"Memory grows with input beyond budget: {', '.join(failures)}")
+
+    def _department(self, name):
+        if name:
+            department = Department.objects.filter(name=name).first()
+        else:
+            department = Department.objects.filter(name__startswith="Bench Dept ").order_by("pk").first()
+        if department is None:
+            raise CommandError("No department to run as; run seed_benchmark_data or pass --department.")
+        return department
+
+    def _random_files(self, count):
+        size = self.options["file_kb"] * 1024
+        return [(f"memory-benchmark-{n}.bin", os.urandom(size)) for n in range(count)], count * size
+
+    def _profile(self, response):
+        profile_id = response.get("X-Memory-Profile-Id")
+        profile = next((entry for entry in memory_profiling.profiles() if entry["id"] == profile_id), None)
+        if response.status_code >= 400 or profile is None:
+            raise CommandError(f"{response.status_code} without a memory profile: {response.content[:200]!r}")
+        return profile
+
+    def _remove(self, documents):
+        for document in documents:
+            document.file.delete(save=False)
+            document.delete()
+
+    def _bulk_download(self, count):
+        files, input_bytes = self._random_files(count)
+        documents = [
+            Document.objects.create(title=name, file=ContentFile(data, name=name),
+                                    department=self.department, uploaded_by=self.manager)
+            for name, data in files
+        ]
+        try:
+            response = self.client.post("/api/documents/bulk-download/",
+                                        {"ids": [document.pk for document in documents]}, format="json")
+            profile = self._profile(response)
+            b"".join(response.streaming_content)
+            response.close()
+        finally:
+            self._remove(documents)
+        return {"size": count, "input": input_bytes / (1024 * 1024), "profile": profile}
+
+    def _bulk_upload(self, count):
+        files, input_bytes = self._random_files(count)
+        last_pk = Document.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        try:
+            response = self.client.post("/api/documents/bulk_upload/", {
+                "files": [SimpleUploadedFile(name, data) for name, data in files],
+            }, format="multipart")
+            profile = self._profile(response)
+        finally:
+            self._remove(Document.objects.filter(pk__gt=last_pk, department=self.department))
+        return {"size": count, "input": input_bytes / (1024 * 1024), "profile": profile}
+
+    def _pdf_generation(self, days):
+        template = DocumentTemplate.objects.filter(department=self.department, template_type="temperature").first()
+        if template is None:
+            raise CommandError(f"'{self.department.name}' has no temperature document template; run seed_benchmark_data.")
+        end = timezone.localdate()
+        start = end - timedelta(days=days - 1)
+        rows = TemperatureLog.objects.on_dates(start, end).filter(department=self.department).count()
+        last_pk = GeneratedDocument.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        try:
+            response = self.client.post("/api/generated-documents/", {
+                "template_id": template.pk,
+                "department_id": self.department.pk,
+                "parameters": {"startDate": start.isoformat(), "endDate": end.isoformat()},
+            }, format="json")
+            document = GeneratedDocument.objects.filter(pk__gt=last_pk).order_by("-pk").first()
+            if response.status_code >= 400 or document is None or not document.memory_profile:
+                raise CommandError(f"PDF generation failed ({response.status_code}): {response.content[:200]!r}")
+            profile = document.memory_profile
+        finally:
+            for document in GeneratedDocument.objects.filter(pk__gt=last_pk):
+                if document.generated_file:
+                    document.generated_file.delete(save=False)
+                document.delete()
+        return {"size": days, "input": rows, "profile": profile}
+
+    def _evaluate(self, unit, runs, budget):
+        first, last = runs[0], runs[-1]
+        extra_input = last["input"] - first["input"]
+        extra_peak_mb = last["profile"]["python_peak_mb"] - first["profile"]["python_peak_mb"]
+        if unit == "rows":
+            growth = extra_peak_mb * 1024 / extra_input if extra_input else 0.0  # KB per row
+        else:
+            growth = extra_peak_mb / extra_input if extra_input else 0.0  # bytes per byte
+        return {
+            "unit": unit,
+            "growth": round(growth, 3),
+            "budget": budget,
+            "bounded": growth <= budget,
+            "runs": [
+                {
+                    "size": run["size"],
+                    unit: round(run["input"], 2),
+                    "python_peak_mb": run["profile"]["python_peak_mb"],
+                    "rss_peak_mb": run["profile"]["rss_peak_mb"],
+                    "seconds": run["profile"]["seconds"],
+                    "top_allocations": run["profile"]["top_allocations"][:3],
+                }
+                for run in runs
+            ],
+        }
+
+    def _print_result(self, name, unit, result):
+        self.stdout.write(f"{name}:")
+        for run in result["runs"]:
+            self.stdout.write(f"  {unit} {run[unit]:>10}  python peak {run['python_peak_mb']:>8.2f} MB  "
+                              f"rss peak {run['rss_peak_mb'] or 0:>8.1f} MB  {run['seconds']:>6.2f}s")
+        per = "KB per row" if unit == "rows" else "bytes per input byte"
+        line = f"  growth {result['growth']} {per} (budget {result['budget']})"
+        self.stdout.write(self.style.SUCCESS(line) if result["bounded"] else self.style.ERROR(line + "  UNBOUNDED"))
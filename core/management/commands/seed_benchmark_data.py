@@ -0,0 +1,384 @@
+"""Seed a synthetic multi-department dataset for benchmarking.
+
+Usage:
+    python manage.py seed_benchmark_data [--departments 5] [--days 365]
+        [--items 600] [--tasks-per-day 40] [--schema store1] [--reset]
+
+Creates departments named "<prefix> Dept N" with staff, cleaning items, a
+year of task instances and completion logs, twice-daily temperature logs
+per area unit, recipes with ingredients, an inventory ledger and waste
+records, plus one temperature document template per department for the PDF
+benchmark. Rows are written with bulk_create, so model signals don't run;
+the shared caches are invalidated at the end instead. The same --seed gives
+the same dataset, so benchmark runs against it are comparable.
+
+--reset deletes a previous dataset with the same prefix first (departments
+cascade to everything that belongs to them). --schema seeds an existing
+tenant schema instead of the current one.
+"""
+import random
+import time as time_module
+from contextlib import nullcontext
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core import caching, conditional
+from core.models import (
+    AreaUnit, CleaningItem, CompletionLog, Department, DocumentTemplate,
+    TaskInstance, TemperatureLog, Thermometer, UserProfile,
+)
+from core.recipe_models import (
+    InventoryItem, InventoryTransaction, Recipe, RecipeIngredient, WasteRecord,
+)
+
+BATCH_SIZE = 2000
+
+FREQUENCIES = ['daily'] * 5 + ['weekly'] * 3 + ['monthly', 'quarterly']
+AREA_TARGETS = [(Decimal('0.00'), Decimal('4.00')), (Decimal('-22.00'), Decimal('-18.00')), (Decimal('60.00'), Decimal('85.00'))]
+PAST_STATUSES = ['completed'] * 17 + ['missed'] * 2 + ['requires_attention']
+WASTE_REASONS = [reason for reason, _ in WasteRecord.WASTE_REASONS]
+
+
+def _money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic multi-department dataset for performance benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prefix", default="Bench", help="Name prefix for everything created.")
+        parser.add_argument("--departments", type=int, default=5)
+        parser.add_argument("--staff", type=int, default=8, help="Staff per department (plus one manager).")
+        parser.add_argument("--items", type=int, default=600, help="Cleaning items per department.")
+        parser.add_argument("--area-units", type=int, default=6, help="Temperature area units per department.")
+        parser.add_argument("--days", type=int, default=365, help="Days of history to generate.")
+        parser.add_argument("--tasks-per-day", type=int, default=40, help="Task instances per department per day.")
+        parser.add_argument("--recipes", type=int, default=30, help="Recipes per department.")
+        parser.add_argument("--ingredients", type=int, default=8, help="Ingredients per recipe.")
+        parser.add_argument("--inventory-items", type=int, default=50, help="Inventory items per department.")
+        parser.add_argument("--transactions-per-day", type=int, default=10, help="Inventory transactions per department per day.")
+        parser.add_argument("--waste-per-day", type=int, default=4, help="Waste records per department per day.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument("--schema", help="Tenant schema to seed (django-tenants).")
+        parser.add_argument("--reset", action="store_true", help="Delete an existing dataset with this prefix first.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options["prefix"]
+        self.random = random.Random(options["seed"])
+        if options["departments"] < 1 or options["days"] < 1:
+            raise CommandError("--departments and --days must be at least 1.")
+
+        if options["schema"]:
+            from django_tenants.utils import schema_context
+            context = schema_context(options["schema"])
+        else:
+            context = nullcontext()
+        with context:
+            if options["reset"]:
+                self._reset()
+            elif Department.objects.filter(name__startswith=f"{self.prefix} Dept ").exists():
+                raise CommandError(f"A '{self.prefix}' dataset already exists; use --reset or another --prefix.")
+            self._seed()
+
+    def _phase(self, label, func):
+        started = time_module.monotonic()
+        count = func()
+        self.stdout.write(f"  {label}: {count} rows in {time_module.monotonic() - started:.1f}s")
+
+    def _reset(self):
+        departments = Department.objects.filter(name__startswith=f"{self.prefix} Dept ")
+        deleted, _ = departments.delete()
+        users, _ = User.objects.filter(username__startswith=f"{self.prefix.lower()}_").delete()
+        self.stdout.write(f"Removed previous '{self.prefix}' dataset ({deleted + users} rows).")
+
+    def _seed(self):
+        options = self.options
+        today = timezone.localdate()
+        self.start_date = today - timedelta(days=options["days"] - 1)
+        self.today = today
+        self.stdout.write(
+            f"Seeding {options['departments']} departments, {options['days']} days "
+            f"({self.start_date} to {today})..."
+        )
+        with transaction.atomic():
+            self._phase("departments and staff", self._seed_departments)
+            self._phase("cleaning items", self._seed_cleaning_items)
+            self._phase("area units and thermometers", self._seed_areas)
+            self._phase("document templates", self._seed_templates)
+            self._phase("recipes and ingredients", self._seed_recipes)
+            self._phase("inventory items and ledger", self._seed_inventory)
+        # The large tables are committed in batches so memory stays flat.
+        self._phase("task instances and completion logs", self._seed_tasks)
+        self._phase("temperature logs", self._seed_temperature_logs)
+        self._phase("waste records", self._seed_waste)
+
+        # bulk_create skips the signals that keep caches and ETags fresh.
+        for model in (CleaningItem, TaskInstance, CompletionLog, AreaUnit, TemperatureLog,
+                      Recipe, RecipeIngredient, InventoryItem, InventoryTransaction, WasteRecord, Department):
+            caching.invalidate_for_model(model)
+            conditional.touch(model)
+        self.stdout.write(self.style.SUCCESS(f"Seeded '{self.prefix}' dataset."))
+
+    def _days(self):
+        for offset in range(self.options["days"]):
+            yield self.start_date + timedelta(days=offset)
+
+    def _aware(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def _seed_departments(self):
+        prefix = self.prefix
+        self.departments = Department.objects.bulk_create(
+            Department(name=f"{prefix} Dept {n}") for n in range(1, self.options["departments"] + 1)
+        )
+        users, roles = [], []
+        for department in self.departments:
+            n = department.name.rsplit(' ', 1)[-1]
+            users.append(User(username=f"{prefix.lower()}_d{n}_manager", first_name="Manager", last_name=n))
+            roles.append((department, UserProfile.ROLE_MANAGER))
+            for s in range(1, self.options["staff"] + 1):
+                users.append(User(username=f"{prefix.lower()}_d{n}_s{s}", first_name=f"Staff{s}", last_name=n))
+                roles.append((department, UserProfile.ROLE_STAFF))
+        for user in users:
+            user.set_unusable_password()
+        users = User.objects.bulk_create(users)
+        profiles = UserProfile.objects.bulk_create(
+            UserProfile(user=user, department=department, role=role)
+            for user, (department, role) in zip(users, roles)
+        )
+        self.staff = {department.pk: [] for department in self.departments}
+        self.managers = {}
+        for profile in profiles:
+            if profile.role == UserProfile.ROLE_MANAGER:
+                self.managers[profile.department_id] = profile.user
+            self.staff[profile.department_id].append(profile)
+        return len(self.departments) + len(users) + len(profiles)
+
+    def _seed_cleaning_items(self):
+        items = [
+            CleaningItem(
+                name=f"Item {n:04d}",
+                department=department,
+                frequency=self.random.choice(FREQUENCIES),
+                equipment="Cloth, bucket",
+                chemical="Sanitiser",
+                method="Wash, rinse, sanitise and air dry.",
+            )
+            for department in self.departments
+            for n in range(1, self.options["items"] + 1)
+        ]
+        CleaningItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+        self.items = {department.pk: [] for department in self.departments}
+        for item in items:
+            self.items[item.department_id].append(item)
+        return len(items)
+
+    def _seed_areas(self):
+        areas, thermometers = [], []
+        for department in self.departments:
+            for n in range(1, self.options["area_units"] + 1):
+                low, high = AREA_TARGETS[n % len(AREA_TARGETS)]
+                areas.append(AreaUnit(
+                    name=f"Unit {n}", department=department,
+                    target_temperature_min=low, target_temperature_max=high,
+                ))
+            for n in range(1, 3):
+                thermometers.append(Thermometer(
+                    serial_number=f"{self.prefix}-{department.pk}-{n}",
+                    model_identifier="TP-100",
+                    department=department,
+                    status='verified',
+                    last_verification_date=self.today,
+                    verification_expiry_date=self.today + timedelta(days=90),
+                ))
+        AreaUnit.objects.bulk_create(areas)
+        Thermometer.objects.bulk_create(thermometers)
+        self.areas = {department.pk: [] for department in self.departments}
+        for area in areas:
+            self.areas[area.department_id].append(area)
+        self.thermometers = {thermometer.department_id: thermometer for thermometer in thermometers}
+        return len(areas) + len(thermometers)
+
+    def _seed_templates(self):
+        templates = DocumentTemplate.objects.bulk_create(
+            DocumentTemplate(
+                name=f"{department.name} temperature log",
+                department=department,
+                template_type='temperature',
+                created_by=self.managers[department.pk],
+            )
+            for department in self.departments
+        )
+        return len(templates)
+
+    def _seed_recipes(self):
+        recipes, ingredients = [], []
+        for department in self.departments:
+            for n in range(1, self.options["recipes"] + 1):
+                recipes.append(Recipe(
+                    department=department,
+                    product_code=f"{self.prefix[:3].upper()}{department.pk}-{n:03d}",
+                    name=f"Recipe {n}",
+                    yield_quantity=Decimal(self.random.randint(5, 50)),
+                    created_by=self.managers[department.pk],
+                ))
+        Recipe.objects.bulk_create(recipes, batch_size=BATCH_SIZE)
+        for recipe in recipes:
+            total = Decimal('0')
+            for n in range(1, self.options["ingredients"] + 1):
+                quantity = Decimal(self.random.randint(100, 5000)) / 1000
+                unit_cost = _money(self.random.uniform(5, 150))
+                ingredients.append(RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_code=f"ING{n:03d}",
+                    ingredient_name=f"Ingredient {n}",
+                    quantity=quantity,
+                    unit_cost=unit_cost,
+                    total_cost=_money(quantity * unit_cost),
+                ))
+                total += quantity * unit_cost
+            recipe.unit_cost = _money(total / recipe.yield_quantity)
+        RecipeIngredient.objects.bulk_create(ingredients, batch_size=BATCH_SIZE)
+        Recipe.objects.bulk_update(recipes, ['unit_cost'], batch_size=BATCH_SIZE)
+        self.recipes = {department.pk: [] for department in self.departments}
+        for recipe in recipes:
+            self.recipes[recipe.department_id].append(recipe)
+        return len(recipes) + len(ingredients)
+
+    def _seed_inventory(self):
+        items = [
+            InventoryItem(
+                ingredient_code=f"ING{n:03d}",
+                ingredient_name=f"Ingredient {n}",
+                department=department,
+                current_stock=Decimal('0'),
+                unit_cost=_money(self.random.uniform(5, 150)),
+                reorder_level=Decimal('20'),
+            )
+            for department in self.departments
+            for n in range(1, self.options["inventory_items"] + 1)
+        ]
+        InventoryItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+        self.inventory = {department.pk: [] for department in self.departments}
+        for item in items:
+            self.inventory[item.department_id].append(item)
+
+        transactions = []
+        for day in self._days():
+            for department in self.departments:
+                recorder = self.managers[department.pk]
+                for _ in range(self.options["transactions_per_day"]):
+                    item = self.random.choice(self.inventory[department.pk])
+                    kind = 'purchase' if self.random.random() < 0.4 else 'production_use'
+                    quantity = Decimal(self.random.randint(1, 40))
+                    item.current_stock += quantity if kind == 'purchase' else -quantity
+                    transactions.append(InventoryTransaction(
+                        inventory_item=item, transaction_type=kind, quantity=quantity,
+                        transaction_date=self._aware(day, self.random.randint(6, 17), self.random.randint(0, 59)),
+                        recorded_by=recorder,
+                    ))
+        InventoryTransaction.objects.bulk_create(transactions, batch_size=BATCH_SIZE)
+        InventoryItem.objects.bulk_update(items, ['current_stock'], batch_size=BATCH_SIZE)
+        return len(items) + len(transactions)
+
+    def _seed_tasks(self):
+        tasks_per_day = self.options["tasks_per_day"]
+        now = timezone.now()
+        total = 0
+        pending_tasks = []
+
+        def flush():
+            nonlocal total
+            with transaction.atomic():
+                created = TaskInstance.objects.bulk_create(pending_tasks, batch_size=BATCH_SIZE)
+                logs = [
+                    CompletionLog(task_instance=task, user=task.assigned_to.user, completed_at=task.completed_at)
+                    for task in created if task.status == 'completed'
+                ]
+                CompletionLog.objects.bulk_create(logs, batch_size=BATCH_SIZE)
+            total += len(created) + len(logs)
+            pending_tasks.clear()
+
+        # A week of upcoming pending tasks on top of the history.
+        for offset in range(self.options["days"] + 7):
+            day = self.start_date + timedelta(days=offset)
+            for department in self.departments:
+                items = self.items[department.pk]
+                for item in self.random.sample(items, min(tasks_per_day, len(items))):
+                    start_hour = self.random.randint(6, 16)
+                    task = TaskInstance(
+                        cleaning_item=item,
+                        department=department,
+                        assigned_to=self.random.choice(self.staff[department.pk]),
+                        due_date=day,
+                        start_time=time(start_hour),
+                        end_time=time(start_hour + 1),
+                        status='pending',
+                    )
+                    if day < self.today:
+                        task.status = self.random.choice(PAST_STATUSES)
+                        if task.status == 'completed':
+                            task.completed_at = min(self._aware(day, start_hour, self.random.randint(0, 59)), now)
+                    pending_tasks.append(task)
+            if len(pending_tasks) >= BATCH_SIZE * 5:
+                flush()
+        if pending_tasks:
+            flush()
+        return total
+
+    def _seed_temperature_logs(self):
+        logs = []
+        total = 0
+        now = timezone.now()
+        for day in self._days():
+            for department in self.departments:
+                staff = self.staff[department.pk]
+                thermometer = self.thermometers[department.pk]
+                for area in self.areas[department.pk]:
+                    for period, hour in (('AM', 8), ('PM', 15)):
+                        logged_at = self._aware(day, hour, self.random.randint(0, 59))
+                        if logged_at > now:
+                            continue
+                        low, high = float(area.target_temperature_min), float(area.target_temperature_max)
+                        reading = self.random.uniform(low - 1, high + 1) if self.random.random() < 0.05 else self.random.uniform(low, high)
+                        logs.append(TemperatureLog(
+                            area_unit=area, log_datetime=logged_at,
+                            temperature_reading=_money(reading), time_period=period,
+                            logged_by=self.random.choice(staff).user,
+                            thermometer_used=thermometer, department=department,
+                        ))
+            if len(logs) >= BATCH_SIZE * 5:
+                TemperatureLog.objects.bulk_create(logs, batch_size=BATCH_SIZE)
+                total += len(logs)
+                logs = []
+        TemperatureLog.objects.bulk_create(logs, batch_size=BATCH_SIZE)
+        return total + len(logs)
+
+    def _seed_waste(self):
+        records = []
+        for day in self._days():
+            for department in self.departments:
+                for _ in range(self.options["waste_per_day"]):
+                    quantity = Decimal(self.random.randint(1, 100)) / 10
+                    if self.random.random() < 0.5:
+                        recipe, item = self.random.choice(self.recipes[department.pk]), None
+                        unit_cost = recipe.unit_cost
+                    else:
+                        recipe, item = None, self.random.choice(self.inventory[department.pk])
+                        unit_cost = item.unit_cost
+                    records.append(WasteRecord(
+                        recipe=recipe, inventory_item=item, department=department,
+                        quantity=quantity, reason=self.random.choice(WASTE_REASONS),
+                        cost=_money(quantity * unit_cost),
+                        recorded_by=self.managers[department.pk],
+                        recorded_at=self._aware(day, self.random.randint(6, 17), self.random.randint(0, 59)),
+                    ))
+        WasteRecord.objects.bulk_create(records, batch_size=BATCH_SIZE)
+        return len(records)
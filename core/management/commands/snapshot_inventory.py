@@ -0,0 +1,55 @@
+"""Record daily closing inventory balances per department.
+
+Usage:
+    python manage.py snapshot_inventory [--date YYYY-MM-DD] [--department ID]
+
+Intended to run nightly (e.g. from cron shortly after midnight). Without
+--date it snapshots yesterday, the most recent fully closed day. Re-running
+for the same day refreshes the existing rows, so the job is safe to repeat.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Department
+from core.recipe_models import InventorySnapshot
+
+
+class Command(BaseCommand):
+    help = "Write daily closing InventorySnapshot rows for each department."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Day to snapshot (YYYY-MM-DD). Defaults to yesterday.",
+        )
+        parser.add_argument(
+            "--department",
+            type=int,
+            help="Only snapshot the department with this ID.",
+        )
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                day = date.fromisoformat(options["date"])
+            except ValueError as exc:
+                raise CommandError("Invalid --date. Use YYYY-MM-DD.") from exc
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        departments = Department.objects.all()
+        if options["department"]:
+            departments = departments.filter(pk=options["department"])
+
+        total = 0
+        for department in departments:
+            with transaction.atomic():
+                written = InventorySnapshot.take(department, day)
+            total += written
+            self.stdout.write(f"  {department.name}: {written} items")
+
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {total} inventory items for {day}."))
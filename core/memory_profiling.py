@@ -0,0 +1,198 @@
+"""
+Memory profiling for the endpoints that build large files in memory.
+
+With MEMORY_PROFILING_ENABLED, the views decorated with ``@memory_profiled``
+(the ZIP bulk download and the bulk upload) and PDF generation are run under
+MemoryProfiler. It records:
+
+* the process RSS before and after, and its peak, which a background thread
+  samples every RSS_INTERVAL seconds;
+* the peak of Python allocations, from tracemalloc;
+* the TOP_ALLOCATIONS source lines holding the most new memory when the view
+  returns (e.g. the response body).
+
+Decorated views (and the async bulk download, which profiles its archive
+building the same way) store the result in a per-tenant index in the cache (the
+newest PROFILE_LIMIT are kept, listed at /api/memory-profiles/) and name it in
+an X-Memory-Profile-Id header. PDF generation stores its result on the
+GeneratedDocument instead. run_memory_benchmarks reads these profiles to check
+that memory stays bounded as the input grows.
+
+tracemalloc roughly doubles the cost of allocating, so profiling is off by
+default. Only one request is profiled at a time: RSS and tracemalloc are
+per process, so concurrent requests on a threaded worker would be counted
+together. The numbers are exact on the single-threaded gunicorn sync
+workers that get OOM-killed.
+"""
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_LIMIT = 100
+TOP_ALLOCATIONS = 10
+RSS_INTERVAL = 0.005
+
+_INDEX_KEY = 'memory-profiles:index'
+_busy = threading.Lock()
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_IGNORED = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def _mb(value):
+    return None if value is None else round(value / (1024 * 1024), 2)
+
+
+def _short_path(filename):
+    for prefix in sorted({*sys.path, str(settings.BASE_DIR)}, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryProfiler:
+    """Context manager measuring the memory used by the enclosed block; see the module docstring."""
+
+    def __init__(self, top=TOP_ALLOCATIONS):
+        self.top = top
+        self.result = None
+        self._stop = threading.Event()
+        self._peak_rss = None
+        self._thread = threading.Thread(target=self._sample_rss, name='memory-profiler', daemon=True)
+
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_INTERVAL):
+            rss = rss_bytes()
+            if rss is not None and (self._peak_rss is None or rss > self._peak_rss):
+                self._peak_rss = rss
+
+    def __enter__(self):
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        self._traced_start = tracemalloc.get_traced_memory()[0]
+        self._rss_start = self._peak_rss = rss_bytes()
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._started
+        self._stop.set()
+        self._thread.join()
+        rss_end = rss_bytes()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        if self._started_tracing:
+            tracemalloc.stop()
+        top = [
+            {
+                'where': f'{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}',
+                'size_kb': round(stat.size_diff / 1024, 1),
+                'count': stat.count_diff,
+            }
+            for stat in snapshot.compare_to(self._baseline, 'lineno')[:self.top]
+            if stat.size_diff > 0
+        ]
+        self.result = {
+            'seconds': round(seconds, 3),
+            'rss_start_mb': _mb(self._rss_start),
+            'rss_end_mb': _mb(rss_end),
+            'rss_peak_mb': _mb(None if rss_end is None else max(self._peak_rss or 0, rss_end)),
+            'python_peak_mb': _mb(traced_peak - self._traced_start),
+            'top_allocations': top,
+        }
+
+
+@contextmanager
+def maybe_profile():
+    """
+    Yields a running MemoryProfiler when profiling is on and no other request
+    is being profiled, else None. Its result is set once the block exits.
+    """
+    if not settings.MEMORY_PROFILING_ENABLED or not _busy.acquire(blocking=False):
+        yield None
+        return
+    try:
+        with MemoryProfiler() as profiler:
+            yield profiler
+    finally:
+        _busy.release()
+
+
+def save_profile(request, response, result, user=None):
+    """
+    Index *result* for the current tenant; returns the profile ID. *user*
+    defaults to request.user (the async views authenticate it themselves).
+    """
+    created = timezone.now()
+    profile_id = f"{created:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    user = user or getattr(request, 'user', None)
+    entry = {
+        'id': profile_id,
+        'created_at': created.isoformat(),
+        'method': request.method,
+        # Not the query string: the change feed authenticates with ?token=.
+        'path': request.path,
+        'status': response.status_code,
+        'user': user.get_username() if user is not None and user.is_authenticated else None,
+        **result,
+    }
+    cache.set(_INDEX_KEY, ([entry] + cache.get(_INDEX_KEY, []))[:PROFILE_LIMIT], None)
+    return profile_id
+
+
+def profiles():
+    """Index entries for the current tenant, newest first."""
+    return cache.get(_INDEX_KEY, [])
+
+
+def clear():
+    cache.delete(_INDEX_KEY)
+
+
+def attach_profile(request, response, profiler, user=None):
+    """Save *profiler*'s result, if any, and name it in the response's X-Memory-Profile-Id."""
+    if profiler is None:
+        return response
+    try:
+        response['X-Memory-Profile-Id'] = save_profile(request, response, profiler.result, user=user)
+    except Exception:  # never fail the request because the profile couldn't be stored
+        logger.exception('Could not store memory profile for %s %s', request.method, request.path)
+    return response
+
+
+def memory_profiled(view_method):
+    """Decorator for viewset methods: profile the call when memory profiling is on."""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        with maybe_profile() as profiler:
+            response = view_method(self, request, *args, **kwargs)
+        return attach_profile(request, response, profiler)
+    return wrapper
@@ -1,6 +1,13 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import connection, connections
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 
+from cleantrac_project import db_routers
+
 class AllowIframeForMedia(MiddlewareMixin):
     """Override X-Frame-Options header for media/documents paths so that
     PDFs and other documents can be embedded in an <iframe> from the same origin.
@@ -25,10 +32,75 @@ class AllowIframeForMedia(MiddlewareMixin):
             response.headers.pop("X-Frame-Options", None)
             response.xframe_options_exempt = True
 
-            # If Django produced a 304, browsers will reuse the previously-cached
-            # response headers (which may still include X-Frame-Options). 304
-            # responses also confuse some middlewares when we change headers.
-            # Converting the status to 200 with identical content avoids that.
-            if response.status_code == 304:
+            # If Django produced a 304 for a document, browsers will reuse the
+            # previously-cached response headers (which may still include
+            # X-Frame-Options). 304 responses also confuse some middlewares when
+            # we change headers. Converting the status to 200 with identical
+            # content avoids that. API 304s (ETag revalidation) carry no body
+            # and must pass through untouched, so only documents are rewritten.
+            if response.status_code == 304 and request.path.startswith(self.DOCUMENT_PREFIX):
                 response.status_code = 200
         return response
+
+
+class ReplicaRoutingMiddleware:
+    """Per-request read-your-writes state for cleantrac_project.db_routers.ReplicaRouter.
+
+    Each request starts with fresh routing state. A request that writes is
+    pinned to the primary for the rest of the request, and the client (by
+    token or session) stays pinned for REPLICA_PIN_SECONDS afterwards so that
+    its next poll doesn't read from a replica that hasn't caught up yet.
+    Works in both sync and async stacks; the routing state is a ContextVar, so
+    it follows the request into the threads that run its queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _client_key(request):
+        credential = request.headers.get("Authorization") or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not credential:
+            return None
+        return "replica-pin:" + hashlib.sha256(credential.encode()).hexdigest()
+
+    @staticmethod
+    def _select_replica_tenant():
+        tenant = getattr(connection, "tenant", None)
+        replica = connections[db_routers.REPLICA_ALIAS]
+        if tenant is not None and hasattr(replica, "set_tenant"):
+            replica.set_tenant(tenant)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not db_routers.replica_configured():
+            return self.get_response(request)
+
+        self._select_replica_tenant()
+        client_key = self._client_key(request)
+        pinned = bool(client_key and cache.get(client_key))
+        with db_routers.request_routing(pinned=pinned) as state:
+            response = self.get_response(request)
+        if state.wrote and client_key:
+            cache.set(client_key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not db_routers.replica_configured():
+            return await self.get_response(request)
+
+        # Connections are per thread: select the tenant in the one that runs the ORM.
+        await sync_to_async(self._select_replica_tenant)()
+        client_key = self._client_key(request)
+        pinned = bool(client_key and await cache.aget(client_key))
+        with db_routers.request_routing(pinned=pinned) as state:
+            response = await self.get_response(request)
+        if state.wrote and client_key:
+            await cache.aset(client_key, True, settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.1 on 2026-10-19 02:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_inventorysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='completionlog',
+            index=models.Index(fields=['completed_at'], name='completionlog_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productionschedule',
+            index=models.Index(fields=['department', 'scheduled_date'], name='prodsched_dept_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskinstance',
+            index=models.Index(fields=['department', 'due_date', 'status'], name='task_dept_due_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskinstance',
+            index=models.Index(fields=['assigned_to', 'department'], name='task_assignee_dept_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskinstance',
+            index=models.Index(condition=models.Q(('status', 'archived'), _negated=True), fields=['department', 'due_date'], name='task_dept_due_unarchived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temperaturecheckassignment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['department', 'time_period', '-assigned_date'], name='tca_dept_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temperaturecheckassignment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['staff_member', 'time_period', '-assigned_date'], name='tca_staff_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temperaturelog',
+            index=models.Index(fields=['department', 'log_datetime'], name='templog_dept_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temperaturelog',
+            index=models.Index(fields=['area_unit', 'log_datetime'], name='templog_area_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thermometerverificationassignment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['department', '-assigned_date'], name='tva_dept_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thermometerverificationassignment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['staff_member', '-assigned_date'], name='tva_staff_active_idx'),
+        ),
+    ]
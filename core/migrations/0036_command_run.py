@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('succeeded', 'Succeeded'), ('failed', 'Failed')], max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('duration_seconds', models.FloatField()),
+                ('rows', models.PositiveIntegerField(default=0, help_text='Rows processed across all phases')),
+                ('summary', models.JSONField(default=dict, help_text='Arguments, phases, counters and error, as written by --summary-json')),
+            ],
+            options={
+                'verbose_name': 'Command Run',
+                'verbose_name_plural': 'Command Runs',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['command', '-started_at'], name='commandrun_cmd_started_idx')],
+            },
+        ),
+    ]
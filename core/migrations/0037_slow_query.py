@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_command_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Hash of alias, route, caller and fingerprint', max_length=40, unique=True)),
+                ('alias', models.CharField(max_length=50)),
+                ('schema', models.CharField(blank=True, max_length=100)),
+                ('route', models.CharField(blank=True, help_text='e.g. GET /api/taskinstances/; blank outside requests', max_length=255)),
+                ('caller', models.CharField(blank=True, help_text='Innermost project frame that ran the query', max_length=500)),
+                ('stack', models.TextField(blank=True)),
+                ('fingerprint', models.TextField()),
+                ('params_shape', models.JSONField(default=list)),
+                ('plan', models.TextField(blank=True, help_text='EXPLAIN output from the first occurrence')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Slow Query',
+                'verbose_name_plural': 'Slow Queries',
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
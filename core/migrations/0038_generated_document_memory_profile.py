@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_slow_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generateddocument',
+            name='memory_profile',
+            field=models.JSONField(blank=True, help_text='Peak memory and top allocations of the generation (core.memory_profiling), when profiling is on', null=True),
+        ),
+    ]
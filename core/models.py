@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+
+from .querysets import DepartmentScope, DepartmentScopedQuerySet
 
 # Create your models here.
 
@@ -54,6 +56,9 @@ class CleaningItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('department',), prefetch_related=('default_assigned_staff',))
+
     def __str__(self):
         return f"{self.name} ({self.department.name}) - {self.get_frequency_display()}"
 
@@ -83,6 +88,11 @@ class TaskInstance(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(owner='assigned_to', owner_is_profile=True,
+                            select_related=('cleaning_item__department', 'department', 'assigned_to__user'),
+                            prefetch_related=('cleaning_item__default_assigned_staff',))
+
     def __str__(self):
         time_str = f" at {self.start_time.strftime('%H:%M')}" if self.start_time else ""
         assignee_str = f" to {self.assigned_to.user.username}" if self.assigned_to else " (Unassigned)"
@@ -92,6 +102,13 @@ class TaskInstance(models.Model):
         ordering = ['due_date', 'start_time']
         verbose_name = "Task Instance"
         verbose_name_plural = "Task Instances"
+        indexes = [
+            models.Index(fields=['department', 'due_date', 'status'], name='task_dept_due_status_idx'),
+            models.Index(fields=['assigned_to', 'department'], name='task_assignee_dept_idx'),
+            # Staff task lists hide archived tasks by default.
+            models.Index(fields=['department', 'due_date'], name='task_dept_due_unarchived_idx',
+                         condition=~models.Q(status='archived')),
+        ]
 
 class CompletionLog(models.Model):
     task_instance = models.ForeignKey(TaskInstance, on_delete=models.CASCADE, related_name='completion_logs')
@@ -99,6 +116,15 @@ class CompletionLog(models.Model):
     completed_at = models.DateTimeField(default=timezone.now)
     notes = models.TextField(blank=True, null=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(department='task_instance__cleaning_item__department', owner='user',
+                            owner_within_department=False, select_related=('task_instance__cleaning_item', 'user'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['completed_at'], name='completionlog_completed_idx'),
+        ]
+
     def __str__(self):
         return f"Log for {self.task_instance} by {self.user.username if self.user else 'Unknown'} at {self.completed_at.strftime('%Y-%m-%d %H:%M')}"
 
@@ -146,6 +172,9 @@ class AreaUnit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('department',))
+
     def __str__(self):
         return f"{self.name} ({self.department.name})"
 
@@ -166,6 +195,9 @@ class Thermometer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('department',))
+
     def __str__(self):
         return f"{self.serial_number} ({self.model_identifier}) - {self.get_status_display()}"
     
@@ -196,6 +228,9 @@ class ThermometerVerificationRecord(models.Model):
     photo_evidence = models.ImageField(upload_to='thermometer_verifications/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(department='thermometer__department', select_related=('thermometer', 'calibrated_by'))
+
     def __str__(self):
         return f"Verification of {self.thermometer.serial_number} on {self.date_verified}"
     
@@ -231,9 +266,19 @@ class ThermometerVerificationAssignment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(owner='staff_member', owner_within_department=False,
+                            select_related=('staff_member', 'department', 'assigned_by'))
+
     class Meta:
         verbose_name = "Thermometer Verification Assignment"
         verbose_name_plural = "Thermometer Verification Assignments"
+        indexes = [
+            models.Index(fields=['department', '-assigned_date'], name='tva_dept_active_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['staff_member', '-assigned_date'], name='tva_staff_active_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return f"{self.staff_member.username} assigned to {self.department.name} thermometer verification"
@@ -275,10 +320,20 @@ class TemperatureCheckAssignment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(owner='staff_member', owner_within_department=False,
+                            select_related=('staff_member', 'department', 'assigned_by'))
+
     class Meta:
         verbose_name = "Temperature Check Assignment"
         verbose_name_plural = "Temperature Check Assignments"
         unique_together = [('department', 'assigned_date', 'time_period')]
+        indexes = [
+            models.Index(fields=['department', 'time_period', '-assigned_date'], name='tca_dept_active_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['staff_member', 'time_period', '-assigned_date'], name='tca_staff_active_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return f"{self.staff_member.username} assigned to {self.department.name} {self.get_time_period_display()} temperature checks"
@@ -295,6 +350,20 @@ class TemperatureCheckAssignment(models.Model):
             ).exclude(id=self.id).update(is_active=False)
         super().save(*args, **kwargs)
 
+class TemperatureLogQuerySet(DepartmentScopedQuerySet):
+    def on_dates(self, start, end=None):
+        """
+        Logs taken on the local calendar days *start* through *end* (inclusive).
+        Filters log_datetime on a half-open range rather than `__date`, so the
+        (department, log_datetime) and (area_unit, log_datetime) indexes apply.
+        """
+        end = end or start
+        return self.filter(
+            log_datetime__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            log_datetime__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+
+
 class TemperatureLog(models.Model):
     """Records temperature readings for specific areas/units"""
     TIME_PERIOD_CHOICES = [
@@ -320,10 +389,17 @@ class TemperatureLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TemperatureLogQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('area_unit', 'thermometer_used', 'logged_by', 'department'))
+
     class Meta:
         verbose_name = "Temperature Log"
         verbose_name_plural = "Temperature Logs"
         ordering = ['-log_datetime']
+        indexes = [
+            models.Index(fields=['department', 'log_datetime'], name='templog_dept_datetime_idx'),
+            models.Index(fields=['area_unit', 'log_datetime'], name='templog_area_datetime_idx'),
+        ]
     
     def __str__(self):
         return f"{self.area_unit.name} - {self.temperature_reading}°C on {self.log_datetime.strftime('%Y-%m-%d %H:%M')} ({self.time_period})"
@@ -357,6 +433,9 @@ class DocumentTemplate(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('department', 'created_by'))
+
     def __str__(self):
         return f"{self.name} ({self.department.name}) - {self.get_template_type_display()}"
     
@@ -384,8 +463,15 @@ class GeneratedDocument(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
     error_message = models.TextField(blank=True, null=True)
     parameters = models.JSONField(default=dict, help_text="Parameters used to generate the document")
+    memory_profile = models.JSONField(
+        null=True, blank=True,
+        help_text="Peak memory and top allocations of the generation (core.memory_profiling), when profiling is on",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('template', 'department', 'generated_by'))
+
     def __str__(self):
         return f"Generated from {self.template.name} by {self.generated_by.username if self.generated_by else 'Unknown'} on {self.created_at.strftime('%Y-%m-%d %H:%M')}"
     
@@ -443,6 +529,9 @@ class Supplier(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(department='departments', prefetch_related=('departments',))
+
     class Meta:
         verbose_name = "Supplier"
         verbose_name_plural = "Suppliers"
@@ -453,6 +542,63 @@ class Supplier(models.Model):
         return f"{self.supplier_name} ({self.supplier_code}) - {department_names}"
 
 
+
+class CommandRun(models.Model):
+    """
+    One run of a management command built on core.command_runs.TimedCommand:
+    its phases, row counts and throughput, for trending import and task
+    generation performance over time.
+    """
+    STATUS_CHOICES = [
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    command = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    duration_seconds = models.FloatField()
+    rows = models.PositiveIntegerField(default=0, help_text="Rows processed across all phases")
+    summary = models.JSONField(default=dict, help_text="Arguments, phases, counters and error, as written by --summary-json")
+
+    class Meta:
+        verbose_name = "Command Run"
+        verbose_name_plural = "Command Runs"
+        ordering = ['-started_at']
+        indexes = [models.Index(fields=['command', '-started_at'], name='commandrun_cmd_started_idx')]
+
+    def __str__(self):
+        return f"{self.command} {self.status} at {self.started_at:%Y-%m-%d %H:%M} ({self.duration_seconds:.1f}s)"
+
+
+class SlowQuery(models.Model):
+    """
+    A statement that ran slower than the slow-query threshold, aggregated per
+    SQL fingerprint, route and calling code. Written by core.slow_queries.
+    """
+    key = models.CharField(max_length=40, unique=True, help_text="Hash of alias, route, caller and fingerprint")
+    alias = models.CharField(max_length=50)
+    schema = models.CharField(max_length=100, blank=True)
+    route = models.CharField(max_length=255, blank=True, help_text="e.g. GET /api/taskinstances/; blank outside requests")
+    caller = models.CharField(max_length=500, blank=True, help_text="Innermost project frame that ran the query")
+    stack = models.TextField(blank=True)
+    fingerprint = models.TextField()
+    params_shape = models.JSONField(default=list)
+    plan = models.TextField(blank=True, help_text="EXPLAIN output from the first occurrence")
+    count = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Slow Query"
+        verbose_name_plural = "Slow Queries"
+        ordering = ['-total_ms']
+
+    def __str__(self):
+        return f"{self.route or self.alias} {self.caller}: {self.count}x, {self.total_ms:.0f} ms total"
+
 # To make UserProfile creation automatic when a User is created, we can use signals.
 # This is optional but good practice.
 # In core/signals.py (new file):
@@ -1,6 +1,7 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from django.utils import timezone
 from .models import UserProfile
+from .auth_context import get_auth_context
 
 class IsSuperUser(BasePermission):
     """Allows access only to superusers."""
@@ -12,20 +13,14 @@ class IsManager(BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        try:
-            return request.user.profile.role == UserProfile.ROLE_MANAGER
-        except AttributeError: # Handles cases like no profile (though our signals should prevent this for active users)
-            return False
+        return get_auth_context(request).is_manager
 
 class IsStaff(BasePermission):
     """Allows access only to users with the 'staff' role."""
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        try:
-            return request.user.profile.role == UserProfile.ROLE_STAFF
-        except AttributeError:
-            return False
+        return get_auth_context(request).is_staff_member
 
 class IsManagerForWriteOrAuthenticatedReadOnly(BasePermission):
     """Allows read-only access to any authenticated user, but write access only to managers."""
@@ -37,10 +32,7 @@ class IsManagerForWriteOrAuthenticatedReadOnly(BasePermission):
             return True # Department filtering is handled by get_queryset
         
         # For write methods (POST, PUT, PATCH, DELETE), check if user is a manager
-        try:
-            return request.user.profile.role == UserProfile.ROLE_MANAGER
-        except AttributeError:
-            return False
+        return get_auth_context(request).is_manager
 
     def has_object_permission(self, request, view, obj):
         """
@@ -55,8 +47,9 @@ class IsManagerForWriteOrAuthenticatedReadOnly(BasePermission):
 
         # Write permissions.
         try:
-            user_is_manager = request.user.profile.role == UserProfile.ROLE_MANAGER
-            user_department = request.user.profile.department
+            auth = get_auth_context(request)
+            user_is_manager = auth.is_manager
+            user_department = auth.department
 
             if not user_is_manager or not user_department:
                 return False # Not a manager or no department assigned to manager
@@ -123,7 +116,7 @@ class IsSuperUserWriteOrManagerRead(BasePermission):
         
         if request.method in SAFE_METHODS:
             # Allow read for superuser or manager
-            return request.user.is_superuser or (hasattr(request.user, 'profile') and request.user.profile.role == UserProfile.ROLE_MANAGER)
+            return request.user.is_superuser or get_auth_context(request).is_manager
         
         # For unsafe methods (POST, PUT, DELETE), only superuser
         return request.user.is_superuser
@@ -148,19 +141,13 @@ class UserAndProfileManagementPermissions(BasePermission):
         if request.method == 'POST':
             if request.user.is_superuser:
                 return True
-            try:
-                return request.user.profile.role == UserProfile.ROLE_MANAGER
-            except AttributeError: # No profile
-                return False
+            return get_auth_context(request).is_manager
         
         # For other methods like PUT, PATCH, DELETE on the list endpoint (less common for ViewSets but covered)
         # Default to superuser or manager for general write ops not on an object yet.
         if request.user.is_superuser:
             return True
-        try:
-            return request.user.profile.role == UserProfile.ROLE_MANAGER
-        except AttributeError:
-            return False
+        return get_auth_context(request).is_manager
 
     def has_object_permission(self, request, view, obj):
         if not request.user or not request.user.is_authenticated:
@@ -187,11 +174,12 @@ class UserAndProfileManagementPermissions(BasePermission):
                 return True
             
             # Manager can update users/profiles in their department
+            auth = get_auth_context(request)
             try:
-                if request.user.profile.role == UserProfile.ROLE_MANAGER and request.user.profile.department:
-                    if is_user_object and hasattr(obj, 'profile') and obj.profile.department == request.user.profile.department:
+                if auth.is_manager and auth.department_id:
+                    if is_user_object and hasattr(obj, 'profile') and auth.in_department(obj.profile.department_id):
                         return True
-                    if is_profile_object and obj.department == request.user.profile.department:
+                    if is_profile_object and auth.in_department(obj.department_id):
                         return True
             except AttributeError: # request.user has no profile or obj structure issue
                 return False
@@ -200,11 +188,12 @@ class UserAndProfileManagementPermissions(BasePermission):
         # DELETE permissions
         if request.method == 'DELETE':
             # Managers can delete users/profiles in their department, but not themselves
+            auth = get_auth_context(request)
             try:
-                if request.user.profile.role == UserProfile.ROLE_MANAGER and request.user.profile.department:
-                    if is_user_object and hasattr(obj, 'profile') and obj.profile.department == request.user.profile.department and obj != request.user:
+                if auth.is_manager and auth.department_id:
+                    if is_user_object and hasattr(obj, 'profile') and auth.in_department(obj.profile.department_id) and obj != request.user:
                         return True
-                    if is_profile_object and obj.department == request.user.profile.department and obj.user != request.user:
+                    if is_profile_object and auth.in_department(obj.department_id) and obj.user_id != request.user.pk:
                         return True
             except AttributeError:
                 return False
@@ -241,13 +230,12 @@ class CanUpdateTaskStatus(BasePermission):
 
         # For write methods, specifically PATCH for status updates
         if request.method == 'PATCH':
-            try:
-                user_profile = request.user.profile
-                user_role = user_profile.role
-                user_department = user_profile.department
-            except AttributeError:
+            user_profile = get_auth_context(request).profile
+            if user_profile is None:
                 self.message = 'User profile not found.'
                 return False # User has no profile
+            user_role = user_profile.role
+            user_department = user_profile.department
 
             # Determine object's department
             obj_department = obj.department # Assuming TaskInstance has direct department FK
@@ -351,16 +339,12 @@ class CanManageTaskInstance(BasePermission):
             return True
 
         # For write methods (PUT, PATCH, DELETE)
-        try:
-            user_profile = request.user.profile
-            user_role = user_profile.role
-            user_department = user_profile.department
-        except UserProfile.DoesNotExist:
+        user_profile = get_auth_context(request).profile
+        if user_profile is None:
             self.message = 'User profile not found.'
             return False
-        except AttributeError: # Catches if request.user has no 'profile' attribute
-            self.message = 'User profile attribute not found.'
-            return False
+        user_role = user_profile.role
+        user_department = user_profile.department
 
         # Determine object's department - obj is TaskInstance
         obj_department = obj.department
@@ -425,10 +409,7 @@ class CanLogCompletionAndManagerModify(BasePermission):
             return True
         
         # For other write methods (PUT, PATCH, DELETE), check if user is a manager
-        try:
-            return request.user.profile.role == UserProfile.ROLE_MANAGER
-        except AttributeError:
-            return False
+        return get_auth_context(request).is_manager
     
     def has_object_permission(self, request, view, obj):
         """
@@ -453,8 +434,9 @@ class CanLogCompletionAndManagerModify(BasePermission):
                 obj_department = obj.task_instance.cleaning_item.department
             
             # Check if the user is a manager of the object's department
-            user_is_manager = request.user.profile.role == UserProfile.ROLE_MANAGER
-            user_department = request.user.profile.department
+            auth = get_auth_context(request)
+            user_is_manager = auth.is_manager
+            user_department = auth.department
             
             return user_is_manager and user_department == obj_department
         except AttributeError:
@@ -488,19 +470,14 @@ class IsThermometerVerificationStaff(BasePermission):
         # For write methods, check if user is a manager or assigned verification staff
         try:
             # Managers can always perform verification
-            if request.user.profile.role == UserProfile.ROLE_MANAGER:
+            if get_auth_context(request).is_manager:
                 return True
             
             # Staff can only perform verification if they are assigned to it
-            if request.user.profile.role == UserProfile.ROLE_STAFF:
+            if get_auth_context(request).is_staff_member:
                 # Check if the user is assigned to thermometer verification duties
-                from .models import ThermometerVerificationAssignment
-                is_assigned = ThermometerVerificationAssignment.objects.filter(
-                    staff_member=request.user,
-                    department=request.user.profile.department,
-                    is_active=True
-                ).exists()
-                return is_assigned
+                # (resolved once per request and shared with has_object_permission)
+                return get_auth_context(request).has_thermometer_verification_assignment
             
             return False
         except AttributeError:
@@ -525,26 +502,20 @@ class IsThermometerVerificationStaff(BasePermission):
                 obj_department = obj.thermometer.department
             
             # User's department
-            user_department = request.user.profile.department
+            user_department = get_auth_context(request).department
             
             # Department check
             if obj_department != user_department:
                 return False
             
             # Managers can always perform verification in their department
-            if request.user.profile.role == UserProfile.ROLE_MANAGER:
+            if get_auth_context(request).is_manager:
                 return True
             
             # Staff can only perform verification if they are assigned to it
-            if request.user.profile.role == UserProfile.ROLE_STAFF:
+            if get_auth_context(request).is_staff_member:
                 # Check if the user is assigned to thermometer verification duties
-                from .models import ThermometerVerificationAssignment
-                is_assigned = ThermometerVerificationAssignment.objects.filter(
-                    staff_member=request.user,
-                    department=user_department,
-                    is_active=True
-                ).exists()
-                return is_assigned
+                return get_auth_context(request).has_thermometer_verification_assignment
             
             return False
         except AttributeError:
@@ -574,10 +545,7 @@ class CanManageThermometerAssignments(BasePermission):
             return True
         
         # For write methods, check if user is a manager
-        try:
-            return request.user.profile.role == UserProfile.ROLE_MANAGER
-        except AttributeError:
-            return False
+        return get_auth_context(request).is_manager
     
     def has_object_permission(self, request, view, obj):
         # Superusers can do anything
@@ -588,12 +556,12 @@ class CanManageThermometerAssignments(BasePermission):
         if request.method in SAFE_METHODS:
             try:
                 # Staff can see their own assignments
-                if request.user.profile.role == UserProfile.ROLE_STAFF:
+                if get_auth_context(request).is_staff_member:
                     return obj.staff_member == request.user
                 
                 # Managers can see assignments in their department
-                if request.user.profile.role == UserProfile.ROLE_MANAGER:
-                    return obj.department == request.user.profile.department
+                if get_auth_context(request).is_manager:
+                    return get_auth_context(request).in_department(obj.department_id)
                 
                 return False
             except AttributeError:
@@ -602,8 +570,8 @@ class CanManageThermometerAssignments(BasePermission):
         # For write methods, check if user is a manager of the object's department
         try:
             # Managers can only manage assignments in their department
-            if request.user.profile.role == UserProfile.ROLE_MANAGER:
-                return obj.department == request.user.profile.department
+            if get_auth_context(request).is_manager:
+                return get_auth_context(request).in_department(obj.department_id)
             
             return False
         except AttributeError:
@@ -633,10 +601,7 @@ class CanManageTemperatureCheckAssignments(BasePermission):
             return True
         
         # For write methods, check if user is a manager
-        try:
-            return request.user.profile.role == UserProfile.ROLE_MANAGER
-        except AttributeError:
-            return False
+        return get_auth_context(request).is_manager
     
     def has_object_permission(self, request, view, obj):
         # Superusers can do anything
@@ -647,12 +612,12 @@ class CanManageTemperatureCheckAssignments(BasePermission):
         if request.method in SAFE_METHODS:
             try:
                 # Staff can see their own assignments
-                if request.user.profile.role == UserProfile.ROLE_STAFF:
+                if get_auth_context(request).is_staff_member:
                     return obj.staff_member == request.user
                 
                 # Managers can see assignments in their department
-                if request.user.profile.role == UserProfile.ROLE_MANAGER:
-                    return obj.department == request.user.profile.department
+                if get_auth_context(request).is_manager:
+                    return get_auth_context(request).in_department(obj.department_id)
                 
                 return False
             except AttributeError:
@@ -661,8 +626,8 @@ class CanManageTemperatureCheckAssignments(BasePermission):
         # For write methods, check if user is a manager of the object's department
         try:
             # Managers can only manage assignments in their department
-            if request.user.profile.role == UserProfile.ROLE_MANAGER:
-                return obj.department == request.user.profile.department
+            if get_auth_context(request).is_manager:
+                return get_auth_context(request).in_department(obj.department_id)
             
             return False
         except AttributeError:
@@ -692,7 +657,7 @@ class CanLogTemperatures(BasePermission):
 
         # For POST (creating logs), check if the user is staff or manager
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             if user_profile.role not in [UserProfile.ROLE_STAFF, UserProfile.ROLE_MANAGER]:
                 return False
 
@@ -713,14 +678,14 @@ class CanLogTemperatures(BasePermission):
         # For safe methods, allow access if the user is in the same department
         if request.method in SAFE_METHODS:
             try:
-                user_department = request.user.profile.department
+                user_department = get_auth_context(request).department
                 return user_department == obj.thermometer.department
             except AttributeError:
                 return False
 
         # For write methods, only managers can update/delete logs in their department
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             user_department = user_profile.department
             
             # Check if user is a manager and in the same department as the thermometer
@@ -758,7 +723,7 @@ class CanManageRecipes(BasePermission):
 
         # For write methods, only managers can create/update/delete recipes
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             return user_profile.role == UserProfile.ROLE_MANAGER
         except AttributeError:
             return False
@@ -774,7 +739,7 @@ class CanManageRecipes(BasePermission):
         # For safe methods, allow access if the user is in the same department
         if request.method in SAFE_METHODS:
             try:
-                user_department = request.user.profile.department
+                user_department = get_auth_context(request).department
                 # Handle different object types with department relationships
                 if hasattr(obj, 'department'):
                     return user_department == obj.department
@@ -786,7 +751,7 @@ class CanManageRecipes(BasePermission):
 
         # For write methods, only managers can update/delete in their department
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             user_department = user_profile.department
             
             if user_profile.role != UserProfile.ROLE_MANAGER:
@@ -828,7 +793,7 @@ class CanManageInventory(BasePermission):
 
         # For other write methods, only managers can create/update/delete
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             return user_profile.role == UserProfile.ROLE_MANAGER
         except AttributeError:
             return False
@@ -844,7 +809,7 @@ class CanManageInventory(BasePermission):
         # For safe methods, allow access if the user is in the same department
         if request.method in SAFE_METHODS:
             try:
-                user_department = request.user.profile.department
+                user_department = get_auth_context(request).department
                 return user_department == obj.department
             except AttributeError:
                 return False
@@ -858,7 +823,7 @@ class CanManageInventory(BasePermission):
 
         # For other write methods, only managers can update/delete in their department
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             user_department = user_profile.department
             
             return user_profile.role == UserProfile.ROLE_MANAGER and user_department == obj.department
@@ -889,7 +854,7 @@ class CanManageProductionSchedule(BasePermission):
         # For creating schedules, only managers
         if request.method == 'POST':
             try:
-                user_profile = request.user.profile
+                user_profile = get_auth_context(request).profile
                 return user_profile.role == UserProfile.ROLE_MANAGER
             except AttributeError:
                 return False
@@ -906,7 +871,7 @@ class CanManageProductionSchedule(BasePermission):
             return True
 
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             user_department = user_profile.department
             
             # Check department match
@@ -961,7 +926,7 @@ class CanManageProductionTasks(BasePermission):
         # For creating tasks, only managers
         if request.method == 'POST':
             try:
-                user_profile = request.user.profile
+                user_profile = get_auth_context(request).profile
                 return user_profile.role == UserProfile.ROLE_MANAGER
             except AttributeError:
                 return False
@@ -978,7 +943,7 @@ class CanManageProductionTasks(BasePermission):
             return True
 
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             user_department = user_profile.department
             
             # Check department match
@@ -1046,7 +1011,7 @@ class CanExecuteProductionTasks(BasePermission):
             return True
 
         try:
-            user_profile = request.user.profile
+            user_profile = get_auth_context(request).profile
             user_department = user_profile.department
             
             # Check department match
@@ -0,0 +1,206 @@
+"""
+Interval index over RecipeProductionTask bookings.
+
+A Timeline keeps a set of [start, end) intervals sorted by start and by end,
+so after one O(n log n) build it answers "does anything overlap this slot?"
+and "how many bookings overlap this slot?" with a couple of bisects, and "how
+many run at the same time within it?" with a sweep over those bookings. It
+backs staff double-booking checks on create/update and the weekly planner
+report.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from .recipe_models import RecipeProductionTask
+
+# Tasks in these states no longer occupy anyone's time.
+INACTIVE_STATUSES = ('completed', 'cancelled', 'archived')
+
+
+def task_interval(task):
+    """(start, end) of a task, falling back to duration_minutes when end is missing."""
+    start = task.scheduled_start_time
+    end = task.scheduled_end_time
+    if not end and task.duration_minutes:
+        end = start + timedelta(minutes=task.duration_minutes)
+    return start, end or start
+
+
+class Timeline:
+    """Sorted interval index for one staff member or one department."""
+
+    def __init__(self, entries=()):
+        # entries: iterable of (start, end, key)
+        self._by_start = sorted(entries, key=lambda e: e[0])
+        self._starts = [e[0] for e in self._by_start]
+        self._ends = sorted(e[1] for e in self._by_start)
+        # _max_end[i] is the latest end among the first i+1 intervals by start,
+        # so one bisect tells us whether any earlier-starting interval reaches in.
+        self._max_end = []
+        latest = None
+        for _, end, _ in self._by_start:
+            latest = end if latest is None or end > latest else latest
+            self._max_end.append(latest)
+
+    def __len__(self):
+        return len(self._by_start)
+
+    def has_overlap(self, start, end):
+        """True if any interval intersects [start, end). O(log n)."""
+        k = bisect_left(self._starts, end)
+        return k > 0 and self._max_end[k - 1] > start
+
+    def count_overlapping(self, start, end):
+        """Number of intervals intersecting [start, end). O(log n)."""
+        return bisect_left(self._starts, end) - bisect_right(self._ends, start)
+
+    def peak_overlapping(self, start, end):
+        """
+        Most intervals running at the same moment within [start, end). Unlike
+        count_overlapping, back-to-back bookings in a long slot count once.
+        Sweeps the overlapping intervals; cost grows with the answer.
+        """
+        k = bisect_left(self._starts, end)
+        events = []
+        for i in range(k - 1, -1, -1):
+            if self._max_end[i] <= start:
+                break
+            s, e, _ = self._by_start[i]
+            if e > start:
+                # At equal times ends (0) go before starts (1), so touching
+                # intervals don't overlap; zero-length bookings end last (2).
+                events.append((max(s, start), 1, 1))
+                events.append((min(e, end), 0 if e > s else 2, -1))
+        events.sort()
+        peak = running = 0
+        for _, _, delta in events:
+            running += delta
+            peak = max(peak, running)
+        return peak
+
+    def overlapping(self, start, end):
+        """Keys of intervals intersecting [start, end); cost grows with the answer."""
+        k = bisect_left(self._starts, end)
+        found = []
+        for i in range(k - 1, -1, -1):
+            if self._max_end[i] <= start:
+                break
+            s, e, key = self._by_start[i]
+            if e > start:
+                found.append(key)
+        found.reverse()
+        return found
+
+    def overlapping_pairs(self):
+        """Every (key_a, key_b) pair of intersecting intervals, via a sweep."""
+        pairs = []
+        active = []
+        for start, end, key in self._by_start:
+            active = [(e, k) for e, k in active if e > start]
+            pairs.extend((k, key) for _, k in active)
+            active.append((end, key))
+        return pairs
+
+
+def _active_tasks(**filters):
+    return RecipeProductionTask.objects.filter(**filters).exclude(status__in=INACTIVE_STATUSES)
+
+
+def build_timeline(tasks, exclude_id=None):
+    return Timeline(
+        (*task_interval(task), task.id) for task in tasks if task.id != exclude_id
+    )
+
+
+def department_capacity():
+    """Maximum concurrent production tasks per department, or None for unlimited."""
+    return getattr(settings, 'PRODUCTION_DEPARTMENT_CAPACITY', None)
+
+
+def overlapping_window(start, end):
+    """
+    Filter for bookings that could overlap [start, end), shared by the
+    booking check and the weekly report so the two always agree. A booking
+    without a stored end is kept by its start; task_interval then derives
+    the end from duration_minutes.
+    """
+    return Q(scheduled_start_time__lt=end) & (
+        Q(scheduled_end_time__gt=start) | Q(scheduled_end_time__isnull=True)
+    )
+
+
+def find_conflicts(start, end, department_id=None, staff_id=None, exclude_id=None):
+    """
+    Check a proposed booking against the existing schedule.
+
+    Returns a dict with the clashing task IDs for the staff member and the
+    department's concurrent load (the most tasks running at once during the
+    window), loading only the bookings that could touch the proposed window.
+    """
+    window = overlapping_window(start, end)
+    result = {'staff_conflicts': [], 'department_load': 0, 'department_capacity': department_capacity()}
+    if staff_id:
+        timeline = build_timeline(_active_tasks(assigned_staff_id=staff_id).filter(window).only(
+            'id', 'scheduled_start_time', 'scheduled_end_time', 'duration_minutes'
+        ), exclude_id)
+        if timeline.has_overlap(start, end):
+            result['staff_conflicts'] = timeline.overlapping(start, end)
+    if department_id:
+        timeline = build_timeline(_active_tasks(department_id=department_id).filter(window).only(
+            'id', 'scheduled_start_time', 'scheduled_end_time', 'duration_minutes'
+        ), exclude_id)
+        result['department_load'] = timeline.peak_overlapping(start, end)
+    return result
+
+
+def weekly_report(tasks, week_start):
+    """
+    Overlaps and hourly load for the 7 days starting at the aware datetime
+    *week_start*, from an already-filtered iterable of tasks.
+    """
+    tasks = [t for t in tasks if t.status not in INACTIVE_STATUSES]
+    by_staff = defaultdict(list)
+    for task in tasks:
+        if task.assigned_staff_id:
+            by_staff[task.assigned_staff_id].append(task)
+    by_department = defaultdict(list)
+    for task in tasks:
+        by_department[task.department_id].append(task)
+
+    staff_overlaps = []
+    for staff_id, staff_tasks in by_staff.items():
+        for first, second in build_timeline(staff_tasks).overlapping_pairs():
+            staff_overlaps.append({'staff_id': staff_id, 'task_ids': [first, second]})
+
+    capacity = department_capacity()
+    hourly_load = []
+    for department_id, department_tasks in by_department.items():
+        timeline = build_timeline(department_tasks)
+        staff_timelines = {
+            staff_id: build_timeline(t for t in department_tasks if t.assigned_staff_id == staff_id)
+            for staff_id in {t.assigned_staff_id for t in department_tasks if t.assigned_staff_id}
+        }
+        for hour in range(7 * 24):
+            slot_start = week_start + timedelta(hours=hour)
+            slot_end = slot_start + timedelta(hours=1)
+            load = timeline.count_overlapping(slot_start, slot_end)
+            if not load:
+                continue
+            hourly_load.append({
+                'department_id': department_id,
+                'hour': slot_start,
+                'task_count': load,
+                'staff_count': sum(1 for t in staff_timelines.values() if t.has_overlap(slot_start, slot_end)),
+                'over_capacity': capacity is not None and timeline.peak_overlapping(slot_start, slot_end) > capacity,
+            })
+    hourly_load.sort(key=lambda row: (row['department_id'], row['hour']))
+    return {
+        'week_start': week_start,
+        'department_capacity': capacity,
+        'staff_overlaps': staff_overlaps,
+        'hourly_load': hourly_load,
+    }
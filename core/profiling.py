@@ -0,0 +1,251 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+RequestProfilerMiddleware profiles a request when a superuser asks for it
+(``X-Profile: 1`` header or ``?__profile=1``), or at random for a fraction
+REQUEST_PROFILING_SAMPLE_RATE of all requests. While a request is profiled a
+background thread samples the request thread's Python stack every
+REQUEST_PROFILING_INTERVAL_MS, so time spent in views, serializers,
+ReportLab or the database driver shows up in proportion to how long it took.
+Requests that aren't profiled pay for a random() call and a header check.
+
+Profiles are written in the collapsed-stack format ("frame;frame;frame
+count" per line) that flamegraph.pl, speedscope and Firefox Profiler open
+directly. They're stored under REQUEST_PROFILE_DIR (not under MEDIA_ROOT,
+which may be public) and listed per tenant in the cache; the newest
+PROFILE_LIMIT are kept. The profiled response carries an X-Profile-Id
+header naming the download at /api/request-profiles/<id>/.
+
+Only the view is profiled: the body of a streaming response (ZIP exports,
+the change feed) is produced after the middleware returns.
+
+Under ASGI the sampler follows two threads: the event loop, which runs async
+views, and the request's sync_to_async thread, which runs sync views and the
+ORM. The event loop is shared, so its samples may include other requests'
+coroutines.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from . import caching
+
+logger = logging.getLogger(__name__)
+
+PROFILE_LIMIT = 100
+MAX_DEPTH = 200
+
+_INDEX_KEY = 'profiles:index'
+_TRIGGER_HEADER = 'X-Profile'
+_TRIGGER_PARAM = '__profile'
+
+
+def _storage():
+    return FileSystemStorage(location=settings.REQUEST_PROFILE_DIR)
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    for prefix in sorted({*sys.path, str(settings.BASE_DIR)}, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    # ';' separates frames in the collapsed format; the count follows the last space.
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """Samples the stacks of *thread_ids* from a background thread into collapsed stacks."""
+
+    def __init__(self, thread_ids, interval):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _path(profile_id):
+    return f'{caching.current_schema()}/{profile_id}.folded'
+
+
+def save_profile(sampler, request, response, wall_ms, trigger):
+    """Store *sampler*'s stacks and index them for the current tenant; returns the profile ID."""
+    created = timezone.now()
+    profile_id = f"{created:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    _storage().save(_path(profile_id), ContentFile(sampler.collapsed().encode()))
+    user = getattr(request, 'user', None)
+    entry = {
+        'id': profile_id,
+        'created_at': created.isoformat(),
+        'method': request.method,
+        # Not the query string: the change feed authenticates with ?token=.
+        'path': request.path,
+        'status': response.status_code,
+        'user': user.get_username() if user is not None and user.is_authenticated else None,
+        'trigger': trigger,
+        'wall_ms': round(wall_ms, 1),
+        'samples': sampler.samples,
+        'interval_ms': sampler.interval * 1000,
+    }
+    index = [entry] + cache.get(_INDEX_KEY, [])
+    for expired in index[PROFILE_LIMIT:]:
+        _delete_file(expired['id'])
+    cache.set(_INDEX_KEY, index[:PROFILE_LIMIT], None)
+    return profile_id
+
+
+def _delete_file(profile_id):
+    try:
+        _storage().delete(_path(profile_id))
+    except OSError:
+        pass
+
+
+def profiles():
+    """Index entries for the current tenant, newest first."""
+    return cache.get(_INDEX_KEY, [])
+
+
+def open_profile(profile_id):
+    """The stored profile file, or None if *profile_id* isn't in this tenant's index."""
+    if not any(entry['id'] == profile_id for entry in profiles()):
+        return None
+    try:
+        return _storage().open(_path(profile_id), 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def clear():
+    for entry in profiles():
+        _delete_file(entry['id'])
+    cache.delete(_INDEX_KEY)
+
+
+def _asks_for_profile(request):
+    return request.headers.get(_TRIGGER_HEADER) == '1' or request.GET.get(_TRIGGER_PARAM) == '1'
+
+
+def _requested_by_superuser(request):
+    if not _asks_for_profile(request):
+        return False
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_superuser
+    # API clients authenticate with a token, which DRF only resolves inside
+    # the view; look it up here so only superusers can start a profile.
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key:
+        return False
+    from rest_framework.authtoken.models import Token
+    return Token.objects.filter(key=key.strip(), user__is_active=True, user__is_superuser=True).exists()
+
+
+class RequestProfilerMiddleware:
+    """Profile opted-in or randomly sampled requests; see the module docstring. Sync and async."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _sampled():
+        rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def _trigger(self, request):
+        if self._sampled():
+            return 'sampled'
+        if _requested_by_superuser(request):
+            return 'requested'
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_PROFILING_ENABLED:
+            return self.get_response(request)
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with StackSampler([threading.get_ident()], settings.REQUEST_PROFILING_INTERVAL_MS / 1000) as sampler:
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+        return self._save(sampler, request, response, wall_ms, trigger)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_PROFILING_ENABLED:
+            return await self.get_response(request)
+        if self._sampled():
+            trigger = 'sampled'
+        elif _asks_for_profile(request) and await sync_to_async(_requested_by_superuser)(request):
+            trigger = 'requested'
+        else:
+            return await self.get_response(request)
+
+        # Within a request, sync_to_async always uses the same thread.
+        sync_thread = await sync_to_async(threading.get_ident)()
+        thread_ids = [threading.get_ident(), sync_thread]
+        started = time.perf_counter()
+        with StackSampler(thread_ids, settings.REQUEST_PROFILING_INTERVAL_MS / 1000) as sampler:
+            response = await self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+        return await sync_to_async(self._save)(sampler, request, response, wall_ms, trigger)
+
+    def _save(self, sampler, request, response, wall_ms, trigger):
+        try:
+            response['X-Profile-Id'] = save_profile(sampler, request, response, wall_ms, trigger)
+        except Exception:  # never fail the request because the profile couldn't be stored
+            logger.exception('Could not store request profile for %s %s', request.method, request.path)
+        return response
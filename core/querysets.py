@@ -0,0 +1,79 @@
+"""
+Department scoping shared by the API viewsets.
+
+Models opt in with ``objects = DepartmentScopedQuerySet.as_manager()`` and a
+``SCOPE = DepartmentScope(...)`` class attribute describing how a row reaches
+its department and, where staff only see their own rows, who owns it. Then
+``Model.objects.for_user(user, request)`` applies the same superuser /
+manager / staff rules everywhere, filtering on the foreign key column and
+adding the model's default select_related/prefetch_related so list endpoints
+serialize without per-row queries (core/test_query_budget.py checks this for
+every viewset).
+"""
+from dataclasses import dataclass
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+
+
+@dataclass(frozen=True)
+class DepartmentScope:
+    # Lookup path from the model to its Department (FK or M2M).
+    department: str = 'department'
+    # Lookup path to the row's owner. When set, staff only see rows they own
+    # and only managers see the whole department.
+    owner: str = None
+    # Whether `owner` points at a UserProfile rather than a User.
+    owner_is_profile: bool = False
+    # Also restrict staff-owned rows to the staff member's department.
+    owner_within_department: bool = True
+    # Relations the API serializers read on every row.
+    select_related: tuple = ()
+    # Many-valued relations (M2M, reverse FK) the serializers read on every row.
+    prefetch_related: tuple = ()
+
+
+class DepartmentScopedQuerySet(models.QuerySet):
+    """QuerySet with a `for_user` method driven by the model's SCOPE."""
+
+    def for_user(self, user, request=None):
+        """
+        Rows *user* may see; superusers see everything, users without a profile
+        nothing. Pass the *request* to take the profile from its AuthContext,
+        which the permission classes have usually loaded already.
+        """
+        if user is None or not user.is_authenticated:
+            return self.none()
+        scope = self.model.SCOPE
+        queryset = self.select_related(*scope.select_related) if scope.select_related else self
+        if scope.prefetch_related:
+            queryset = queryset.prefetch_related(*scope.prefetch_related)
+        if user.is_superuser:
+            return queryset
+
+        if request is not None:
+            from .auth_context import get_auth_context  # auth_context imports the models
+
+            profile = get_auth_context(request).profile
+        else:
+            try:
+                profile = user.profile
+            except ObjectDoesNotExist:
+                profile = None
+        if profile is None:
+            return self.none()
+        department_filter = {f'{scope.department}__id': profile.department_id}
+
+        if scope.owner:
+            if profile.role == profile.ROLE_STAFF:
+                owner = profile.pk if scope.owner_is_profile else user.pk
+                queryset = queryset.filter(**{f'{scope.owner}__id': owner})
+                if scope.owner_within_department and profile.department_id:
+                    queryset = queryset.filter(**department_filter)
+                return queryset
+            if profile.role != profile.ROLE_MANAGER:
+                return self.none()
+
+        if not profile.department_id:
+            return self.none()
+        return queryset.filter(**department_filter)
@@ -32,6 +32,28 @@ class ReceivingRecordManager(models.Manager):
         # so the manager should query the same DB. Otherwise admin/API will see no data.
         return super().get_queryset().using("traceability")
 
+    def for_user(self, user, request=None):
+        """Superusers see every row; others only rows whose storage_location
+        mentions their department name. No profile or department: nothing.
+        Pass the *request* to take the profile from its AuthContext, as
+        DepartmentScopedQuerySet.for_user does."""
+        queryset = self.get_queryset()
+        if not user or not user.is_authenticated:
+            return queryset.none()
+        if user.is_superuser:
+            return queryset
+        try:
+            if request is not None:
+                from core.auth_context import get_auth_context  # auth_context imports the models
+
+                profile = get_auth_context(request).profile
+            else:
+                profile = user.profile
+            department = profile.department.name
+        except AttributeError:
+            return queryset.none()
+        return queryset.filter(storage_location__icontains=department)
+
 
 class ReceivingRecord(models.Model):
     """Stores inventory (receiving) rows copied from the external import DB.
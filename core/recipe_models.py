@@ -1,8 +1,17 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDay, TruncWeek
 from django.contrib.auth.models import User
 from django.utils import timezone
+from cleantrac_project.db_routers import reporting_reads
 from core.receiving_models import Product
 from .models import Department, UserProfile
+from . import caching
+from .querysets import DepartmentScope, DepartmentScopedQuerySet
 
 class Recipe(models.Model):
     """
@@ -21,6 +30,9 @@ class Recipe(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('department', 'created_by'), prefetch_related=('ingredients',))
+
     class Meta:
         verbose_name = "Recipe"
         verbose_name_plural = "Recipes"
@@ -72,6 +84,9 @@ class RecipeIngredient(models.Model):
     unit_cost = models.DecimalField(max_digits=10, decimal_places=2)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(department='recipe__department')
+
     class Meta:
         verbose_name = "Recipe Ingredient"
         verbose_name_plural = "Recipe Ingredients"
@@ -140,10 +155,16 @@ class ProductionSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('recipe', 'department', 'created_by'), prefetch_related=('assigned_staff',))
+
     class Meta:
         verbose_name = "Production Schedule"
         verbose_name_plural = "Production Schedules"
         ordering = ['scheduled_date', 'start_time']
+        indexes = [
+            models.Index(fields=['department', 'scheduled_date'], name='prodsched_dept_date_idx'),
+        ]
 
     def __str__(self):
         time_str = f" at {self.start_time.strftime('%H:%M')}" if self.start_time else ""
@@ -169,6 +190,9 @@ class ProductionRecord(models.Model):
     completed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='completed_productions')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(department='schedule__department', select_related=('schedule__recipe', 'schedule__department', 'completed_by'))
+
     class Meta:
         verbose_name = "Production Record"
         verbose_name_plural = "Production Records"
@@ -177,6 +201,68 @@ class ProductionRecord(models.Model):
     def __str__(self):
         return f"Production of {self.schedule.recipe.name} completed on {self.actual_end_time.date()}"
 
+    def post_ingredient_consumption(self, recorded_by=None):
+        """Deduct the recipe's ingredients, scaled to ``actual_yield``, from inventory.
+
+        Each ingredient quantity is scaled by ``actual_yield / recipe.yield_quantity``
+        and matched to the department's ``InventoryItem`` by ingredient code.
+        The ledger rows are written with one ``bulk_create`` and the stock levels
+        with one conditional ``UPDATE``, so the query count does not grow with
+        the number of ingredients. Ingredients without a matching inventory item
+        are skipped, and nothing is posted when this production has already
+        been posted. Must be called inside a transaction.
+        """
+        schedule = self.schedule
+        recipe = schedule.recipe
+        if not recipe.yield_quantity or not self.actual_yield:
+            return []
+
+        reference = f"ProductionSchedule:{schedule.id}"
+        if InventoryTransaction.objects.filter(transaction_type='production_use', reference=reference).exists():
+            return []
+
+        scale = Decimal(self.actual_yield) / Decimal(recipe.yield_quantity)
+        consumption = defaultdict(Decimal)
+        for code, quantity in RecipeIngredient.objects.filter(recipe=recipe).values_list('ingredient_code', 'quantity'):
+            consumption[code] += quantity * scale
+
+        items = InventoryItem.objects.filter(
+            department_id=schedule.department_id,
+            ingredient_code__in=consumption.keys(),
+        ).only('id', 'ingredient_code')
+
+        now = timezone.now()
+        transactions = []
+        for item in items:
+            quantity = consumption[item.ingredient_code].quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if quantity <= 0:
+                continue
+            transactions.append(InventoryTransaction(
+                inventory_item=item,
+                transaction_type='production_use',
+                quantity=quantity,
+                transaction_date=now,
+                reference=reference,
+                recorded_by=recorded_by,
+                notes=f"Auto-posted from production of {recipe.name}",
+            ))
+        if not transactions:
+            return []
+
+        # bulk_create bypasses InventoryTransaction.save() and its signals, so
+        # apply the stock movement ourselves in a single statement.
+        item_ids = [t.inventory_item_id for t in transactions]
+        InventoryTransaction.objects.bulk_create(transactions)
+        InventorySnapshot.objects.filter(inventory_item_id__in=item_ids, snapshot_date__gte=timezone.localdate(now)).delete()
+        InventoryItem.objects.filter(pk__in=item_ids).update(
+            current_stock=F('current_stock') - Case(
+                *[When(pk=t.inventory_item_id, then=Value(t.quantity)) for t in transactions],
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            last_updated=now,
+        )
+        return transactions
+
 
 class InventoryItem(models.Model):
     """
@@ -191,6 +277,9 @@ class InventoryItem(models.Model):
     reorder_level = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('department',))
+
     class Meta:
         verbose_name = "Inventory Item"
         verbose_name_plural = "Inventory Items"
@@ -221,6 +310,9 @@ class InventoryTransaction(models.Model):
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(department='inventory_item__department', select_related=('inventory_item__department', 'recorded_by'))
+
     class Meta:
         verbose_name = "Inventory Transaction"
         verbose_name_plural = "Inventory Transactions"
@@ -242,6 +334,119 @@ class InventoryTransaction(models.Model):
         self.inventory_item.save()
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def signed_quantity():
+        """Expression for the stock movement of a transaction (negative for usage and waste)."""
+        return Case(
+            When(transaction_type__in=['production_use', 'waste'], then=-F('quantity')),
+            default=F('quantity'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+
+
+def _end_of_day(day):
+    """Return the aware datetime at which the local calendar *day* closes."""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+class InventorySnapshot(models.Model):
+    """
+    Daily closing balance of an inventory item.
+    Produced by the ``snapshot_inventory`` command so historical stock can be
+    answered from the nearest snapshot plus a short ledger delta.
+    """
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='snapshots')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    snapshot_date = models.DateField()
+    closing_stock = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Inventory Snapshot"
+        verbose_name_plural = "Inventory Snapshots"
+        unique_together = [('inventory_item', 'snapshot_date')]
+        ordering = ['-snapshot_date']
+        indexes = [
+            models.Index(fields=['department', 'snapshot_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item.ingredient_name} closing {self.closing_stock} on {self.snapshot_date}"
+
+    @classmethod
+    def take(cls, department, day):
+        """Write (or refresh) the closing balances of *department* for *day*.
+
+        Balances are derived backwards from ``current_stock`` by reversing the
+        transactions recorded after *day* closed, which for the nightly run is
+        only the current day's ledger. Returns the number of snapshots written.
+        """
+        items = list(InventoryItem.objects.filter(department=department).only('id', 'current_stock'))
+        later = dict(
+            InventoryTransaction.objects.filter(
+                inventory_item__department=department,
+                transaction_date__gte=_end_of_day(day),
+            ).values_list('inventory_item').annotate(delta=Sum(InventoryTransaction.signed_quantity()))
+        )
+        snapshots = [
+            cls(
+                inventory_item=item,
+                department=department,
+                snapshot_date=day,
+                closing_stock=item.current_stock - (later.get(item.id) or 0),
+            )
+            for item in items
+        ]
+        cls.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['inventory_item', 'snapshot_date'],
+            update_fields=['closing_stock'],
+        )
+        return len(snapshots)
+
+    @classmethod
+    def stock_as_of(cls, items, day):
+        """Return ``{item_id: (stock, snapshot_date)}`` at the close of *day*.
+
+        Each item starts from its nearest snapshot on or before *day* and adds
+        the ledger movements between that snapshot and *day*. Items that were
+        never snapshotted are derived backwards from ``current_stock``. The
+        number of queries depends on the distinct snapshot dates involved, not
+        on the length of the ledger.
+        """
+        nearest = cls.objects.filter(
+            inventory_item=OuterRef('pk'), snapshot_date__lte=day
+        ).order_by('-snapshot_date')
+        rows = items.annotate(
+            snap_date=Subquery(nearest.values('snapshot_date')[:1]),
+            snap_stock=Subquery(nearest.values('closing_stock')[:1]),
+        ).values_list('id', 'current_stock', 'snap_date', 'snap_stock')
+
+        day_end = _end_of_day(day)
+        result = {}
+        windows = defaultdict(list)
+        for item_id, current_stock, snap_date, snap_stock in rows:
+            if snap_date is None:
+                result[item_id] = (current_stock, None)
+                windows[None].append(item_id)
+            else:
+                result[item_id] = (snap_stock, snap_date)
+                if snap_date < day:
+                    windows[snap_date].append(item_id)
+
+        for snap_date, item_ids in windows.items():
+            ledger = InventoryTransaction.objects.filter(inventory_item_id__in=item_ids)
+            if snap_date is None:
+                ledger, sign = ledger.filter(transaction_date__gte=day_end), -1
+            else:
+                ledger, sign = ledger.filter(transaction_date__gte=_end_of_day(snap_date), transaction_date__lt=day_end), 1
+            deltas = ledger.values_list('inventory_item').annotate(delta=Sum(InventoryTransaction.signed_quantity()))
+            for item_id, delta in deltas:
+                stock, snap = result[item_id]
+                result[item_id] = (stock + sign * delta, snap)
+        return result
+
 
 class WasteRecord(models.Model):
     """
@@ -266,6 +471,9 @@ class WasteRecord(models.Model):
     recorded_at = models.DateTimeField(default=timezone.now)
     notes = models.TextField(blank=True, null=True)
 
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(select_related=('recipe', 'inventory_item', 'department', 'recorded_by'))
+
     class Meta:
         verbose_name = "Waste Record"
         verbose_name_plural = "Waste Records"
@@ -275,6 +483,125 @@ class WasteRecord(models.Model):
         waste_source = self.recipe.name if self.recipe else self.inventory_item.ingredient_name
         return f"{self.quantity} {self.unit} of {waste_source} - {self.reason}"
 
+    ANALYTICS_CACHE_TIMEOUT = 60 * 60
+    ANALYTICS_TOP_N = 10
+
+    @classmethod
+    def analytics(cls, department_ids, start_date, end_date, granularity='day'):
+        """
+        Waste cost/quantity for the inclusive local date range, for the given
+        departments (None means all).
+
+        Returns the department x reason x period breakdown, the top recipes and
+        inventory items by cost, and per-department totals against the
+        preceding period of equal length. Results are cached per tenant until
+        a WasteRecord is saved or deleted.
+        """
+        scope = 'all' if department_ids is None else ','.join(str(d) for d in sorted(department_ids))
+        return caching.get_or_compute(
+            'waste-analytics',
+            f"{scope}:{start_date}:{end_date}:{granularity}",
+            lambda: cls._compute_analytics(department_ids, start_date, end_date, granularity),
+            cls.ANALYTICS_CACHE_TIMEOUT,
+        )
+
+    @classmethod
+    @reporting_reads()
+    def _compute_analytics(cls, department_ids, start_date, end_date, granularity):
+        period_days = (end_date - start_date).days + 1
+        previous_start = start_date - timedelta(days=period_days)
+        range_start = _end_of_day(start_date - timedelta(days=1))
+        range_end = _end_of_day(end_date)
+        previous_range_start = _end_of_day(previous_start - timedelta(days=1))
+
+        records = cls.objects.all()
+        if department_ids is not None:
+            records = records.filter(department_id__in=department_ids)
+        current = records.filter(recorded_at__gte=range_start, recorded_at__lt=range_end)
+        trunc = TruncWeek if granularity == 'week' else TruncDay
+
+        breakdown = (
+            current.annotate(period=trunc('recorded_at', output_field=models.DateField()))
+            .values('department_id', 'department__name', 'reason', 'period')
+            .annotate(total_cost=Sum('cost'), total_quantity=Sum('quantity'), record_count=Count('id'))
+            .order_by('department__name', 'period', 'reason')
+        )
+        top_recipes = (
+            current.filter(recipe__isnull=False)
+            .values('recipe_id', 'recipe__name')
+            .annotate(total_cost=Sum('cost'), total_quantity=Sum('quantity'))
+            .order_by('-total_cost')[:cls.ANALYTICS_TOP_N]
+        )
+        top_items = (
+            current.filter(inventory_item__isnull=False)
+            .values('inventory_item_id', 'inventory_item__ingredient_name')
+            .annotate(total_cost=Sum('cost'), total_quantity=Sum('quantity'))
+            .order_by('-total_cost')[:cls.ANALYTICS_TOP_N]
+        )
+        in_current = Q(recorded_at__gte=range_start)
+        in_previous = Q(recorded_at__lt=range_start)
+        trend = (
+            records.filter(recorded_at__gte=previous_range_start, recorded_at__lt=range_end)
+            .values('department_id', 'department__name')
+            .annotate(
+                current_cost=Sum('cost', filter=in_current, default=Decimal('0')),
+                previous_cost=Sum('cost', filter=in_previous, default=Decimal('0')),
+                current_quantity=Sum('quantity', filter=in_current, default=Decimal('0')),
+                previous_quantity=Sum('quantity', filter=in_previous, default=Decimal('0')),
+            )
+            .order_by('department__name')
+        )
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'granularity': granularity,
+            'previous_start_date': previous_start,
+            'previous_end_date': start_date - timedelta(days=1),
+            'breakdown': [
+                {
+                    'department_id': row['department_id'],
+                    'department_name': row['department__name'],
+                    'reason': row['reason'],
+                    'period': row['period'],
+                    'total_cost': row['total_cost'],
+                    'total_quantity': row['total_quantity'],
+                    'record_count': row['record_count'],
+                }
+                for row in breakdown
+            ],
+            'top_recipes': [
+                {'recipe_id': row['recipe_id'], 'recipe_name': row['recipe__name'],
+                 'total_cost': row['total_cost'], 'total_quantity': row['total_quantity']}
+                for row in top_recipes
+            ],
+            'top_inventory_items': [
+                {'inventory_item_id': row['inventory_item_id'], 'ingredient_name': row['inventory_item__ingredient_name'],
+                 'total_cost': row['total_cost'], 'total_quantity': row['total_quantity']}
+                for row in top_items
+            ],
+            'trend': [
+                {
+                    'department_id': row['department_id'],
+                    'department_name': row['department__name'],
+                    'current_cost': row['current_cost'],
+                    'previous_cost': row['previous_cost'],
+                    'cost_delta': row['current_cost'] - row['previous_cost'],
+                    'cost_delta_pct': (
+                        round((row['current_cost'] - row['previous_cost']) / row['previous_cost'] * 100, 1)
+                        if row['previous_cost'] else None
+                    ),
+                    'current_quantity': row['current_quantity'],
+                    'previous_quantity': row['previous_quantity'],
+                    'quantity_delta': row['current_quantity'] - row['previous_quantity'],
+                }
+                for row in trend
+            ],
+        }
+
+
+caching.register('waste-analytics', WasteRecord)
+
 
 class RecipeProductionTask(models.Model):
     """
@@ -337,6 +664,10 @@ class RecipeProductionTask(models.Model):
     description = models.TextField(default='Production task', help_text='Description of the production task')
     duration_minutes = models.PositiveIntegerField(null=True, blank=True, help_text="Estimated duration in minutes")
     
+    objects = DepartmentScopedQuerySet.as_manager()
+    SCOPE = DepartmentScope(owner='assigned_staff',
+                            select_related=('recipe', 'department', 'assigned_staff', 'created_by'))
+
     class Meta:
         verbose_name = "Recipe Production Task"
         verbose_name_plural = "Recipe Production Tasks"
@@ -349,3 +680,95 @@ class RecipeProductionTask(models.Model):
     
     def __str__(self):
         return f"{self.get_task_type_display()} for {self.recipe.name} on {self.scheduled_start_time.date()}"
+
+    RECURRENCE_DELTAS = {
+        'daily': timedelta(days=1),
+        'weekly': timedelta(weeks=1),
+        'monthly': timedelta(days=30),  # simple month approximation
+    }
+
+    def occurrence_starts(self, until, since=None):
+        """
+        Start times of this recurring task's occurrences after the parent
+        itself, from *since* (inclusive) up to the end of *until*'s local day.
+        """
+        delta = self.RECURRENCE_DELTAS.get(self.recurrence_type)
+        if not delta:
+            return []
+        first = self.scheduled_start_time + delta
+        if since and since > first:
+            # Jump straight to the first occurrence on or after *since* so a
+            # long-running parent doesn't walk its whole history.
+            first += -((first - since) // delta) * delta
+        until_date = timezone.localdate(until) if isinstance(until, datetime) else until
+        starts = []
+        current = first
+        while timezone.localdate(current) <= until_date:
+            starts.append(current)
+            current += delta
+        return starts
+
+    def build_child(self, start):
+        """Unsaved child occurrence of this recurring task starting at *start*."""
+        offset = start - self.scheduled_start_time
+        return RecipeProductionTask(
+            recipe_id=self.recipe_id,
+            department_id=self.department_id,
+            scheduled_start_time=start,
+            scheduled_end_time=self.scheduled_end_time + offset if self.scheduled_end_time else None,
+            scheduled_quantity=self.scheduled_quantity,
+            status='scheduled',
+            is_recurring=False,
+            recurrence_type=self.recurrence_type,
+            notes=f"Auto-generated child of task {self.id}",
+            assigned_staff_id=self.assigned_staff_id,
+            created_by_id=self.created_by_id,
+            parent_task=self,
+            task_type=self.task_type,
+            description=self.description,
+            duration_minutes=self.duration_minutes,
+        )
+
+    @classmethod
+    def generate_recurring_children(cls, parents, until, since=None):
+        """
+        Create every missing child occurrence of *parents* up to *until*.
+
+        The existing children of all parents from the earliest missing start
+        on are loaded in one query, so the cost doesn't grow with history, and
+        the new ones are inserted with a single bulk_create. Re-running over
+        the same horizon creates nothing. Returns the created tasks.
+
+        Occurrences are not checked for staff double-booking or department
+        capacity (find_conflicts): they repeat a booking that was checked when
+        the parent was saved. Use the weekly planner report to spot clashes.
+        """
+        parents = [p for p in parents if p.recurrence_type in cls.RECURRENCE_DELTAS]
+        if not parents:
+            return []
+        planned = [(parent, start) for parent in parents for start in parent.occurrence_starts(until, since)]
+        if not planned:
+            return []
+        existing = set(
+            cls.objects.filter(
+                parent_task__in=parents,
+                scheduled_start_time__gte=min(start for _, start in planned),
+            ).values_list('parent_task_id', 'scheduled_start_time')
+        )
+        children = [parent.build_child(start) for parent, start in planned if (parent.id, start) not in existing]
+        return cls.objects.bulk_create(children)
+
+    def generate_next_occurrence(self, from_date=None):
+        """Create and return the next missing occurrence on or after *from_date*, or None."""
+        since = from_date or timezone.now()
+        delta = self.RECURRENCE_DELTAS.get(self.recurrence_type)
+        if not self.is_recurring or not delta:
+            return None
+        existing = set(self.child_tasks.filter(scheduled_start_time__gte=since).values_list('scheduled_start_time', flat=True))
+        # Bounded look-ahead: a year of occurrences at most.
+        for start in self.occurrence_starts(since + timedelta(days=366), since):
+            if start not in existing:
+                child = self.build_child(start)
+                child.save()
+                return child
+        return None
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Department
@@ -7,6 +9,7 @@ from .recipe_models import (
     RecipeProductionTask
 )
 from .serializers import UserSerializer, DepartmentSerializer
+from .production_capacity import find_conflicts
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
@@ -626,8 +629,46 @@ class RecipeProductionTaskSerializer(serializers.ModelSerializer):
         end = data.get('scheduled_end_time')
         if start and end and end <= start:
             raise serializers.ValidationError("End time must be after start time")
+        self._check_schedule_conflicts(data)
         return data
 
+    def _check_schedule_conflicts(self, data):
+        """Reject double-booking a staff member and, if configured, overloading a department."""
+        instance = self.instance
+        start = data.get('scheduled_start_time', getattr(instance, 'scheduled_start_time', None))
+        end = data.get('scheduled_end_time', getattr(instance, 'scheduled_end_time', None))
+        duration = data.get('duration_minutes', getattr(instance, 'duration_minutes', None))
+        if start and not end and duration:
+            end = start + timedelta(minutes=duration)
+        if not start or not end:
+            return
+        status = data.get('status', getattr(instance, 'status', 'scheduled'))
+        if status in ('completed', 'cancelled', 'archived'):
+            return
+        if 'assigned_staff' in data:
+            staff = data['assigned_staff']
+            if isinstance(staff, list):
+                staff = staff[0] if staff else None
+        else:
+            staff = getattr(instance, 'assigned_staff', None)
+        department = data.get('department', getattr(instance, 'department', None))
+
+        conflicts = find_conflicts(
+            start, end,
+            department_id=department.id if department else None,
+            staff_id=staff.id if staff else None,
+            exclude_id=instance.id if instance else None,
+        )
+        if conflicts['staff_conflicts']:
+            raise serializers.ValidationError({
+                "assigned_staff_ids": f"Staff member is already booked on overlapping task(s) {conflicts['staff_conflicts']}."
+            })
+        capacity = conflicts['department_capacity']
+        if capacity is not None and conflicts['department_load'] >= capacity:
+            raise serializers.ValidationError({
+                "scheduled_start_time": f"Department already has {conflicts['department_load']} concurrent task(s) in this slot (capacity {capacity})."
+            })
+
     # ------------------------------------------------------------------
     # Override create/update to properly assign ManyToMany `assigned_staff`
     # ------------------------------------------------------------------
@@ -5,12 +5,14 @@ from django.utils import timezone
 from django.db.models import Q, Sum, Count
 from django.db import transaction
 from django.contrib.auth.models import User
-from datetime import timedelta
+from datetime import datetime, timedelta, date as datetime_date
+
+from cleantrac_project.db_routers import reporting_reads
 
 from .models import Department
 from .recipe_models import (
     Recipe, RecipeIngredient, RecipeVersion, ProductionSchedule, RecipeProductionTask,
-    ProductionRecord, InventoryItem, InventoryTransaction, WasteRecord
+    ProductionRecord, InventoryItem, InventoryTransaction, InventorySnapshot, WasteRecord
 )
 from .recipe_serializers import (
     RecipeSerializer, RecipeDetailSerializer, RecipeIngredientSerializer,
@@ -18,6 +20,9 @@ from .recipe_serializers import (
     InventoryItemSerializer, InventoryTransactionSerializer, WasteRecordSerializer,
     RecipeProductionTaskSerializer
 )
+from .auth_context import get_auth_context
+from . import caching
+from .production_capacity import overlapping_window, weekly_report
 from .permissions import (
     IsManagerForWriteOrAuthenticatedReadOnly, IsSuperUser, 
     IsSuperUserWriteOrManagerRead, CanManageRecipes, CanManageInventory,
@@ -35,15 +40,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageRecipes]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return Recipe.objects.none()
-
         # Filter by department if specified
         department_id = self.request.query_params.get('department_id')
         is_active = self.request.query_params.get('is_active')
         
-        queryset = Recipe.objects.all()
+        queryset = Recipe.objects.for_user(self.request.user, self.request)
         
         if department_id:
             queryset = queryset.filter(department_id=department_id)
@@ -52,16 +53,6 @@ class RecipeViewSet(viewsets.ModelViewSet):
             is_active_bool = is_active.lower() == 'true'
             queryset = queryset.filter(is_active=is_active_bool)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(department=user_profile.department)
-                else:
-                    return Recipe.objects.none()
-            except:
-                return Recipe.objects.none()
         
         return queryset.order_by('department', 'name')
 
@@ -77,6 +68,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @reporting_reads()
     def department_summary(self, request):
         """Get summary of recipes by department"""
         user = request.user
@@ -87,14 +79,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if user.is_superuser:
             departments = Department.objects.all()
         else:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    departments = Department.objects.filter(id=user_profile.department.id)
-                else:
-                    return Response({"error": "User has no department assigned"}, status=status.HTTP_403_FORBIDDEN)
-            except:
+            auth = get_auth_context(request)
+            if auth.profile is None:
                 return Response({"error": "User profile not found"}, status=status.HTTP_403_FORBIDDEN)
+            if not auth.department_id:
+                return Response({"error": "User has no department assigned"}, status=status.HTTP_403_FORBIDDEN)
+            departments = Department.objects.filter(id=auth.department_id)
         
         summary = []
         for dept in departments:
@@ -123,28 +113,14 @@ class RecipeIngredientViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageRecipes]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return RecipeIngredient.objects.none()
-
         # Filter by recipe if specified
         recipe_id = self.request.query_params.get('recipe_id')
         
-        queryset = RecipeIngredient.objects.all()
+        queryset = RecipeIngredient.objects.for_user(self.request.user, self.request)
         
         if recipe_id:
             queryset = queryset.filter(recipe_id=recipe_id)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(recipe__department=user_profile.department)
-                else:
-                    return RecipeIngredient.objects.none()
-            except:
-                return RecipeIngredient.objects.none()
         
         return queryset
 
@@ -218,10 +194,6 @@ class ProductionScheduleViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageProductionSchedule]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return ProductionSchedule.objects.none()
-
         # Filter by department, date range, or status if specified
         department_id = self.request.query_params.get('department_id')
         recipe_id = self.request.query_params.get('recipe_id')
@@ -229,7 +201,7 @@ class ProductionScheduleViewSet(viewsets.ModelViewSet):
         end_date = self.request.query_params.get('end_date')
         status = self.request.query_params.get('status')
         
-        queryset = ProductionSchedule.objects.all()
+        queryset = ProductionSchedule.objects.for_user(self.request.user, self.request)
         
         if department_id:
             queryset = queryset.filter(department_id=department_id)
@@ -246,16 +218,6 @@ class ProductionScheduleViewSet(viewsets.ModelViewSet):
         if status:
             queryset = queryset.filter(status=status)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(department=user_profile.department)
-                else:
-                    return ProductionSchedule.objects.none()
-            except:
-                return ProductionSchedule.objects.none()
         
         return queryset.order_by('scheduled_date', 'start_time')
 
@@ -310,40 +272,32 @@ class ProductionRecordViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageProductionSchedule]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return ProductionRecord.objects.none()
-
         # Filter by schedule if specified
         schedule_id = self.request.query_params.get('schedule_id')
         
-        queryset = ProductionRecord.objects.all()
+        queryset = ProductionRecord.objects.for_user(self.request.user, self.request)
         
         if schedule_id:
             queryset = queryset.filter(schedule_id=schedule_id)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(schedule__department=user_profile.department)
-                else:
-                    return ProductionRecord.objects.none()
-            except:
-                return ProductionRecord.objects.none()
         
         return queryset.order_by('-actual_end_time')
 
     def perform_create(self, serializer):
-        """Set completed_by to current user when creating a production record"""
-        # Update the schedule status to completed
-        schedule = serializer.validated_data.get('schedule')
-        if schedule:
-            schedule.status = 'completed'
-            schedule.save(update_fields=['status', 'updated_at'])
-        
-        serializer.save(completed_by=self.request.user)
+        """Set completed_by to current user when creating a production record.
+
+        Completing a schedule also posts the scaled ingredient consumption to
+        the inventory ledger in the same transaction.
+        """
+        with transaction.atomic():
+            # Update the schedule status to completed
+            schedule = serializer.validated_data.get('schedule')
+            if schedule:
+                schedule.status = 'completed'
+                schedule.save(update_fields=['status', 'updated_at'])
+
+            record = serializer.save(completed_by=self.request.user)
+            record.post_ingredient_consumption(recorded_by=self.request.user)
 
 
 class InventoryItemViewSet(viewsets.ModelViewSet):
@@ -356,28 +310,14 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageInventory]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return InventoryItem.objects.none()
-
         # Filter by department if specified
         department_id = self.request.query_params.get('department_id')
         
-        queryset = InventoryItem.objects.all()
+        queryset = InventoryItem.objects.for_user(self.request.user, self.request)
         
         if department_id:
             queryset = queryset.filter(department_id=department_id)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(department=user_profile.department)
-                else:
-                    return InventoryItem.objects.none()
-            except:
-                return InventoryItem.objects.none()
         
         return queryset.order_by('department', 'ingredient_name')
 
@@ -391,6 +331,39 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='stock-as-of')
+    def stock_as_of(self, request):
+        """
+        Stock level of each visible inventory item at the end of ?date=YYYY-MM-DD.
+
+        Starts from the nearest daily InventorySnapshot on or before the date and
+        replays only the transactions after it, so the cost does not grow with
+        the full transaction history.
+        """
+        date_str = request.query_params.get('date')
+        if not date_str:
+            return Response({"error": "date parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            as_of = datetime_date.fromisoformat(date_str)
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        balances = InventorySnapshot.stock_as_of(queryset, as_of)
+        results = []
+        for item in queryset:
+            stock, snapshot_date = balances[item.id]
+            results.append({
+                'id': item.id,
+                'ingredient_code': item.ingredient_code,
+                'ingredient_name': item.ingredient_name,
+                'department_id': item.department_id,
+                'unit': item.unit,
+                'stock': stock,
+                'snapshot_date': snapshot_date,
+            })
+        return Response({'as_of': as_of, 'items': results})
+
 
 class InventoryTransactionViewSet(viewsets.ModelViewSet):
     """
@@ -402,17 +375,13 @@ class InventoryTransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageInventory]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return InventoryTransaction.objects.none()
-
         # Filter by inventory item, transaction type, or date range if specified
         inventory_item_id = self.request.query_params.get('inventory_item_id')
         transaction_type = self.request.query_params.get('transaction_type')
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
         
-        queryset = InventoryTransaction.objects.all()
+        queryset = InventoryTransaction.objects.for_user(self.request.user, self.request)
         
         if inventory_item_id:
             queryset = queryset.filter(inventory_item_id=inventory_item_id)
@@ -426,16 +395,6 @@ class InventoryTransactionViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(transaction_date__lte=end_date)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(inventory_item__department=user_profile.department)
-                else:
-                    return InventoryTransaction.objects.none()
-            except:
-                return InventoryTransaction.objects.none()
         
         return queryset.order_by('-transaction_date')
 
@@ -454,10 +413,6 @@ class WasteRecordViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageInventory]
 
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return WasteRecord.objects.none()
-
         # Filter by department, recipe, inventory item, or date range if specified
         department_id = self.request.query_params.get('department_id')
         recipe_id = self.request.query_params.get('recipe_id')
@@ -466,7 +421,7 @@ class WasteRecordViewSet(viewsets.ModelViewSet):
         end_date = self.request.query_params.get('end_date')
         reason = self.request.query_params.get('reason')
         
-        queryset = WasteRecord.objects.all()
+        queryset = WasteRecord.objects.for_user(self.request.user, self.request)
         
         if department_id:
             queryset = queryset.filter(department_id=department_id)
@@ -486,16 +441,6 @@ class WasteRecordViewSet(viewsets.ModelViewSet):
         if reason:
             queryset = queryset.filter(reason=reason)
             
-        # If user is not superuser, restrict to their department
-        if not user.is_superuser:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    queryset = queryset.filter(department=user_profile.department)
-                else:
-                    return WasteRecord.objects.none()
-            except:
-                return WasteRecord.objects.none()
         
         return queryset.order_by('-recorded_at')
 
@@ -504,56 +449,50 @@ class WasteRecordViewSet(viewsets.ModelViewSet):
         serializer.save(recorded_by=self.request.user)
 
     @action(detail=False, methods=['get'])
+    @caching.cache_response('waste-summary', depends_on=(WasteRecord, Department))
+    @reporting_reads()
     def summary_by_department(self, request):
         """Get waste summary by department"""
         user = request.user
         if not user.is_authenticated:
             return Response(status=status.HTTP_401_UNAUTHORIZED)
         
-        # Get departments based on user permissions
-        if user.is_superuser:
-            departments = Department.objects.all()
-        else:
-            try:
-                user_profile = user.profile
-                if user_profile.department:
-                    departments = Department.objects.filter(id=user_profile.department.id)
-                else:
-                    return Response({"error": "User has no department assigned"}, status=status.HTTP_403_FORBIDDEN)
-            except:
-                return Response({"error": "User profile not found"}, status=status.HTTP_403_FORBIDDEN)
+        department_ids, error = self._analytics_department_ids(request)
+        if error:
+            return error
         
         # Get date range from query params, default to current month
-        start_date = request.query_params.get('start_date', timezone.now().replace(day=1).date().isoformat())
-        end_date = request.query_params.get('end_date', timezone.now().date().isoformat())
+        try:
+            start_date, end_date = self._analytics_date_range(request)
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        departments = Department.objects.all() if department_ids is None else Department.objects.filter(id__in=department_ids)
+        rows = (
+            WasteRecord.objects.filter(
+                department__in=departments,
+                recorded_at__date__gte=start_date,
+                recorded_at__date__lte=end_date,
+            )
+            .values('department_id', 'reason')
+            .annotate(count=Count('id'), total_cost=Sum('cost'), total_quantity=Sum('quantity'))
+            .order_by('department_id', 'reason')
+        )
+        by_department = {}
+        for row in rows:
+            by_department.setdefault(row.pop('department_id'), []).append(row)
         
         summary = []
         for dept in departments:
-            waste_records = WasteRecord.objects.filter(
-                department=dept,
-                recorded_at__gte=start_date,
-                recorded_at__lte=end_date
-            )
-            
-            total_cost = waste_records.aggregate(total=Sum('cost'))['total'] or 0
-            total_quantity = waste_records.aggregate(total=Sum('quantity'))['total'] or 0
-            
-            # Group by reason
-            reason_summary = waste_records.values('reason').annotate(
-                count=Count('id'),
-                total_cost=Sum('cost'),
-                total_quantity=Sum('quantity')
-            )
-            
-            dept_summary = {
+            reason_summary = by_department.get(dept.id, [])
+            summary.append({
                 'department_id': dept.id,
                 'department_name': dept.name,
-                'total_waste_cost': total_cost,
-                'total_waste_quantity': total_quantity,
-                'record_count': waste_records.count(),
-                'by_reason': list(reason_summary)
-            }
-            summary.append(dept_summary)
+                'total_waste_cost': sum((r['total_cost'] for r in reason_summary), 0),
+                'total_waste_quantity': sum((r['total_quantity'] for r in reason_summary), 0),
+                'record_count': sum(r['count'] for r in reason_summary),
+                'by_reason': reason_summary
+            })
         
         return Response({
             'start_date': start_date,
@@ -561,6 +500,51 @@ class WasteRecordViewSet(viewsets.ModelViewSet):
             'departments': summary
         })
 
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        Waste cost and quantity by department x reason x day/week, top recipes
+        and inventory items by waste cost, and trend versus the previous period.
+        Query params: start_date, end_date (YYYY-MM-DD, default current month),
+        granularity (day|week), department_id (superusers only).
+        """
+        department_ids, error = self._analytics_department_ids(request)
+        if error:
+            return error
+        try:
+            start_date, end_date = self._analytics_date_range(request)
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({"error": "start_date must be on or before end_date."}, status=status.HTTP_400_BAD_REQUEST)
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in ('day', 'week'):
+            return Response({"error": "granularity must be 'day' or 'week'."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(WasteRecord.analytics(department_ids, start_date, end_date, granularity))
+
+    def _analytics_department_ids(self, request):
+        """Departments the user may report on: None for all, else a list of IDs."""
+        user = request.user
+        if user.is_superuser:
+            department_id = request.query_params.get('department_id')
+            return ([int(department_id)] if department_id and department_id.isdigit() else None), None
+        auth = get_auth_context(request)
+        if auth.profile is None:
+            return None, Response({"error": "User profile not found"}, status=status.HTTP_403_FORBIDDEN)
+        if not auth.department_id:
+            return None, Response({"error": "User has no department assigned"}, status=status.HTTP_403_FORBIDDEN)
+        return [auth.department_id], None
+
+    def _analytics_date_range(self, request):
+        today = timezone.localdate()
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        return (
+            datetime_date.fromisoformat(start_date) if start_date else today.replace(day=1),
+            datetime_date.fromisoformat(end_date) if end_date else today,
+        )
+
 class RecipeProductionTaskViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing recipe production tasks.
@@ -608,62 +592,16 @@ class RecipeProductionTaskViewSet(viewsets.ModelViewSet):
     # ------------------------------------------------------------------
     def _generate_child_tasks(self, parent_task, days_ahead):
         """Generate child RecipeProductionTask rows up to *days_ahead* days in advance."""
-        delta_map = {
-            'daily': timedelta(days=1),
-            'weekly': timedelta(weeks=1),
-            'monthly': timedelta(days=30),  # simple month approximation
-        }
-        delta = delta_map.get(parent_task.recurrence_type)
-        if not delta:
-            return
-
-        current_start = parent_task.scheduled_start_time + delta
-        current_end = parent_task.scheduled_end_time + delta if parent_task.scheduled_end_time else None
-        target_end_date = parent_task.scheduled_start_time + timedelta(days=days_ahead)
-
-        while current_start.date() <= target_end_date.date():
-            if not RecipeProductionTask.objects.filter(parent_task=parent_task, scheduled_start_time=current_start).exists():
-                RecipeProductionTask.objects.create(
-                    recipe=parent_task.recipe,
-                    department=parent_task.department,
-                    scheduled_start_time=current_start,
-                    scheduled_end_time=current_end,
-                    scheduled_quantity=parent_task.scheduled_quantity,
-                    status='scheduled',
-                    is_recurring=False,
-                    recurrence_type=parent_task.recurrence_type,
-                    notes=f"Auto-generated child of task {parent_task.id}",
-                    assigned_staff=parent_task.assigned_staff,
-                    created_by=parent_task.created_by,
-                    parent_task=parent_task,
-                    task_type=getattr(parent_task, 'task_type', 'prep'),
-                    duration_minutes=getattr(parent_task, 'duration_minutes', None),
-                )
-            current_start += delta
-            if current_end:
-                current_end += delta
+        RecipeProductionTask.generate_recurring_children(
+            [parent_task], parent_task.scheduled_start_time + timedelta(days=days_ahead)
+        )
     
     def get_queryset(self):
         """Return recipe production tasks filtered by role and query params."""
         user = self.request.user
-        if not user.is_authenticated:
-            return RecipeProductionTask.objects.none()
-
-        qs = RecipeProductionTask.objects.all()
-
-        # Role/department scoping (non-superusers)
-        if not user.is_superuser:
-            try:
-                profile = user.profile
-                if profile.role == 'manager' and profile.department:
-                    qs = qs.filter(department=profile.department)
-                elif profile.role == 'staff' and profile.department:
-                    # Staff should only see tasks that are assigned specifically to them within their department
-                    qs = qs.filter(department=profile.department, assigned_staff=user)
-                else:
-                    return RecipeProductionTask.objects.none()
-            except UserProfile.DoesNotExist:
-                return RecipeProductionTask.objects.none()
+        # Managers see their department; staff only tasks assigned to them there
+        qs = RecipeProductionTask.objects.for_user(user, self.request)
+        auth = get_auth_context(self.request)
 
         params = self.request.query_params
 
@@ -675,7 +613,7 @@ class RecipeProductionTaskViewSet(viewsets.ModelViewSet):
                 qs = qs.filter(status__in=statuses)
         else:
             # Default for staff: hide archived
-            if not user.is_superuser and getattr(user.profile, 'role', None) == 'staff':
+            if not user.is_superuser and auth.is_staff_member:
                 qs = qs.exclude(status='archived')
 
         # Additional filters
@@ -744,6 +682,36 @@ class RecipeProductionTaskViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """
+        Staff double-bookings and per-hour department load for one week.
+        Query params: week_start (YYYY-MM-DD, defaults to this week's Monday),
+        department_id.
+        """
+        week_start_str = request.query_params.get('week_start')
+        if week_start_str:
+            try:
+                week_start = datetime_date.fromisoformat(week_start_str)
+            except ValueError:
+                return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            today = timezone.localdate()
+            week_start = today - timedelta(days=today.weekday())
+
+        start = timezone.make_aware(datetime.combine(week_start, datetime.min.time()))
+        end = start + timedelta(days=7)
+        # get_queryset applies the date params itself, so window the week here.
+        # The report only reads these columns; drop get_queryset's joins,
+        # which .only() can't combine with deferring the related fields.
+        tasks = (
+            self.get_queryset().filter(overlapping_window(start, end))
+            .select_related(None).prefetch_related(None)
+            .only('id', 'department_id', 'assigned_staff_id', 'status',
+                  'scheduled_start_time', 'scheduled_end_time', 'duration_minutes')
+        )
+        return Response(weekly_report(tasks, start))
+
     @action(detail=True, methods=['post'])
     def create_recurring_instance(self, request, pk=None):
         """Create a new instance of a recurring task"""
@@ -771,6 +739,8 @@ class RecipeProductionTaskViewSet(viewsets.ModelViewSet):
         """
         Generate upcoming instances of recurring tasks.
         By default, generates tasks for the next 30 days.
+        Generated instances are not checked for staff double-booking or
+        department capacity.
         """
         days = int(request.data.get('days', 30))
         if days < 1 or days > 365:
@@ -779,37 +749,17 @@ class RecipeProductionTaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all recurring tasks
+        # Get all recurring parent tasks
         recurring_tasks = self.get_queryset().filter(
             is_recurring=True,
             parent_task__isnull=True  # Only get parent tasks
-        )
+        ).exclude(status__in=['cancelled', 'archived'])
         
-        created_count = 0
-        for task in recurring_tasks:
-            # For each recurring task, generate instances for the specified period
-            end_date = timezone.now() + timezone.timedelta(days=days)
-            current_date = timezone.now()
-            
-            while current_date < end_date:
-                # Try to generate the next occurrence
-                next_instance = task.generate_next_occurrence(from_date=current_date)
-                if next_instance:
-                    created_count += 1
-                    # Move to the next potential date
-                    if task.recurrence_type == 'daily':
-                        current_date += timezone.timedelta(days=1)
-                    elif task.recurrence_type == 'weekly':
-                        current_date += timezone.timedelta(days=7)
-                    elif task.recurrence_type == 'monthly':
-                        # Approximate a month
-                        current_date += timezone.timedelta(days=30)
-                    else:
-                        # For custom recurrence, move forward a day at a time
-                        current_date += timezone.timedelta(days=1)
-                else:
-                    # If we couldn't generate an instance, move forward to avoid infinite loop
-                    current_date += timezone.timedelta(days=1)
+        now = timezone.now()
+        created = RecipeProductionTask.generate_recurring_children(
+            recurring_tasks, now + timedelta(days=days), since=now
+        )
+        created_count = len(created)
         
         return Response({
             "message": f"Generated {created_count} recurring task instances",
@@ -303,7 +303,7 @@ class TaskInstanceSerializer(serializers.ModelSerializer):
                 'first_name': user.first_name, # Keep for potential direct use elsewhere
                 'last_name': user.last_name,   # Keep for potential direct use elsewhere
                 'full_name': full_name,        # Add a reliable full_name
-                'department_id': obj.assigned_to.department.id if obj.assigned_to.department else None
+                'department_id': obj.assigned_to.department_id
             }
         return None
 
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import UserProfile
+from . import events
+from .recipe_models import InventoryTransaction, InventorySnapshot
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -35,3 +38,52 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         #     profile.email = instance.email # Example
         #     profile.save()
         pass # Main goal here is just ensuring existence via get_or_create
+
+
+def _drop_snapshots_from(inventory_item_id, transaction_date):
+    InventorySnapshot.objects.filter(
+        inventory_item_id=inventory_item_id,
+        snapshot_date__gte=timezone.localdate(transaction_date),
+    ).delete()
+
+
+@receiver(pre_save, sender=InventoryTransaction)
+def remember_ledger_position(sender, instance, **kwargs):
+    """Keep the stored item and date of an edited transaction; an edit can move either."""
+    instance._ledger_position = None
+    if instance.pk is not None:
+        instance._ledger_position = (
+            sender.objects.filter(pk=instance.pk).values_list('inventory_item_id', 'transaction_date').first()
+        )
+
+
+@receiver(post_save, sender=InventoryTransaction)
+def invalidate_inventory_snapshots(sender, instance, **kwargs):
+    """
+    Drop snapshots that a back-dated, edited or deleted transaction has made
+    stale, from the earliest day it affects (its old and new dates on edits).
+    The nearest older snapshot plus the ledger delta still answers stock-as-of
+    queries for those days, and the next snapshot run rewrites them.
+    """
+    _drop_snapshots_from(instance.inventory_item_id, instance.transaction_date)
+    previous = getattr(instance, '_ledger_position', None)
+    if previous is not None:
+        _drop_snapshots_from(*previous)
+
+
+@receiver(post_delete, sender=InventoryTransaction)
+def invalidate_inventory_snapshots_on_delete(sender, instance, **kwargs):
+    _drop_snapshots_from(instance.inventory_item_id, instance.transaction_date)
+
+
+def publish_saved_change(sender, instance, created, **kwargs):
+    events.publish_instance(instance, 'created' if created else 'updated')
+
+
+def publish_deleted_change(sender, instance, **kwargs):
+    events.publish_instance(instance, 'deleted')
+
+
+for _model in events.FEED_MODELS:
+    post_save.connect(publish_saved_change, sender=_model)
+    post_delete.connect(publish_deleted_change, sender=_model)
@@ -0,0 +1,244 @@
+"""
+Slow-query capture.
+
+Every database connection gets an execute wrapper (installed on
+connection_created). When a statement takes longer than the slow-query
+threshold, it is recorded in the SlowQuery table of the current tenant
+once the response is ready (right away outside requests).
+Each row is keyed by three things:
+- the SQL fingerprint (instrumentation.fingerprint);
+- the route that ran it;
+- the innermost project frame that issued it, e.g. a get_queryset or a
+  serializer method.
+
+Each row keeps a count, the total and worst duration, the parameter types
+and the EXPLAIN plan captured on its first occurrence. Sorting the table
+by total_ms shows which code path to fix first. The plan comes from
+EXPLAIN on PostgreSQL and EXPLAIN QUERY PLAN on SQLite; the statement is
+never run a second time.
+
+The threshold starts at settings.SLOW_QUERY_MS, where 0 means off. Superusers
+can change it at runtime through /api/slow-queries/. The value lives in the
+shared cache and every worker re-reads it every REFRESH_SECONDS, so no
+restart is needed. With capture off, each query pays for one extra function
+call and a clock read.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import caching
+from .instrumentation import fingerprint, route_label
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 10.0
+STACK_FRAMES = 5
+
+_THRESHOLD_KEY = 'slow-queries:threshold-ms'
+_EXPLAIN_PREFIX = {'postgresql': 'EXPLAIN ', 'sqlite': 'EXPLAIN QUERY PLAN '}
+_pending = ContextVar('slow_query_pending', default=None)
+_local = threading.local()  # .busy: capturing already, don't time our own queries
+_threshold = {'value': None, 'read_at': float('-inf')}
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+# Frames in these files are the capture machinery, not the caller.
+_SKIP_FILES = {__file__, os.path.join(os.path.dirname(__file__), 'instrumentation.py')}
+
+
+def threshold_ms():
+    """The active threshold in ms (0 = off), re-read from the shared cache every REFRESH_SECONDS."""
+    now = time.monotonic()
+    if now - _threshold['read_at'] >= REFRESH_SECONDS:
+        _threshold['read_at'] = now
+        with caching.tenant_keys('public'):
+            override = cache.get(_THRESHOLD_KEY)
+        _threshold['value'] = settings.SLOW_QUERY_MS if override is None else override
+    return _threshold['value']
+
+
+def set_threshold_ms(value):
+    """Set the threshold for every worker (None restores settings.SLOW_QUERY_MS)."""
+    with caching.tenant_keys('public'):
+        if value is None:
+            cache.delete(_THRESHOLD_KEY)
+        else:
+            cache.set(_THRESHOLD_KEY, value, None)
+    _threshold['read_at'] = float('-inf')
+
+
+def _params_shape(params, many):
+    if many:
+        params = next(iter(params), None)
+    if params is None:
+        return []
+    values = params.values() if isinstance(params, dict) else params
+    return [f'{type(value).__name__}[{len(value)}]' if isinstance(value, (list, tuple)) else type(value).__name__
+            for value in values]
+
+
+def _project_frames():
+    """Innermost-first 'path:line in function' for the project's own frames."""
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        if not frame.filename.startswith(_PROJECT_ROOT) or frame.filename in _SKIP_FILES:
+            continue
+        if f'{os.sep}site-packages{os.sep}' in frame.filename:
+            continue
+        frames.append(f'{frame.filename[len(_PROJECT_ROOT):]}:{frame.lineno} in {frame.name}')
+        if len(frames) == STACK_FRAMES:
+            break
+    return frames
+
+
+def _explain(connection, sql, params, many):
+    prefix = _EXPLAIN_PREFIX.get(connection.vendor)
+    if many or prefix is None or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    try:
+        # A savepoint, so a failed EXPLAIN doesn't abort the caller's transaction.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(str(row[0]) for row in rows)
+
+
+def _record(alias, sql, params, many, elapsed_ms, frames, route):
+    from .models import SlowQuery
+
+    normalized = fingerprint(sql)
+    caller = frames[0] if frames else ''
+    key = hashlib.sha1(f'{alias}\n{route}\n{caller}\n{normalized}'.encode()).hexdigest()
+    now = timezone.now()
+    updated = SlowQuery.objects.using(DEFAULT_DB_ALIAS).filter(key=key).update(
+        count=F('count') + 1,
+        total_ms=F('total_ms') + elapsed_ms,
+        max_ms=Greatest(F('max_ms'), elapsed_ms),
+        last_seen=now,
+    )
+    if updated:
+        return
+    SlowQuery.objects.using(DEFAULT_DB_ALIAS).create(
+        key=key,
+        alias=alias,
+        schema=caching.current_schema(),
+        route=route,
+        caller=caller,
+        stack='\n'.join(frames),
+        fingerprint=normalized,
+        params_shape=_params_shape(params, many),
+        plan=_explain(connections[alias], sql, params, many),
+        count=1,
+        total_ms=elapsed_ms,
+        max_ms=elapsed_ms,
+        first_seen=now,
+        last_seen=now,
+    )
+
+
+def _save(captured, route=''):
+    _local.busy = True
+    try:
+        for alias, sql, params, many, elapsed_ms, frames in captured:
+            try:
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    _record(alias, sql, params, many, elapsed_ms, frames, route)
+            except DatabaseError:
+                # e.g. inside a transaction that already failed, or before migrate
+                logger.warning('Could not record slow query on %s', alias, exc_info=True)
+    finally:
+        _local.busy = False
+
+
+def capture(execute, sql, params, many, context):
+    """execute_wrapper: note statements slower than the threshold."""
+    if getattr(_local, 'busy', False):
+        return execute(sql, params, many, context)
+    _local.busy = True
+    try:
+        limit = threshold_ms()
+    finally:
+        _local.busy = False
+    if not limit:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= limit:
+        entry = (context['connection'].alias, sql, params, many, elapsed_ms, _project_frames())
+        pending = _pending.get()
+        if pending is not None:
+            pending.append(entry)  # saved once the response is ready
+        else:
+            _save([entry])
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: add the capture wrapper once per connection wrapper."""
+    if capture not in connection.execute_wrappers:
+        # At the front: connection.execute_wrapper() pops the last wrapper on
+        # exit, and the connection may be created inside such a block.
+        connection.execute_wrappers.insert(0, capture)
+
+
+class SlowQueryMiddleware:
+    """
+    Holds the request's slow queries until its response is ready, then saves
+    them with the route. This keeps the bookkeeping writes out of the view's
+    transaction and timing. Under ASGI the list is a ContextVar that the
+    request's sync_to_async threads share.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _route(request):
+        return route_label(request) if getattr(request, 'resolver_match', None) else ''
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pending.set([])
+        try:
+            response = self.get_response(request)
+        finally:
+            captured = _pending.get()
+            _pending.reset(token)
+        if captured:
+            _save(captured, self._route(request))
+        return response
+
+    async def __acall__(self, request):
+        token = _pending.set([])
+        try:
+            response = await self.get_response(request)
+        finally:
+            captured = _pending.get()
+            _pending.reset(token)
+        if captured:
+            await sync_to_async(_save)(captured, self._route(request))
+        return response
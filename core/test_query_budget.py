@@ -0,0 +1,184 @@
+"""
+Query-budget regression tests generated from the API router.
+
+For every viewset registered on core.urls.router this builds rows of the
+viewset's model (with their required relations) at two sizes and checks
+that the list and retrieve endpoints run the same number of SQL queries at
+both. A count that grows with the number of rows is an N+1: usually a
+SerializerMethodField or nested serializer reading a relation the
+viewset's queryset doesn't select_related/prefetch_related.
+
+Rows are built by a small generic factory that fills required fields and
+creates one shared instance per related model, so new viewsets are covered
+without writing fixtures. Endpoints that can't be exercised this way are
+listed in SKIPPED with the reason.
+"""
+import datetime
+import itertools
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connections, models
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Department, UserProfile
+from core.urls import router
+
+SMALL, LARGE = 2, 6
+
+SKIPPED = {
+    'receivingrecord': 'reads the external traceability database',
+}
+
+_counter = itertools.count(1)
+
+
+def _value_for(field):
+    """A valid value for a non-relational field, different on each call where it can be."""
+    n = next(_counter)
+    if field.choices:
+        return field.choices[n % len(field.choices)][0]
+    if isinstance(field, models.BooleanField):
+        return False
+    if isinstance(field, models.DecimalField):
+        return Decimal('1.00')
+    if isinstance(field, (models.IntegerField, models.FloatField)):
+        return 1
+    if isinstance(field, models.DateTimeField):
+        return timezone.now()
+    if isinstance(field, models.DateField):
+        return timezone.localdate() - datetime.timedelta(days=n)
+    if isinstance(field, models.TimeField):
+        return datetime.time(9, 0)
+    if isinstance(field, models.JSONField):
+        return {}
+    if isinstance(field, models.FileField):
+        return f'query-budget/{n}.txt'
+    if isinstance(field, models.EmailField):
+        return f'user{n}@example.com'
+    if isinstance(field, (models.CharField, models.TextField)):
+        value = f'{field.name}-{n}'
+        return value[:field.max_length] if field.max_length else value
+    raise TypeError(f'No test value for {field.model.__name__}.{field.name} ({type(field).__name__})')
+
+
+def _unique_together_fields(model):
+    names = {name for group in model._meta.unique_together for name in group}
+    for constraint in model._meta.constraints:
+        names.update(getattr(constraint, 'fields', ()))
+    return names
+
+
+class ModelFactory:
+    """Builds model instances with every required field filled in."""
+
+    def __init__(self, department, user):
+        self.shared = {Department: department, User: user}
+        self._building = set()
+
+    def related(self, model):
+        if model not in self.shared:
+            self.shared[model] = self.create(model)
+        return self.shared[model]
+
+    def create(self, model):
+        self._building.add(model)
+        try:
+            return self._create(model)
+        finally:
+            self._building.discard(model)
+
+    def _create(self, model):
+        values = {}
+        unique_together = _unique_together_fields(model)
+        for field in model._meta.concrete_fields:
+            if field.primary_key and isinstance(field, models.AutoField):
+                continue
+            if field.is_relation:
+                # Fill optional relations too, so per-row lookups of them show
+                # up; only self-references and cycles are left empty.
+                if field.null and field.related_model in self._building:
+                    continue
+                target = self.related(field.related_model)
+                if isinstance(field, models.OneToOneField):
+                    # One-to-one targets can't be shared between rows.
+                    target = self.create(field.related_model)
+                values[field.name] = target
+            elif (field.primary_key or field.name in unique_together
+                  or not (field.null or field.blank or field.has_default())):
+                values[field.name] = _value_for(field)
+        instance = model.objects.create(**values)
+        for field in model._meta.many_to_many:
+            if field.related_model in (Department, User):
+                getattr(instance, field.name).add(self.related(field.related_model))
+        return instance
+
+
+class QueryBudgetTests(TestCase):
+    """Populated with test_<basename>_list / test_<basename>_retrieve below."""
+
+    def setUp(self):
+        self.department = Department.objects.create(name='Query budget')
+        self.user = User.objects.create(username='budget-admin', is_superuser=True, is_staff=True)
+        UserProfile.objects.create(user=self.user, department=self.department, role=UserProfile.ROLE_MANAGER)
+        self.factory = ModelFactory(self.department, self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _queries(self, path):
+        with CaptureQueriesContext(connections['default']) as captured:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, f'GET {path}: {response.status_code} {response.content[:200]}')
+        return len(captured.captured_queries)
+
+    def _fill(self, model, count):
+        existing = model.objects.count()
+        return [self.factory.create(model) for _ in range(max(0, count - existing))]
+
+    def assert_list_budget(self, prefix, model):
+        self._fill(model, SMALL)
+        small = self._queries(f'/api/{prefix}/')
+        self._fill(model, LARGE)
+        large = self._queries(f'/api/{prefix}/')
+        self.assertEqual(
+            large, small,
+            f'GET /api/{prefix}/ ran {small} queries for {SMALL} rows but {large} for {LARGE}: '
+            f'a per-row query (N+1) in the serializer or queryset.',
+        )
+
+    def assert_retrieve_budget(self, prefix, model):
+        first = self._fill(model, SMALL)[0]
+        small = self._queries(f'/api/{prefix}/{first.pk}/')
+        self._fill(model, LARGE)
+        large = self._queries(f'/api/{prefix}/{first.pk}/')
+        self.assertEqual(
+            large, small,
+            f'GET /api/{prefix}/<pk>/ ran {small} queries with {SMALL} rows but {large} with {LARGE}.',
+        )
+
+
+def _viewset_model(viewset):
+    queryset = getattr(viewset, 'queryset', None)
+    if queryset is not None:
+        return queryset.model
+    return viewset.serializer_class.Meta.model
+
+
+def _make_test(kind, prefix, model, reason=None):
+    def test(self):
+        if reason:
+            self.skipTest(reason)
+        getattr(self, f'assert_{kind}_budget')(prefix, model)
+    test.__doc__ = f'{kind} /api/{prefix}/ runs a constant number of queries.'
+    return test
+
+
+for _prefix, _viewset, _basename in router.registry:
+    _model = _viewset_model(_viewset)
+    for _kind in ('list', 'retrieve'):
+        if hasattr(_viewset, _kind):
+            setattr(QueryBudgetTests, f'test_{_basename}_{_kind}',
+                    _make_test(_kind, _prefix, _model, SKIPPED.get(_basename)))
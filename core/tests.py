@@ -1,3 +1,1184 @@
-from django.test import TestCase
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import zipfile
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, router, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from cleantrac_project import db_routers
+from cleantrac_project.db_routers import REPLICA_ALIAS, reporting_reads
+from core import (
+    caching, conditional, events, health, instrumentation, memory_profiling, profiling, slow_queries, tenant_runner,
+)
+from core.auth_context import get_auth_context
+from core.command_runs import TimedCommand
+from core.management.commands import explain_hot_queries, run_benchmarks, run_for_tenants
+from core.middleware import AllowIframeForMedia, ReplicaRoutingMiddleware
+from core.models import (
+    AreaUnit, CleaningItem, CommandRun, CompletionLog, Department, Document, ReceivingRecord, SlowQuery, TaskInstance,
+    TemperatureCheckAssignment, Thermometer, ThermometerVerificationAssignment, UserProfile,
+)
+from core.receiving_models import ReceivingRecordManager
+from core.production_capacity import find_conflicts
+from core.recipe_models import (
+    InventoryItem, InventorySnapshot, InventoryTransaction, ProductionRecord, ProductionSchedule, Recipe,
+    RecipeIngredient, RecipeProductionTask, WasteRecord,
+)
+from core.recipe_serializers import RecipeProductionTaskSerializer
+
+
+@override_settings(DATABASE_ROUTERS=['cleantrac_project.db_routers.ReplicaRouter'])
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    The test runner creates a separate database for the "replica" alias, so a
+    row written to the primary is invisible to reads routed to the replica.
+    """
+    databases = {'default', REPLICA_ALIAS}
+
+    def setUp(self):
+        self.assertIn(REPLICA_ALIAS, connections.databases, 'settings define no replica alias')
+        cache.clear()
+
+    def test_reads_outside_reporting_scope_use_primary(self):
+        with db_routers.request_routing():
+            Department.objects.create(name='Bakery')
+            self.assertTrue(Department.objects.filter(name='Bakery').exists())
+
+    def test_reporting_reads_use_replica(self):
+        Department.objects.using(REPLICA_ALIAS).create(name='Replica only')
+        with db_routers.request_routing():
+            with reporting_reads():
+                self.assertEqual(router.db_for_read(Department), REPLICA_ALIAS)
+                self.assertTrue(Department.objects.filter(name='Replica only').exists())
+            self.assertEqual(router.db_for_read(Department), 'default')
+
+    def test_reads_after_a_write_stick_to_primary(self):
+        with db_routers.request_routing():
+            with reporting_reads():
+                Department.objects.create(name='Deli')
+                self.assertEqual(router.db_for_read(Department), 'default')
+                self.assertTrue(Department.objects.filter(name='Deli').exists())
+
+    def test_reads_inside_a_transaction_use_primary(self):
+        with db_routers.request_routing(), reporting_reads(), transaction.atomic():
+            self.assertEqual(router.db_for_read(Department), 'default')
+
+    def test_decorated_function_reads_replica(self):
+        @reporting_reads()
+        def count_departments():
+            return Department.objects.count()
+
+        Department.objects.create(name='Butchery')
+        with db_routers.request_routing():
+            self.assertEqual(count_departments(), 0)
+            self.assertEqual(Department.objects.count(), 1)
+
+    def test_middleware_pins_a_client_after_it_writes(self):
+        factory = RequestFactory()
+        seen = []
+
+        def writing_view(request):
+            Department.objects.create(name='Produce')
+            return HttpResponse()
+
+        def reporting_view(request):
+            with reporting_reads():
+                seen.append(router.db_for_read(Department))
+            return HttpResponse()
+
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        ReplicaRoutingMiddleware(reporting_view)(factory.get('/', **auth))
+        ReplicaRoutingMiddleware(writing_view)(factory.post('/', **auth))
+        ReplicaRoutingMiddleware(reporting_view)(factory.get('/', **auth))
+        ReplicaRoutingMiddleware(reporting_view)(factory.get('/', HTTP_AUTHORIZATION='Token other'))
+        self.assertEqual(seen, [REPLICA_ALIAS, 'default', REPLICA_ALIAS])
+
+    async def test_middleware_pins_a_client_in_an_async_stack(self):
+        factory = AsyncRequestFactory()
+        seen = []
+
+        async def writing_view(request):
+            await Department.objects.acreate(name='Produce')
+            return HttpResponse()
+
+        async def reporting_view(request):
+            def read():
+                with reporting_reads():
+                    seen.append(router.db_for_read(Department))
+            await sync_to_async(read)()
+            return HttpResponse()
+
+        auth = {'headers': {'Authorization': 'Token async'}}
+        middleware = ReplicaRoutingMiddleware(reporting_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(factory.get('/', **auth))
+        await ReplicaRoutingMiddleware(writing_view)(factory.post('/', **auth))
+        await middleware(factory.get('/', **auth))
+        self.assertEqual(seen, [REPLICA_ALIAS, 'default'])
+
+
+class AuthContextTests(TestCase):
+    def test_profile_and_assignment_are_resolved_once_per_request(self):
+        department = Department.objects.create(name='Verification')
+        staff = User.objects.create(username='verifier')
+        UserProfile.objects.create(user=staff, department=department, role=UserProfile.ROLE_STAFF)
+        ThermometerVerificationAssignment.objects.create(staff_member=staff, department=department)
+        thermometer = Thermometer.objects.create(serial_number='T-1', model_identifier='Probe', department=department)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=staff.pk))
+        # has_permission and has_object_permission each check the role and the assignment.
+        with CaptureQueriesContext(connection) as queries:
+            response = client.patch(f'/api/thermometers/{thermometer.pk}/', {'status': 'verified'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        tables = [query['sql'] for query in queries]
+        self.assertEqual(sum('FROM "core_userprofile"' in sql for sql in tables), 1)
+        self.assertEqual(sum('FROM "core_thermometerverificationassignment"' in sql for sql in tables), 1)
+
+
+class DepartmentScopeTests(TestCase):
+    def test_for_user_takes_the_profile_from_the_request_auth_context(self):
+        department = Department.objects.create(name='Scoped')
+        other = Department.objects.create(name='Other')
+        mine = Recipe.objects.create(department=department, product_code='A', name='Mine', yield_quantity=1)
+        Recipe.objects.create(department=other, product_code='B', name='Theirs', yield_quantity=1)
+        user = User.objects.create(username='scoped-manager')
+        UserProfile.objects.create(user=user, department=department, role=UserProfile.ROLE_MANAGER)
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=user.pk)
+        get_auth_context(request).profile  # loaded once, e.g. by a permission class
+        with self.assertNumQueries(0):
+            queryset = Recipe.objects.for_user(user, request)
+        self.assertEqual([recipe.pk for recipe in queryset], [mine.pk])
+
+    def test_receiving_scope_takes_the_profile_from_the_request_auth_context(self):
+        department = Department.objects.create(name='Dry Store')
+        user = User.objects.create(username='receiving-manager')
+        UserProfile.objects.create(user=user, department=department, role=UserProfile.ROLE_MANAGER)
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(pk=user.pk)
+        get_auth_context(request).profile
+        self.enterContext(mock.patch.object(ReceivingRecordManager, 'get_queryset',
+                                            lambda manager: QuerySet(ReceivingRecord)))
+        with self.assertNumQueries(0):
+            queryset = ReceivingRecord.objects.for_user(request.user, request)
+        self.assertIn('Dry Store', str(queryset.query))
+
+
+class RequestMetricsTests(TestCase):
+    def test_counts_queries_of_a_sync_view(self):
+        def view(request):
+            Department.objects.count()
+            Department.objects.exists()
+            return HttpResponse()
+
+        response = instrumentation.RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    async def test_counts_queries_of_an_async_view(self):
+        async def view(request):
+            await Department.objects.acount()
+            await Department.objects.aexists()
+            return HttpResponse()
+
+        middleware = instrumentation.RequestMetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+
+class RequestProfilerTests(TestCase):
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        settings_override = override_settings(REQUEST_PROFILE_DIR=profile_dir.name, REQUEST_PROFILING_SAMPLE_RATE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(profiling.clear)
+        self.superuser = User.objects.create(username='profiler-admin', is_superuser=True, is_staff=True)
+        self.client = APIClient()
+
+    def test_superuser_token_request_is_profiled_and_downloadable(self):
+        token = Token.objects.create(user=self.superuser)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get('/api/departments/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        self.assertEqual([entry['id'] for entry in profiling.profiles()], [profile_id])
+
+        download = self.client.get(f'/api/request-profiles/{profile_id}/')
+        self.assertEqual(download.status_code, 200)
+        for line in b''.join(download.streaming_content).decode().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack and int(count) > 0)
+
+    def test_query_string_is_not_stored(self):
+        token = Token.objects.create(user=self.superuser)
+        self.client.get(f'/api/departments/?__profile=1&token={token.key}', HTTP_AUTHORIZATION=f'Token {token.key}')
+        [entry] = profiling.profiles()
+        self.assertEqual(entry['path'], '/api/departments/')
+
+    def test_flag_from_other_users_is_ignored(self):
+        staff = User.objects.create(username='profiler-staff')
+        self.client.force_login(staff)
+        response = self.client.get('/api/departments/?__profile=1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.profiles(), [])
+
+    @override_settings(REQUEST_PROFILING_INTERVAL_MS=1)
+    async def test_async_stack_samples_the_sync_thread(self):
+        token = await Token.objects.acreate(user=self.superuser)
+
+        def slow_query():
+            time.sleep(0.05)
+            return Department.objects.count()
+
+        async def view(request):
+            await sync_to_async(slow_query)()
+            return HttpResponse()
+
+        middleware = profiling.RequestProfilerMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().get('/', headers={'X-Profile': '1', 'Authorization': f'Token {token.key}'})
+        response = await middleware(request)
+        [entry] = await sync_to_async(profiling.profiles)()
+        self.assertEqual(entry['id'], response['X-Profile-Id'])
+        with await sync_to_async(profiling.open_profile)(entry['id']) as handle:
+            self.assertIn(b'slow_query', handle.read())
+
+
+class _StubTenantCommand(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', default='ok')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'ran in {connection.vendor}')
+        if options['mode'] == 'error':
+            raise CommandError('boom')
+        if options['mode'] == 'exit':
+            sys.exit(3)
+
+
+class TenantRunnerTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch('django_tenants.utils.schema_context', lambda schema: nullcontext()))
+
+    def test_successful_run_reports_its_output(self):
+        result = tenant_runner.run_in_schema('store_a', _StubTenantCommand(), [])
+        self.assertTrue(result.ok)
+        self.assertEqual((result.schema_name, result.error), ('store_a', ''))
+        self.assertIn('ran in', result.output)
+
+    def test_failures_are_reported_not_raised(self):
+        for mode, expected in (('error', 'CommandError: boom'), ('exit', 'SystemExit: 3')):
+            with self.subTest(mode=mode):
+                result = tenant_runner.run_in_schema('store_a', _StubTenantCommand(), ['--mode', mode])
+                self.assertFalse(result.ok)
+                self.assertIn('Traceback', result.error)
+                self.assertIn(expected, result.error)
+
+    def test_command_forwards_the_arguments_after_the_command_name(self):
+        results = [tenant_runner.TenantRunResult(schema, True, 0.1) for schema in ('store_a', 'store_b')]
+        with mock.patch.object(run_for_tenants, 'tenant_schemas', return_value=['store_a', 'store_b']), \
+                mock.patch.object(run_for_tenants, 'run_across_tenants', return_value=results) as run:
+            call_command('run_for_tenants', '--workers', '2', 'generate_tasks', '--days', '3', '--dry-run',
+                         stdout=io.StringIO())
+        run.assert_called_once_with('generate_tasks', ['--days', '3', '--dry-run'], ['store_a', 'store_b'],
+                                    workers=2, on_result=mock.ANY)
+
+    def test_command_fails_when_a_schema_fails(self):
+        results = [tenant_runner.TenantRunResult('store_a', False, 0.1, error='Traceback: boom')]
+        with mock.patch.object(run_for_tenants, 'tenant_schemas', return_value=['store_a']), \
+                mock.patch.object(run_for_tenants, 'run_across_tenants', return_value=results), \
+                self.assertRaisesMessage(CommandError, 'store_a'):
+            call_command('run_for_tenants', 'generate_tasks', stdout=io.StringIO(), stderr=io.StringIO())
+
+
+class _FakeHTTPResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self._body = json.dumps(body).encode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def read(self):
+        return self._body
+
+
+class LoadtestShiftStartTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Bench Dept 1')
+        self.manager, *self.staff = [User.objects.create(username=name) for name in ('lt-manager', 'lt-a', 'lt-b')]
+        UserProfile.objects.create(user=self.manager, department=self.department, role=UserProfile.ROLE_MANAGER)
+        for user in self.staff:
+            UserProfile.objects.create(user=user, department=self.department, role=UserProfile.ROLE_STAFF)
+        Thermometer.objects.create(serial_number='LT-1', model_identifier='Probe', department=self.department,
+                                   status='verified', verification_expiry_date=timezone.localdate() + timedelta(days=9))
+        self.stale = ThermometerVerificationAssignment.objects.create(staff_member=self.manager,
+                                                                      department=self.department)
+        self.logins = []
+
+    def urlopen(self, request, timeout):
+        path = request.full_url.split('127.0.0.1:8000', 1)[1]
+        if path == '/api/token-auth/':
+            self.logins.append(json.loads(request.data)['username'])
+            return _FakeHTTPResponse(200, {'token': 'stub'})
+        if path.startswith('/api/thermometer-verification-assignments/my-assignment/'):
+            raise urllib.error.HTTPError(request.full_url, 404, 'Not Found', {}, io.BytesIO(b'{}'))
+        responses = {
+            '/api/users/me/': {'id': 1},
+            '/api/temperature-check-assignments/my-assignments/': {'am_assignment': {'id': 1}},
+            '/api/thermometers/verified/': [{'id': 1}],
+            '/api/area-units/': [{'id': 1, 'target_temperature_min': '1', 'target_temperature_max': '4'}],
+        }
+        if request.get_method() == 'POST':
+            return _FakeHTTPResponse(201, {})
+        return _FakeHTTPResponse(200, responses.get(path.split('?')[0], []))
+
+    def test_prepares_the_dataset_and_reports_each_step(self):
+        output = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'loadtest.json')
+        with mock.patch('urllib.request.urlopen', self.urlopen):
+            call_command('loadtest_shift_start', '--ramp', '0', '--rounds', '2', '--output', output,
+                         stdout=io.StringIO())
+
+        users = User.objects.filter(pk__in=[self.manager.pk, *(user.pk for user in self.staff)])
+        self.assertTrue(all(user.check_password('loadtest') for user in users))
+        check = TemperatureCheckAssignment.objects.get(department=self.department, time_period='AM')
+        self.assertEqual((check.staff_member, check.assigned_date), (self.staff[0], timezone.localdate()))
+        verification = ThermometerVerificationAssignment.objects.get(department=self.department, is_active=True)
+        self.assertEqual(verification.staff_member, self.staff[-1])
+        self.stale.refresh_from_db()
+        self.assertFalse(self.stale.is_active)
+
+        # The rounds run one after the other: every tablet signs in once per round.
+        self.assertEqual(sorted(self.logins[:3]), ['lt-a', 'lt-b', 'lt-manager'])
+        self.assertEqual(sorted(self.logins[3:]), ['lt-a', 'lt-b', 'lt-manager'])
+        with open(output) as handle:
+            report = json.load(handle)
+        self.assertEqual((report['tablets'], report['rounds']), (3, 2))
+        results = report['results']
+        self.assertEqual(results['login']['requests'], 6)
+        self.assertEqual(results['my-assignment']['statuses'], {'404': 6})
+        self.assertEqual(results['log-temperature']['requests'], 2)  # only lt-a holds the AM checks
+        self.assertEqual(sum(result['errors'] for result in results.values()), 0)
+
+    def test_missing_dataset_is_an_error(self):
+        self.department.delete()
+        with self.assertRaisesMessage(CommandError, 'seed_benchmark_data'):
+            call_command('loadtest_shift_start', stdout=io.StringIO())
+
+
+class _SampleImport(TimedCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true')
+
+    def handle(self, *args, **options):
+        with self.phase('load'):
+            rows = list(range(5))
+        with self.phase('import'):
+            for row in self.progress(rows, total=len(rows)):
+                self.log(f'row {row}')
+                self.count('created')
+        self.warn('1 row skipped')
+        if options['fail']:
+            raise CommandError('boom')
+
+
+class TimedCommandTests(TestCase):
+    def _run(self, *args):
+        out = io.StringIO()
+        call_command(_SampleImport(), *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_run_is_recorded_with_phases_and_counters(self):
+        output = self._run()
+        self.assertIn('row 3', output)
+        run = CommandRun.objects.get()
+        self.assertEqual((run.command, run.status, run.rows), ('tests', 'succeeded', 5))
+        self.assertEqual([phase['name'] for phase in run.summary['phases']], ['load', 'import'])
+        self.assertEqual(run.summary['counters'], {'created': 5})
+        self.assertEqual(run.summary['arguments'], {'fail': False})
+
+    def test_quiet_keeps_warnings_and_summary(self):
+        output = self._run('--quiet')
+        self.assertNotIn('row 3', output)
+        self.assertIn('1 row skipped', output)
+        self.assertIn('created: 5', output)
+
+    def test_failed_run_is_recorded(self):
+        with self.assertRaises(CommandError):
+            self._run('--fail')
+        run = CommandRun.objects.get()
+        self.assertEqual(run.status, 'failed')
+        self.assertEqual(run.summary['error'], 'CommandError: boom')
+
+
+@override_settings(HEALTH_CRITICAL_CHECKS=['database:default', 'storage'], HEALTH_CACHE_SECONDS=60)
+class DeepHealthTests(TestCase):
+    def setUp(self):
+        health._cached = (0.0, None)
+        self.addCleanup(setattr, health, '_cached', (0.0, None))
+
+    def test_shallow_check_does_not_probe(self):
+        with mock.patch.object(health, 'run_checks') as run_checks:
+            response = self.client.get('/api/health/')
+        self.assertEqual(response.json(), {'status': 'ok'})
+        run_checks.assert_not_called()
+
+    def test_critical_failure_returns_503_and_result_is_cached(self):
+        with mock.patch.object(health.default_storage, 'save', side_effect=OSError('disk full')) as save, \
+                self.assertLogs('core.health', 'WARNING'):
+            first = self.client.get('/api/health/?deep=1')
+            second = self.client.get('/api/health/?deep=1')
+        self.assertEqual(first.status_code, 503)
+        body = first.json()
+        self.assertEqual(body['status'], 'unhealthy')
+        self.assertEqual(body['checks']['storage'], {'ok': False, 'error': 'OSError'})
+        self.assertTrue(body['checks']['database:default']['ok'])
+        self.assertEqual(body['in_flight_requests'], 1)
+        self.assertEqual(second.status_code, 503)
+        self.assertEqual(save.call_count, 1)
+
+    @override_settings(HEALTH_CRITICAL_CHECKS=['database:default'])
+    def test_non_critical_failure_is_degraded(self):
+        with mock.patch.object(health.default_storage, 'save', side_effect=OSError('disk full')), \
+                self.assertLogs('core.health', 'WARNING'):
+            response = self.client.get('/api/health/?deep=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'degraded')
+
+    @override_settings(HEALTH_PROBE_TIMEOUT=0.05)
+    def test_hung_probe_is_not_probed_again_until_it_returns(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        calls = []
+
+        def hanging_storage_probe():
+            calls.append(1)
+            release.wait(5)
+
+        with mock.patch.object(health, '_probe_storage', hanging_storage_probe):
+            first = health.run_checks()
+            second = health.run_checks()
+            release.set()
+            health._running['storage'].result(timeout=5)
+            third = health.run_checks()
+        self.assertEqual(first['checks']['storage'], {'ok': False, 'error': 'timed out after 0.05s'})
+        self.assertTrue(second['checks']['storage']['still_running'])
+        self.assertTrue(third['checks']['storage']['ok'])
+        self.assertEqual(len(calls), 2)
+
+    async def test_async_requests_are_counted_in_flight(self):
+        seen = []
+
+        async def view(request):
+            seen.append(health.in_flight_requests())
+            return HttpResponse()
+
+        middleware = health.InFlightRequestsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(seen, [1])
+        self.assertEqual(health.in_flight_requests(), 0)
+
+
+class SlowQueryCaptureTests(TestCase):
+    def setUp(self):
+        self.addCleanup(slow_queries.set_threshold_ms, None)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='slow-admin', is_superuser=True))
+        Department.objects.create(name='Slow')
+
+    def test_queries_over_the_threshold_are_recorded_with_route_caller_and_plan(self):
+        slow_queries.set_threshold_ms(0.000001)
+        self.client.get('/api/departments/')
+        self.client.get('/api/departments/')
+        slow_queries.set_threshold_ms(0)
+
+        query = SlowQuery.objects.get(route='GET /api/departments/', fingerprint__contains='core_department')
+        self.assertEqual(query.count, 2)
+        self.assertTrue(query.caller.startswith('core/'), query.caller)
+        self.assertTrue(query.plan)
+        self.assertGreaterEqual(query.total_ms, query.max_ms)
+
+        listed = self.client.get('/api/slow-queries/?order=count').json()
+        self.assertEqual(listed['threshold_ms'], 0)
+        self.assertIn(query.pk, [row['id'] for row in listed['queries']])
+        for limit in ('-1', '0', 'ten'):
+            self.assertEqual(self.client.get(f'/api/slow-queries/?limit={limit}').status_code, 400)
+
+    def test_threshold_can_be_changed_at_runtime(self):
+        response = self.client.put('/api/slow-queries/', {'threshold_ms': 0}, format='json')
+        self.assertEqual(response.json(), {'threshold_ms': 0})
+        self.client.get('/api/departments/')
+        self.assertFalse(SlowQuery.objects.exists())
+        self.assertEqual(self.client.put('/api/slow-queries/', {'threshold_ms': -1}, format='json').status_code, 400)
+
+    async def test_async_stack_saves_queries_after_the_response(self):
+        async def view(request):
+            await Department.objects.acount()
+            self.assertFalse(await SlowQuery.objects.aexists())
+            return HttpResponse()
+
+        middleware = slow_queries.SlowQueryMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        await sync_to_async(slow_queries.set_threshold_ms)(0.000001)
+        await middleware(AsyncRequestFactory().get('/'))
+        await sync_to_async(slow_queries.set_threshold_ms)(0)
+        self.assertTrue(await SlowQuery.objects.filter(fingerprint__contains='core_department').aexists())
+
+
+class MemoryProfilingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(memory_profiling.clear)
+        department = Department.objects.create(name='Memory')
+        manager = User.objects.create(username='memory-manager')
+        UserProfile.objects.create(user=manager, department=department, role=UserProfile.ROLE_MANAGER)
+        self.ids = [
+            Document.objects.create(title=f'doc {n}', file=ContentFile(os.urandom(256 * 1024), name=f'doc{n}.bin'),
+                                    department=department, uploaded_by=manager).pk
+            for n in range(12)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(manager)
+
+    @override_settings(MEMORY_PROFILING_ENABLED=True)
+    def test_bulk_download_is_profiled_and_does_not_hold_the_archive(self):
+        response = self.client.post('/api/documents/bulk-download/', {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 12)
+
+        [profile] = memory_profiling.profiles()
+        self.assertEqual(profile['id'], response['X-Memory-Profile-Id'])
+        # 3 MB of incompressible input; an archive built in memory would peak above it.
+        self.assertLess(profile['python_peak_mb'], 2.0)
+        self.assertIsInstance(profile['top_allocations'], list)
+
+    def test_query_string_is_not_stored(self):
+        request = RequestFactory().get('/api/events/?token=secret')
+        memory_profiling.save_profile(request, HttpResponse(), {'seconds': 0})
+        [profile] = memory_profiling.profiles()
+        self.assertEqual(profile['path'], '/api/events/')
+
+    def test_nothing_is_recorded_when_disabled(self):
+        response = self.client.post('/api/documents/bulk-download/', {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertNotIn('X-Memory-Profile-Id', response)
+        self.assertEqual(memory_profiling.profiles(), [])
+
+
+@override_settings(ROOT_URLCONF='cleantrac_project.urls_asgi')
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        department = Department.objects.create(name='Async')
+        self.user = User.objects.create(username='async-manager')
+        UserProfile.objects.create(user=self.user, department=department, role=UserProfile.ROLE_MANAGER)
+        self.ids = [
+            Document.objects.create(title=f'doc {n}', file=ContentFile(b'x' * 1024, name=f'async{n}.txt'),
+                                    department=department, uploaded_by=self.user).pk
+            for n in range(3)
+        ]
+        # A session user, so the profile is loaded lazily inside the view.
+        self.async_client.force_login(self.user)
+        # The traceability database isn't available in tests.
+        patcher = mock.patch.object(ReceivingRecordManager, 'get_queryset',
+                                    lambda manager: QuerySet(ReceivingRecord).none())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_receiving_records_with_session_user(self):
+        response = await self.async_client.get('/api/receiving-records/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [])
+
+    async def test_receiving_record_detail_with_session_user(self):
+        response = await self.async_client.get('/api/receiving-records/R-1/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_bulk_download(self):
+        response = await self.async_client.post('/api/documents/bulk-download/', {'ids': self.ids},
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()), ['async0.txt', 'async1.txt', 'async2.txt'])
+
+    @override_settings(MEMORY_PROFILING_ENABLED=True)
+    async def test_bulk_download_is_profiled(self):
+        self.addCleanup(memory_profiling.clear)
+        response = await self.async_client.post('/api/documents/bulk-download/', {'ids': self.ids},
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        [profile] = await sync_to_async(memory_profiling.profiles)()
+        self.assertEqual(profile['id'], response['X-Memory-Profile-Id'])
+        self.assertEqual(profile['user'], 'async-manager')
+
+
+class CacheInvalidationTests(TestCase):
+    def test_namespaces_are_retired_when_the_write_commits(self):
+        version = caching.namespace_version('department-status-summary')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Department.objects.create(name='Invalidation')
+            self.assertEqual(caching.namespace_version('department-status-summary'), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(caching.namespace_version('department-status-summary'), version)
+
+    def test_unregistered_models_queue_no_invalidation(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            CommandRun.objects.create(command='noop', status='success', started_at=timezone.now(),
+                                      duration_seconds=0)
+        self.assertFalse([c for c in callbacks if c.__qualname__.startswith('_invalidate_after_commit')])
+
+    def test_watermark_moves_when_the_write_commits(self):
+        department = Department.objects.create(name='Watermark')
+        area = AreaUnit.objects.create(name='Walk-in', department=department)
+        before = conditional.watermark([AreaUnit], department.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            area.save()
+            self.assertEqual(conditional.watermark([AreaUnit], department.pk), before)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(conditional.watermark([AreaUnit], department.pk), before)
+
+    def test_untracked_models_queue_no_watermark_stamp(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            CommandRun.objects.create(command='noop', status='success', started_at=timezone.now(),
+                                      duration_seconds=0)
+        self.assertFalse([c for c in callbacks if c.__qualname__.startswith('_touch_after_commit')])
+
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(name='Polled')
+        manager = User.objects.create(username='polled-manager')
+        UserProfile.objects.create(user=manager, department=self.department, role=UserProfile.ROLE_MANAGER)
+        self.item = CleaningItem.objects.create(name='Sink', department=self.department, frequency='daily',
+                                                method='Scrub')
+        TaskInstance.objects.create(cleaning_item=self.item, department=self.department,
+                                    due_date=timezone.localdate())
+        self.client = APIClient()
+        self.client.force_authenticate(manager)
+
+    def test_unchanged_poll_gets_a_304_without_the_view_queries(self):
+        etag = self.client.get('/api/taskinstances/')['ETag']
+        # The watermark comes from the cache and the view never runs.
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/taskinstances/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_a_write_moves_the_etag(self):
+        etag = self.client.get('/api/taskinstances/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskInstance.objects.create(cleaning_item=self.item, department=self.department,
+                                        due_date=timezone.localdate())
+        response = self.client.get('/api/taskinstances/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_superuser_and_department_scopes_get_different_etags(self):
+        etag = self.client.get('/api/taskinstances/')['ETag']
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create(username='polled-admin', is_superuser=True))
+        response = admin.get('/api/taskinstances/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(DEBUG=True)
+    def test_api_304_passes_the_iframe_middleware_and_documents_do_not(self):
+        middleware = AllowIframeForMedia(lambda request: HttpResponse(status=304))
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get('/api/taskinstances/')).status_code, 304)
+        self.assertEqual(middleware(factory.get(AllowIframeForMedia.DOCUMENT_PREFIX + 'a.pdf')).status_code, 200)
+        etag = self.client.get('/api/taskinstances/')['ETag']
+        response = self.client.get('/api/taskinstances/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('X-Frame-Options', response)
+
+
+class InventorySnapshotInvalidationTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Snapshots')
+        self.item = InventoryItem.objects.create(ingredient_code='FLR', ingredient_name='Flour',
+                                                 department=self.department, current_stock=100, unit_cost=1)
+        self.today = timezone.localdate()
+        self.backdated = InventoryTransaction.objects.create(
+            inventory_item=self.item, transaction_type='purchase', quantity=10,
+            transaction_date=timezone.now() - timedelta(days=5),
+        )
+        for days_ago in (6, 4, 2):
+            InventorySnapshot.take(self.department, self.today - timedelta(days=days_ago))
+
+    def snapshot_days(self):
+        return sorted((self.today - day).days for day in self.item.snapshots.values_list('snapshot_date', flat=True))
+
+    def test_editing_a_backdated_transaction_drops_snapshots_from_its_old_date(self):
+        self.backdated.transaction_date = timezone.now() - timedelta(days=1)
+        self.backdated.save()
+        self.assertEqual(self.snapshot_days(), [6])
+
+    def test_deleting_a_backdated_transaction_drops_later_snapshots(self):
+        self.backdated.delete()
+        self.assertEqual(self.snapshot_days(), [6])
+
+
+class StockAsOfTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Stock')
+        self.today = timezone.localdate()
+        self.flour = InventoryItem.objects.create(ingredient_code='FLR', ingredient_name='Flour',
+                                                  department=self.department, current_stock=100, unit_cost=1)
+        self.sugar = InventoryItem.objects.create(ingredient_code='SGR', ingredient_name='Sugar',
+                                                  department=self.department, current_stock=50, unit_cost=1)
+        self.post(self.flour, 'purchase', 10, days_ago=4)
+        self.post(self.flour, 'waste', 4, days_ago=3)
+        self.post(self.flour, 'production_use', 6, days_ago=1)
+        self.post(self.sugar, 'purchase', 5, days_ago=1)
+        # Flour's closing balance on day -4, after that day's purchase.
+        InventorySnapshot.objects.create(inventory_item=self.flour, department=self.department,
+                                         snapshot_date=self.day(4), closing_stock=110)
+
+    def day(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def post(self, item, transaction_type, quantity, days_ago):
+        InventoryTransaction.objects.create(inventory_item=item, transaction_type=transaction_type, quantity=quantity,
+                                            transaction_date=timezone.now() - timedelta(days=days_ago))
+
+    def stock_as_of(self, days_ago):
+        return InventorySnapshot.stock_as_of(InventoryItem.objects.filter(department=self.department),
+                                             self.day(days_ago))
+
+    def test_snapshot_plus_the_ledger_since_it(self):
+        self.assertEqual(self.stock_as_of(2)[self.flour.pk], (Decimal('106'), self.day(4)))
+
+    def test_date_on_a_snapshot_uses_the_snapshot_alone(self):
+        self.assertEqual(self.stock_as_of(4)[self.flour.pk], (Decimal('110'), self.day(4)))
+
+    def test_never_snapshotted_item_works_back_from_current_stock(self):
+        self.sugar.refresh_from_db()
+        self.assertEqual(self.sugar.current_stock, Decimal('55'))
+        self.assertEqual(self.stock_as_of(2)[self.sugar.pk], (Decimal('50'), None))
+        self.assertEqual(self.stock_as_of(0)[self.sugar.pk], (Decimal('55'), None))
+
+    def test_endpoint(self):
+        manager = User.objects.create(username='stock-manager')
+        UserProfile.objects.create(user=manager, department=self.department, role=UserProfile.ROLE_MANAGER)
+        client = APIClient()
+        client.force_authenticate(manager)
+        response = client.get(f'/api/inventory-items/stock-as-of/?date={self.day(2)}')
+        self.assertEqual(response.status_code, 200, response.content)
+        stock = {item['ingredient_code']: (Decimal(str(item['stock'])), item['snapshot_date'])
+                 for item in response.json()['items']}
+        self.assertEqual(stock, {'FLR': (Decimal('106'), str(self.day(4))), 'SGR': (Decimal('50'), None)})
+        self.assertEqual(client.get('/api/inventory-items/stock-as-of/').status_code, 400)
+
+
+class IngredientConsumptionTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Consumption')
+        self.manager = User.objects.create(username='consumption-manager')
+        UserProfile.objects.create(user=self.manager, department=self.department, role=UserProfile.ROLE_MANAGER)
+        recipe = Recipe.objects.create(department=self.department, product_code='BUN', name='Buns', yield_quantity=10)
+        for code, quantity in (('FLR', '4.000'), ('YST', '0.125'), ('SLT', '0.100')):
+            RecipeIngredient.objects.create(recipe=recipe, ingredient_code=code, ingredient_name=code,
+                                            quantity=quantity, unit_cost=1)
+        self.flour = InventoryItem.objects.create(ingredient_code='FLR', ingredient_name='Flour',
+                                                  department=self.department, current_stock=100, unit_cost=1)
+        self.yeast = InventoryItem.objects.create(ingredient_code='YST', ingredient_name='Yeast',
+                                                  department=self.department, current_stock=5, unit_cost=1)
+        # No inventory item for SLT.
+        self.schedule = ProductionSchedule.objects.create(recipe=recipe, department=self.department,
+                                                          scheduled_date=timezone.localdate(), batch_size=25)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def complete(self, actual_yield):
+        now = timezone.now()
+        response = self.client.post('/api/production-records/', {
+            'schedule_id': self.schedule.pk, 'actual_start_time': now - timedelta(hours=1),
+            'actual_end_time': now, 'actual_yield': actual_yield, 'quality_check': 'pass',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def stock(self, item):
+        item.refresh_from_db()
+        return item.current_stock
+
+    def test_consumption_is_scaled_by_the_produced_quantity(self):
+        self.complete('25')
+        posted = dict(InventoryTransaction.objects.filter(transaction_type='production_use')
+                      .values_list('inventory_item__ingredient_code', 'quantity'))
+        self.assertEqual(posted, {'FLR': Decimal('10.00'), 'YST': Decimal('0.31')})
+        self.assertEqual(self.stock(self.flour), Decimal('90.00'))
+        self.assertEqual(self.stock(self.yeast), Decimal('4.69'))
+
+    def consumption_queries(self, ingredients):
+        recipe = Recipe.objects.create(department=self.department, product_code=f'R{ingredients}',
+                                       name=f'{ingredients} ingredients', yield_quantity=1)
+        for n in range(ingredients):
+            code = f'R{ingredients}-{n}'
+            RecipeIngredient.objects.create(recipe=recipe, ingredient_code=code, ingredient_name=code,
+                                            quantity=1, unit_cost=1)
+            InventoryItem.objects.create(ingredient_code=code, ingredient_name=code, department=self.department,
+                                         current_stock=100, unit_cost=1)
+        schedule = ProductionSchedule.objects.create(recipe=recipe, department=self.department,
+                                                     scheduled_date=timezone.localdate(), batch_size=1)
+        now = timezone.now()
+        record = ProductionRecord.objects.create(schedule=schedule, actual_start_time=now, actual_end_time=now,
+                                                 actual_yield=2, quality_check='pass')
+        record = ProductionRecord.objects.select_related('schedule__recipe').get(pk=record.pk)
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            posted = record.post_ingredient_consumption()
+        self.assertEqual(len(posted), ingredients)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_ingredients(self):
+        self.assertEqual(self.consumption_queries(3), self.consumption_queries(10))
+
+    def test_ingredient_without_an_inventory_item_is_skipped(self):
+        self.complete('10')
+        self.assertEqual(InventoryTransaction.objects.filter(transaction_type='production_use').count(), 2)
+        self.assertFalse(InventoryItem.objects.filter(ingredient_code='SLT').exists())
+
+    def test_saving_the_record_again_does_not_post_twice(self):
+        record = ProductionRecord.objects.get(pk=self.complete('10'))
+        record.quality_notes = 'Checked'
+        with transaction.atomic():
+            record.save()
+            self.assertEqual(record.post_ingredient_consumption(), [])
+        self.assertEqual(InventoryTransaction.objects.filter(transaction_type='production_use').count(), 2)
+        self.assertEqual(self.stock(self.flour), Decimal('96.00'))
+
+
+class WasteAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bakery = Department.objects.create(name='Bakery')
+        self.deli = Department.objects.create(name='Deli')
+        self.bread = Recipe.objects.create(department=self.bakery, product_code='BRD', name='Bread', yield_quantity=1)
+        self.salad = Recipe.objects.create(department=self.deli, product_code='SLD', name='Salad', yield_quantity=1)
+        self.flour = InventoryItem.objects.create(ingredient_code='FLR', ingredient_name='Flour',
+                                                  department=self.bakery, current_stock=10, unit_cost=1)
+        self.start = datetime(2026, 3, 2).date()  # a Monday
+        self.end = self.start + timedelta(days=6)
+        self.waste(self.bakery, 0, 'expired', 10, 1, recipe=self.bread)
+        self.waste(self.bakery, 0, 'expired', 5, 2, recipe=self.bread)
+        self.waste(self.bakery, 2, 'damaged', 3, 1, inventory_item=self.flour)
+        self.waste(self.deli, 2, 'other', 7, 1)
+        self.waste(self.deli, 3, 'production_error', 40, 2, recipe=self.salad)
+        self.waste(self.bakery, -7, 'expired', 20, 4)  # the previous week
+        self.waste(self.bakery, 7, 'expired', 100, 9)  # after the range
+
+    def waste(self, department, days, reason, cost, quantity, **links):
+        """A record at noon local time, *days* after the start of the range."""
+        recorded_at = timezone.make_aware(datetime.combine(self.start + timedelta(days=days), datetime.min.time()))
+        recorded_at += timedelta(hours=12)
+        return WasteRecord.objects.create(department=department, reason=reason, cost=cost, quantity=quantity,
+                                          recorded_at=recorded_at, **links)
+
+    def breakdown(self, granularity):
+        report = WasteRecord.analytics(None, self.start, self.end, granularity)
+        return [(row['department_name'], row['period'].day, row['reason'], row['total_cost'], row['record_count'])
+                for row in report['breakdown']]
+
+    def test_breakdown_by_department_reason_and_day(self):
+        self.assertEqual(self.breakdown('day'), [
+            ('Bakery', 2, 'expired', 15, 2),
+            ('Bakery', 4, 'damaged', 3, 1),
+            ('Deli', 4, 'other', 7, 1),
+            ('Deli', 5, 'production_error', 40, 1),
+        ])
+
+    def test_breakdown_by_week(self):
+        self.assertEqual(self.breakdown('week'), [
+            ('Bakery', 2, 'damaged', 3, 1),
+            ('Bakery', 2, 'expired', 15, 2),
+            ('Deli', 2, 'other', 7, 1),
+            ('Deli', 2, 'production_error', 40, 1),
+        ])
+
+    def test_top_recipes_and_inventory_items_by_cost(self):
+        report = WasteRecord.analytics(None, self.start, self.end)
+        self.assertEqual([(row['recipe_name'], row['total_cost']) for row in report['top_recipes']],
+                         [('Salad', 40), ('Bread', 15)])
+        self.assertEqual([(row['ingredient_name'], row['total_cost']) for row in report['top_inventory_items']],
+                         [('Flour', 3)])
+
+    def test_trend_against_the_previous_period(self):
+        report = WasteRecord.analytics(None, self.start, self.end)
+        self.assertEqual(report['previous_start_date'], self.start - timedelta(days=7))
+        trend = {row['department_name']: row for row in report['trend']}
+        self.assertEqual((trend['Bakery']['current_cost'], trend['Bakery']['previous_cost']), (18, 20))
+        self.assertEqual(trend['Bakery']['cost_delta_pct'], Decimal('-10.0'))
+        self.assertEqual(trend['Deli']['previous_cost'], 0)
+        self.assertIsNone(trend['Deli']['cost_delta_pct'])
+
+    def test_departments_filter(self):
+        report = WasteRecord.analytics([self.deli.pk], self.start, self.end)
+        self.assertEqual({row['department_name'] for row in report['breakdown']}, {'Deli'})
+        self.assertEqual([row['recipe_name'] for row in report['top_recipes']], ['Salad'])
+
+    def test_cache_is_invalidated_when_a_record_is_saved(self):
+        WasteRecord.analytics([self.deli.pk], self.start, self.end)
+        with self.assertNumQueries(0):
+            cached = WasteRecord.analytics([self.deli.pk], self.start, self.end)
+        self.assertEqual(len(cached['breakdown']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.waste(self.deli, 4, 'expired', 1, 1)
+        self.assertEqual(len(WasteRecord.analytics([self.deli.pk], self.start, self.end)['breakdown']), 3)
+
+
+@override_settings(PRODUCTION_DEPARTMENT_CAPACITY=2)
+class ProductionCapacityTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name='Capacity')
+        self.recipe = Recipe.objects.create(department=self.department, product_code='BRD', name='Bread',
+                                            yield_quantity=10)
+        self.staff = User.objects.create(username='capacity-staff')
+        self.day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def at(self, hour):
+        return self.day + timedelta(hours=hour)
+
+    def book(self, start_hour, end_hour, staff=None):
+        return RecipeProductionTask.objects.create(
+            recipe=self.recipe, department=self.department, scheduled_quantity=1, assigned_staff=staff,
+            scheduled_start_time=self.at(start_hour), scheduled_end_time=self.at(end_hour),
+        )
+
+    def test_back_to_back_tasks_do_not_fill_a_longer_slot(self):
+        self.book(9, 10)
+        self.book(10, 11)
+        conflicts = find_conflicts(self.at(8), self.at(12), department_id=self.department.pk)
+        self.assertEqual(conflicts['department_load'], 1)
+        serializer = RecipeProductionTaskSerializer(data={
+            'recipe_id': self.recipe.pk, 'department_id': self.department.pk, 'scheduled_quantity': 1,
+            'scheduled_start_time': self.at(8), 'scheduled_end_time': self.at(12),
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_concurrent_tasks_fill_the_slot(self):
+        self.book(9, 11)
+        self.book(10, 12)
+        conflicts = find_conflicts(self.at(8), self.at(12), department_id=self.department.pk)
+        self.assertEqual(conflicts['department_load'], 2)
+
+    def test_weekly_report_and_booking_check_use_the_same_window(self):
+        manager = User.objects.create(username='capacity-manager')
+        UserProfile.objects.create(user=manager, department=self.department, role=UserProfile.ROLE_MANAGER)
+        week_start = timezone.localdate(self.day) - timedelta(days=timezone.localdate(self.day).weekday())
+        start = timezone.make_aware(datetime.combine(week_start, datetime.min.time()))
+        # Starts the Sunday before and runs into Monday morning.
+        RecipeProductionTask.objects.create(
+            recipe=self.recipe, department=self.department, scheduled_quantity=1,
+            scheduled_start_time=start - timedelta(hours=2), scheduled_end_time=start + timedelta(hours=2),
+        )
+        conflicts = find_conflicts(start, start + timedelta(days=7), department_id=self.department.pk)
+        client = APIClient()
+        client.force_authenticate(manager)
+        response = client.get(f'/api/recipe-production-tasks/conflicts/?week_start={week_start}')
+        self.assertEqual(response.status_code, 200, response.content)
+        hours = [row['task_count'] for row in response.json()['hourly_load']]
+        self.assertEqual((conflicts['department_load'], hours), (1, [1, 1]))
+
+    def test_duration_only_booking_is_checked_for_conflicts(self):
+        self.book(9, 11, staff=self.staff)
+        with self.assertRaises(ValidationError):
+            RecipeProductionTaskSerializer()._check_schedule_conflicts({
+                'scheduled_start_time': self.at(8), 'duration_minutes': 90,
+                'assigned_staff': [self.staff], 'department': self.department,
+            })
+
+
+@override_settings(TIME_ZONE='Africa/Johannesburg')
+class RecurringOccurrenceTests(TestCase):
+    def test_horizon_ends_on_the_local_day_of_until(self):
+        department = Department.objects.create(name='Recurring')
+        recipe = Recipe.objects.create(department=department, product_code='PIE', name='Pie', yield_quantity=1)
+        start = datetime(2026, 3, 2, 8, tzinfo=dt_timezone.utc)
+        parent = RecipeProductionTask.objects.create(
+            recipe=recipe, department=department, scheduled_quantity=1, is_recurring=True, recurrence_type='daily',
+            scheduled_start_time=start, scheduled_end_time=start + timedelta(hours=1),
+        )
+        # 23:00 UTC on the 4th is already the 5th in Johannesburg.
+        starts = parent.occurrence_starts(datetime(2026, 3, 4, 23, tzinfo=dt_timezone.utc))
+        self.assertEqual([s.day for s in starts], [3, 4, 5])
+
+    def test_generation_only_reads_children_from_the_window(self):
+        department = Department.objects.create(name='Recurring')
+        recipe = Recipe.objects.create(department=department, product_code='PIE', name='Pie', yield_quantity=1)
+        start = datetime(2026, 3, 2, 8, tzinfo=dt_timezone.utc)
+        parent = RecipeProductionTask.objects.create(
+            recipe=recipe, department=department, scheduled_quantity=1, is_recurring=True, recurrence_type='daily',
+            scheduled_start_time=start, scheduled_end_time=start + timedelta(hours=1),
+        )
+        RecipeProductionTask.generate_recurring_children([parent], datetime(2026, 3, 5, 12, tzinfo=dt_timezone.utc))
+        since = datetime(2026, 3, 5, tzinfo=dt_timezone.utc)
+        with CaptureQueriesContext(connection) as queries:
+            created = RecipeProductionTask.generate_recurring_children(
+                [parent], datetime(2026, 3, 7, 12, tzinfo=dt_timezone.utc), since,
+            )
+        self.assertEqual([task.scheduled_start_time.day for task in created], [6, 7])
+        self.assertIn('"scheduled_start_time" >=', queries[0]['sql'])
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name='Feed')
+        user = User.objects.create(username='feed-manager')
+        UserProfile.objects.create(user=user, department=department, role=UserProfile.ROLE_MANAGER)
+        self.department_id = department.pk
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        cache.clear()
+
+    def test_wsgi_urlconf_answers_a_short_poll(self):
+        start = self.client.get('/api/events/').json()
+        self.assertEqual(start['events'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            events.publish('task.updated', self.department_id, {'id': 1})
+        polled = self.client.get(f"/api/events/?last_event_id={start['last_event_id']}").json()
+        self.assertEqual([event['type'] for event in polled['events']], ['task.updated'])
+        self.assertEqual(polled['last_event_id'], start['last_event_id'] + 1)
+        self.assertFalse(polled['resync'])
+
+    def test_wsgi_urlconf_refuses_event_stream_clients(self):
+        response = self.client.get('/api/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(ROOT_URLCONF='cleantrac_project.urls_asgi')
+    def test_asgi_urlconf_streams(self):
+        response = self.client.get('/api/events/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.streaming)
+
+    def test_publishers_that_collide_on_a_sequence_number_keep_both_events(self):
+        # What a collapsed incr on the file backend leaves behind: the next
+        # number is already taken by another worker's event.
+        cache.set(events._seq_key('collide'), 0, None)
+        cache.set(events._event_key('collide', 1), {'type': 'first'}, None)
+        self.assertEqual(events._append('collide', {'type': 'second'}), 2)
+        self.assertEqual(cache.get(events._event_key('collide', 1)), {'type': 'first'})
+        self.assertEqual(cache.get(events._event_key('collide', 2)), {'type': 'second'})
+
+    def test_completion_log_event_reads_the_loaded_task(self):
+        department = Department.objects.get(pk=self.department_id)
+        item = CleaningItem.objects.create(name='Floor', department=department, frequency='daily', method='Mop')
+        task = TaskInstance.objects.create(cleaning_item=item, due_date=timezone.localdate())
+        log = CompletionLog(task_instance=task)
+        with self.assertNumQueries(0):
+            self.assertEqual(events._describe(log)[1], self.department_id)
+
+    def test_staff_only_see_events_for_their_own_tasks(self):
+        department = Department.objects.get(pk=self.department_id)
+        staff = User.objects.create(username='feed-staff')
+        profile = UserProfile.objects.create(user=staff, department=department, role=UserProfile.ROLE_STAFF)
+        colleague = UserProfile.objects.create(user=User.objects.create(username='feed-colleague'),
+                                               department=department, role=UserProfile.ROLE_STAFF)
+        item = CleaningItem.objects.create(name='Fryer', department=department, frequency='daily', method='Drain')
+        client = APIClient()
+        client.force_authenticate(staff)
+        start = client.get('/api/events/').json()['last_event_id']
+        with self.captureOnCommitCallbacks(execute=True):
+            mine = TaskInstance.objects.create(cleaning_item=item, department=department, assigned_to=profile,
+                                               due_date=timezone.localdate())
+            TaskInstance.objects.create(cleaning_item=item, department=department, assigned_to=colleague,
+                                        due_date=timezone.localdate())
+        polled = client.get(f'/api/events/?last_event_id={start}').json()
+        self.assertEqual([event['id'] for event in polled['events']], [start + 1])
+        self.assertEqual(polled['events'][0]['assigned_to'], mine.assigned_to_id)
+        managed = self.client.get(f'/api/events/?last_event_id={start}').json()
+        self.assertEqual(len(managed['events']), 2)
+
+
+class RunBenchmarksTests(TestCase):
+    def test_error_responses_are_not_timed_and_fail_the_comparison(self):
+        command = run_benchmarks.Command(stdout=io.StringIO())
+        options = {'warmup': 0, 'iterations': 2, 'warm_cache': False}
+        result = command._run(APIClient(), 'get', '/api/departments/', None, options)
+        self.assertEqual(result['error'], 'HTTP 401')
+        self.assertNotIn('p50_ms', result)
+
+        baseline = {'results': {'departments': {'p50_ms': 5.0, 'queries': 1}}}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as handle:
+            json.dump(baseline, handle)
+            handle.flush()
+            regressions = command._compare({'results': {'departments': result}}, handle.name, 0.2)
+        self.assertEqual(regressions, ['departments'])
+
+
+class ExplainHotQueriesTests(TestCase):
+    def test_sqlite_scan_without_index_is_flagged(self):
+        plan = ('SEARCH core_taskinstance USING INDEX core_taski_departm_idx (department_id=? AND due_date=?)\n'
+                'SCAN core_taskinstance USING INDEX core_taski_status_idx\n'
+                'SCAN core_taskinstance')
+        self.assertEqual(explain_hot_queries.sequential_scans(plan, 'core_taskinstance'), ['SCAN core_taskinstance'])
+        self.assertEqual(explain_hot_queries.sequential_scans(plan, 'core_completionlog'), [])
+
+    def test_command_passes_when_hot_queries_use_indexes(self):
+        stdout = io.StringIO()
+        call_command('explain_hot_queries', stdout=stdout)
+        self.assertIn('All hot queries use an index.', stdout.getvalue())
+        self.assertNotIn('SEQ SCAN', stdout.getvalue())
+
+    def test_command_fails_on_sequential_scan(self):
+        stdout = io.StringIO()
+        with mock.patch.object(QuerySet, 'explain', lambda queryset: f'SCAN {queryset.model._meta.db_table}'):
+            with self.assertRaisesMessage(CommandError, '12 hot queries fell back to a sequential scan.'):
+                call_command('explain_hot_queries', stdout=stdout)
+        self.assertIn('SEQ SCAN  task instances due today', stdout.getvalue())
+
+
+class StartupBenchmarkTests(TestCase):
+    def test_heavy_dependencies_are_not_imported_at_startup(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'startup.json')
+            call_command('benchmark_startup', '--runs', '1', '--output', output, stdout=io.StringIO())
+            with open(output) as handle:
+                report = json.load(handle)
+        self.assertEqual(report['heavy_modules'], [])
+        self.assertGreater(report['results']['total_ms'], 0)
+        self.assertTrue(report['slowest_imports'])
@@ -9,6 +9,14 @@ from .views import (
     TaskInstanceViewSet, 
     CompletionLogViewSet,
     CurrentUserView,
+    CacheStatsView,
+    DatabasePoolStatsView,
+    RequestMetricsView,
+    SlowQueryView,
+    RequestProfileListView,
+    RequestProfileDownloadView,
+    MemoryProfileListView,
+    ChangeFeedView,
     PasswordResetRequestView,
     PasswordResetConfirmView,
     # Thermometer Verification System ViewSets
@@ -24,6 +32,7 @@ from .views import (
     SupplierViewSet,
     ReceivingRecordViewSet
 )
+from .async_views import document_download, generated_document_download
 from .document_template_views import (
     DocumentTemplateViewSet,
     GeneratedDocumentViewSet
@@ -83,6 +92,16 @@ router.register(r'recipe-production-tasks', RecipeProductionTaskViewSet, basenam
 urlpatterns = [
     path('health/', health, name='health'),
     path('users/me/', CurrentUserView.as_view(), name='current-user'), # Specific path first
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('db-pool-stats/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('request-metrics/', RequestMetricsView.as_view(), name='request-metrics'),
+    path('slow-queries/', SlowQueryView.as_view(), name='slow-queries'),
+    path('request-profiles/', RequestProfileListView.as_view(), name='request-profiles'),
+    path('request-profiles/<str:profile_id>/', RequestProfileDownloadView.as_view(), name='request-profile-download'),
+    path('memory-profiles/', MemoryProfileListView.as_view(), name='memory-profiles'),
+    path('events/', ChangeFeedView.as_view(), name='change-feed'),
+    path('documents/<int:pk>/download/', document_download, name='document-download'),
+    path('generated-documents/<int:pk>/download/', generated_document_download, name='generated-document-download'),
     path('auth/password-reset/request/', PasswordResetRequestView.as_view(), name='password_reset_request'),
     path('auth/password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('', include(router.urls)),                                    # Router paths second
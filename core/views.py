@@ -1,14 +1,17 @@
+import functools
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
 from django.utils import timezone 
 from datetime import date as datetime_date 
 from django.db.models import Count
 from django.db import transaction
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET
 
 
@@ -16,15 +19,22 @@ from django.views.decorators.http import require_http_methods
 
 @require_http_methods(["GET", "HEAD"])
 def health(request):
-    """Simple unauthenticated endpoint for load-balancer health checks."""
-    return JsonResponse({"status": "ok"}) 
+    """
+    Unauthenticated endpoint for load-balancer health checks. With ?deep=1
+    it probes the databases and media storage (core.health) and returns 503
+    if a critical dependency is down.
+    """
+    if request.GET.get("deep") != "1":
+        return JsonResponse({"status": "ok"})
+    result = health_checks.deep_health()
+    return JsonResponse(result, status=503 if result["status"] == "unhealthy" else 200)
 
 from .models import (
     ReceivingRecord,
     Department, UserProfile, CleaningItem, TaskInstance, CompletionLog, PasswordResetToken,
     AreaUnit, Thermometer, ThermometerVerificationRecord, 
     ThermometerVerificationAssignment, TemperatureCheckAssignment, TemperatureLog,
-    Folder, Document, Supplier
+    Folder, Document, Supplier, SlowQuery
 )
 from .serializers import (
     DepartmentSerializer, UserSerializer, UserProfileSerializer, 
@@ -46,6 +56,13 @@ from .permissions import (
     CanManageThermometerAssignments, CanManageTemperatureCheckAssignments, CanLogTemperatures, CanManageTaskInstance
 )
 from .sms_utils import send_sms # New import
+from .auth_context import get_auth_context
+from . import caching, db_pools, events, instrumentation, memory_profiling, profiling, slow_queries
+from . import health as health_checks
+from .authentication import QueryStringTokenAuthentication
+from .conditional import conditional_response
+from .memory_profiling import memory_profiled
+from cleantrac_project.db_routers import reporting_reads
 from django.contrib.auth.password_validation import validate_password # For password strength
 from django.core.exceptions import ValidationError as DjangoValidationError # For password validation
 
@@ -61,7 +78,7 @@ class FolderViewSet(viewsets.ModelViewSet):
             return Folder.objects.none()
         # All authenticated users can see every folder, regardless of department.
         if user.is_authenticated:
-            return Folder.objects.all()
+            return Folder.objects.select_related('department')
         return Folder.objects.none()
 
     def create(self, request, *args, **kwargs):
@@ -118,6 +135,7 @@ class DepartmentViewSet(viewsets.ModelViewSet):
         return Department.objects.none() 
 
     @action(detail=True, methods=['get'], url_path='status-summary')
+    @caching.cache_response('department-status-summary', depends_on=(TaskInstance, Department))
     def status_summary(self, request, pk=None):
         department = self.get_object()
         target_date_str = request.query_params.get('date', None)
@@ -181,7 +199,7 @@ class UserViewSet(viewsets.ModelViewSet):
         department_id = self.request.query_params.get('department_id')
         role = self.request.query_params.get('role') # e.g., 'staff'
 
-        queryset = User.objects.all()
+        queryset = User.objects.select_related('profile__department')
 
         if department_id:
             queryset = queryset.filter(profile__department_id=department_id)
@@ -216,19 +234,19 @@ class UserViewSet(viewsets.ModelViewSet):
 
         # Fallback to original role-based visibility if no specific query params are used
         if user.is_superuser:
-            return User.objects.all().distinct()
+            return queryset.distinct()
         
         try:
             user_profile = user.profile # Assumes related_name='profile'
             if user_profile.role == 'manager' and user_profile.department:
                 # Managers see users in their department
-                return User.objects.filter(profile__department=user_profile.department).distinct()
+                return queryset.filter(profile__department=user_profile.department).distinct()
             else:
                 # Staff (or managers without a department) see only themselves
-                return User.objects.filter(pk=user.pk).distinct()
+                return queryset.filter(pk=user.pk).distinct()
         except UserProfile.DoesNotExist:
             # If no profile, default to seeing only self
-            return User.objects.filter(pk=user.pk).distinct()
+            return queryset.filter(pk=user.pk).distinct()
 
     def perform_create(self, serializer):
         # The UserWithProfileSerializer.create() method now handles all the necessary logic
@@ -246,17 +264,18 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return UserProfile.objects.none()
 
+        profiles = UserProfile.objects.select_related('user', 'department')
         if user.is_superuser:
-            return UserProfile.objects.all()
+            return profiles
         
         try:
             user_profile = user.profile
             if user_profile.role == 'manager' and user_profile.department:
                 # Managers see profiles of users in their department
-                return UserProfile.objects.filter(department=user_profile.department)
+                return profiles.filter(department=user_profile.department)
             else:
                 # Staff (or managers without a department) see only their own profile
-                return UserProfile.objects.filter(user=user)
+                return profiles.filter(user=user)
         except UserProfile.DoesNotExist:
             return UserProfile.objects.none() # If requesting user has no profile, they see no profiles
 
@@ -286,17 +305,7 @@ class CleaningItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsManagerForWriteOrAuthenticatedReadOnly] # Apply new RBAC permission
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_superuser:
-            return CleaningItem.objects.all()
-        try:
-            user_profile = user.profile # Assumes related_name='profile' on UserProfile.user
-            if user_profile.department:
-                return CleaningItem.objects.filter(department=user_profile.department)
-        except UserProfile.DoesNotExist:
-            # No profile, should not happen for regular users if signals are working
-            pass # Fall through to return empty queryset
-        return CleaningItem.objects.none() # Default to empty if no department or profile
+        return CleaningItem.objects.for_user(self.request.user, self.request)
 
 from .recurrence_models import RecurringSchedule
 
@@ -404,24 +413,13 @@ class TaskInstanceViewSet(viewsets.ModelViewSet):
         # Fallback to default single task create
         return super().create(request, *args, **kwargs)
 
+    @conditional_response(TaskInstance, CleaningItem)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         user = self.request.user
-        base_qs = TaskInstance.objects.all()
-        if not user.is_superuser:
-            # Restrict by department/assignment first as before (we'll reapply filters later)
-            try:
-                user_profile = user.profile
-                if user_profile.role == 'manager' and user_profile.department:
-                    base_qs = base_qs.filter(department=user_profile.department)
-                elif user_profile.role == 'staff':
-                    if user_profile.department:
-                        base_qs = base_qs.filter(assigned_to=user_profile, department=user_profile.department)
-                    else:
-                        base_qs = base_qs.filter(assigned_to=user_profile)
-                else:
-                    base_qs = TaskInstance.objects.none()
-            except UserProfile.DoesNotExist:
-                base_qs = TaskInstance.objects.none()
+        base_qs = TaskInstance.objects.for_user(user, self.request)
         # Status filter: comma-separated list via ?status=pending,completed
         status_param = self.request.query_params.get('status')
         if status_param is not None:
@@ -430,24 +428,9 @@ class TaskInstanceViewSet(viewsets.ModelViewSet):
                 base_qs = base_qs.filter(status__in=status_values)
         else:
             # Default: for staff hide archived unless explicitly requested
-            if not user.is_superuser and getattr(user.profile, 'role', None) == 'staff':
+            if not user.is_superuser and get_auth_context(self.request).is_staff_member:
                 base_qs = base_qs.exclude(status='archived')
         return base_qs
-        try:
-            user_profile = user.profile
-            if user_profile.role == 'manager' and user_profile.department:
-                # Managers see tasks directly associated with their department
-                return TaskInstance.objects.filter(department=user_profile.department)
-            elif user_profile.role == 'staff':
-                # Staff see tasks assigned to them within their department
-                if user_profile.department:
-                    return TaskInstance.objects.filter(assigned_to=user_profile, department=user_profile.department)
-                else:
-                    # Staff without a department (should ideally not happen for active staff)
-                    return TaskInstance.objects.filter(assigned_to=user_profile) # Or none()
-        except UserProfile.DoesNotExist:
-            pass # Fall through to return empty queryset
-        return TaskInstance.objects.none() # Default to empty if no applicable conditions met
 
     def perform_create(self, serializer):
         # If a manager is creating a task, automatically set the task's department to the manager's department
@@ -468,19 +451,6 @@ class CompletionLogViewSet(viewsets.ModelViewSet):
     # permission_classes = [permissions.IsAuthenticated] # Old permission
     permission_classes = [CanLogCompletionAndManagerModify] # Apply RBAC permission
 
-    def get_queryset(self):
-        user = self.request.user
-        if user.is_superuser:
-            return CompletionLog.objects.all()
-        try:
-            user_profile = user.profile
-            if user_profile.department:
-                # Filter CompletionLogs whose related TaskInstance's CleaningItem belongs to the user's department
-                return CompletionLog.objects.filter(task_instance__cleaning_item__department=user_profile.department)
-        except UserProfile.DoesNotExist:
-            pass
-        return CompletionLog.objects.none()
-
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
@@ -503,21 +473,8 @@ class CompletionLogViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_superuser:
-            return CompletionLog.objects.all().order_by('-completed_at')
-        elif hasattr(user, 'profile') and user.profile.role == UserProfile.ROLE_MANAGER:
-            # Managers see logs for tasks in their department
-            manager_department = user.profile.department
-            if manager_department:
-                return CompletionLog.objects.filter(task_instance__cleaning_item__department=manager_department).order_by('-completed_at')
-            return CompletionLog.objects.none() # Manager not assigned to a department
-        elif hasattr(user, 'profile') and user.profile.role == UserProfile.ROLE_STAFF:
-            # Staff see logs they created or for tasks they are assigned to
-            # This might require more complex Q objects if 'assigned to' is a direct field on TaskInstance
-            # For now, let's assume they can see logs they created.
-            return CompletionLog.objects.filter(user=user).order_by('-completed_at')
-        return CompletionLog.objects.none()
+        # Managers see logs for tasks in their department; staff see logs they created
+        return CompletionLog.objects.for_user(self.request.user, self.request).order_by('-completed_at')
 
     def perform_create(self, serializer):
         # Automatically set the user to the request.user if not provided
@@ -617,6 +574,228 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
+class CacheStatsView(APIView):
+    """
+    Hit rate of the shared response cache for the current tenant, per
+    namespace. Managers and superusers can read; superusers can DELETE to
+    reset the counters.
+    """
+    permission_classes = [IsSuperUserWriteOrManagerRead]
+
+    def get(self, request):
+        namespaces = caching.stats()
+        hits = sum(n['hits'] for n in namespaces.values())
+        misses = sum(n['misses'] for n in namespaces.values())
+        return Response({
+            'backend': settings.CACHES['default']['BACKEND'],
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            'namespaces': namespaces,
+        })
+
+    def delete(self, request):
+        caching.reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RequestMetricsView(APIView):
+    """
+    Latency, query count, DB time and response size percentiles per route for
+    the current tenant (superusers only). DELETE clears the collected samples.
+    """
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response({
+            'slow_request_ms': settings.SLOW_REQUEST_MS,
+            'routes': instrumentation.summary(),
+        })
+
+    def delete(self, request):
+        instrumentation.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RequestProfileListView(APIView):
+    """
+    Request profiles stored for the current tenant, newest first (superusers
+    only). Profile a request with the ``X-Profile: 1`` header or
+    ``?__profile=1``; DELETE removes all stored profiles.
+    """
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response({
+            'sample_rate': settings.REQUEST_PROFILING_SAMPLE_RATE,
+            'interval_ms': settings.REQUEST_PROFILING_INTERVAL_MS,
+            'profiles': profiling.profiles(),
+        })
+
+    def delete(self, request):
+        profiling.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RequestProfileDownloadView(APIView):
+    """One stored profile as a collapsed-stack file for flamegraph.pl or speedscope."""
+    permission_classes = [IsSuperUser]
+
+    def get(self, request, profile_id):
+        profile = profiling.open_profile(profile_id)
+        if profile is None:
+            raise Http404('Profile not found.')
+        return FileResponse(profile, as_attachment=True, filename=f'{profile_id}.folded', content_type='text/plain')
+
+
+class MemoryProfileListView(APIView):
+    """
+    Memory profiles of the document ZIP download and bulk upload for the
+    current tenant, newest first (superusers only). Recorded while
+    MEMORY_PROFILING_ENABLED is on; PDF generation keeps its profile on the
+    GeneratedDocument. DELETE removes all stored profiles.
+    """
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response({
+            'enabled': settings.MEMORY_PROFILING_ENABLED,
+            'profiles': memory_profiling.profiles(),
+        })
+
+    def delete(self, request):
+        memory_profiling.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SlowQueryView(APIView):
+    """
+    Captured slow queries for the current tenant, by total time (superusers
+    only). ?order=max_ms or count changes the sort, ?limit the row count.
+    PUT {"threshold_ms": 200} changes the capture threshold for every worker
+    (0 turns capture off, null restores SLOW_QUERY_MS); DELETE clears the
+    captured queries.
+    """
+    permission_classes = [IsSuperUser]
+    ORDERINGS = {'total_ms', 'max_ms', 'count', 'last_seen'}
+
+    def get(self, request):
+        order = request.query_params.get('order', 'total_ms')
+        if order not in self.ORDERINGS:
+            return Response({'error': f"order must be one of {', '.join(sorted(self.ORDERINGS))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            # A negative slice would raise in the ORM instead of answering 400.
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, 500)
+        queries = SlowQuery.objects.order_by(f'-{order}').values(
+            'id', 'alias', 'route', 'caller', 'stack', 'fingerprint', 'params_shape', 'plan',
+            'count', 'total_ms', 'max_ms', 'first_seen', 'last_seen',
+        )[:limit]
+        return Response({
+            'threshold_ms': slow_queries.threshold_ms(),
+            'default_threshold_ms': settings.SLOW_QUERY_MS,
+            'queries': list(queries),
+        })
+
+    def put(self, request):
+        value = request.data.get('threshold_ms')
+        if value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = -1
+            if value < 0:
+                return Response({'error': 'threshold_ms must be a number >= 0 or null'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        slow_queries.set_threshold_ms(value)
+        return Response({'threshold_ms': slow_queries.threshold_ms()})
+
+    def delete(self, request):
+        SlowQuery.objects.all().delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DatabasePoolStatsView(APIView):
+    """Connection pool configuration and usage for this worker process (superusers only)."""
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return Response(db_pools.pool_stats())
+
+
+class ChangeFeedView(APIView):
+    """
+    Changes to tasks, completion logs, temperature logs and assignments in the
+    user's department (all departments for superusers); staff only get the
+    tasks, logs and assignments they own. Send Last-Event-ID
+    (EventSource does this on reconnect) or ?last_event_id= to get what was
+    missed. Browsers pass ``?token=``.
+
+    The ASGI URLconf mounts this with stream=True: a server-sent events
+    stream. Under WSGI a stream would hold a worker for its whole lifetime,
+    so the plain URLconf answers one short poll instead:
+    {"events": [...], "last_event_id": n, "resync": bool}. EventSource
+    requests there get a 503, so the client can fall back to polling.
+    """
+    authentication_classes = [QueryStringTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    permission_classes = [permissions.IsAuthenticated]
+    stream = False
+    POLL_SECONDS = 5
+
+    def perform_content_negotiation(self, request, force=False):
+        # EventSource sends Accept: text/event-stream, which no renderer
+        # matches; don't answer 406 before get() has picked the response.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        auth = get_auth_context(request)
+        if not auth.is_superuser and auth.department_id is None:
+            return Response({"error": "User has no department"}, status=status.HTTP_400_BAD_REQUEST)
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        last_seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        if not self.stream:
+            return self._poll(request, auth, last_seq)
+        response = StreamingHttpResponse(
+            events.stream_events(
+                caching.current_schema(),
+                None if auth.is_superuser else auth.department_id,
+                last_seq,
+                visible=functools.partial(events.visible_to, user=request.user, profile=auth.profile),
+            ),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _poll(self, request, auth, last_seq):
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            return Response(
+                {"error": "The event stream is only served by the ASGI deployment; poll this URL instead."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        found, last_seq, resync = events.read_since(
+            caching.current_schema(), None if auth.is_superuser else auth.department_id, last_seq,
+        )
+        response = Response({
+            'events': [
+                {'id': seq, **event} for seq, event in found
+                if events.visible_to(event, request.user, auth.profile)
+            ],
+            'last_event_id': last_seq,
+            'resync': resync,
+        })
+        response['Cache-Control'] = 'no-cache'
+        response['Retry-After'] = str(self.POLL_SECONDS)
+        return response
+
+
 # Thermometer Verification System Views
 
 class AreaUnitViewSet(viewsets.ModelViewSet):
@@ -628,21 +807,8 @@ class AreaUnitViewSet(viewsets.ModelViewSet):
     permission_classes = [IsManagerForWriteOrAuthenticatedReadOnly]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return AreaUnit.objects.none()
-        
-        if user.is_superuser:
-            return AreaUnit.objects.all()
-        
-        # Filter by user's department
-        try:
-            if user.profile and user.profile.department:
-                return AreaUnit.objects.filter(department=user.profile.department)
-            return AreaUnit.objects.none()
-        except AttributeError:
-            return AreaUnit.objects.none()
-    
+        return AreaUnit.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Ensure the area unit is created in the user's department
         if not self.request.user.is_superuser and hasattr(self.request.user, 'profile') and self.request.user.profile.department:
@@ -660,21 +826,8 @@ class ThermometerViewSet(viewsets.ModelViewSet):
     permission_classes = [IsThermometerVerificationStaff]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return Thermometer.objects.none()
-        
-        if user.is_superuser:
-            return Thermometer.objects.all()
-        
-        # Filter by user's department
-        try:
-            if user.profile and user.profile.department:
-                return Thermometer.objects.filter(department=user.profile.department)
-            return Thermometer.objects.none()
-        except AttributeError:
-            return Thermometer.objects.none()
-    
+        return Thermometer.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Ensure the thermometer is created in the user's department
         if not self.request.user.is_superuser and hasattr(self.request.user, 'profile') and self.request.user.profile.department:
@@ -701,6 +854,7 @@ class ThermometerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='verification-expiring-soon')
+    @conditional_response(Thermometer)
     def verification_expiring_soon(self, request):
         """
         Returns a list of thermometers with verification expiring within 7 days.
@@ -725,23 +879,8 @@ class ThermometerVerificationRecordViewSet(viewsets.ModelViewSet):
     permission_classes = [IsThermometerVerificationStaff]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return ThermometerVerificationRecord.objects.none()
-        
-        if user.is_superuser:
-            return ThermometerVerificationRecord.objects.all()
-        
-        # Filter by user's department
-        try:
-            if user.profile and user.profile.department:
-                return ThermometerVerificationRecord.objects.filter(
-                    thermometer__department=user.profile.department
-                )
-            return ThermometerVerificationRecord.objects.none()
-        except AttributeError:
-            return ThermometerVerificationRecord.objects.none()
-    
+        return ThermometerVerificationRecord.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Set the calibrated_by field to the current user if not provided
         thermometer = serializer.validated_data.get('thermometer')
@@ -766,29 +905,9 @@ class ThermometerVerificationAssignmentViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageThermometerAssignments]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return ThermometerVerificationAssignment.objects.none()
-        
-        if user.is_superuser:
-            return ThermometerVerificationAssignment.objects.all()
-        
-        # Filter by user's role and department
-        try:
-            if user.profile.role == 'manager' and user.profile.department:
-                # Managers can see all assignments in their department
-                return ThermometerVerificationAssignment.objects.filter(
-                    department=user.profile.department
-                )
-            elif user.profile.role == 'staff':
-                # Staff can only see their own assignments
-                return ThermometerVerificationAssignment.objects.filter(
-                    staff_member=user
-                )
-            return ThermometerVerificationAssignment.objects.none()
-        except AttributeError:
-            return ThermometerVerificationAssignment.objects.none()
-    
+        # Managers see their department's assignments; staff only their own
+        return ThermometerVerificationAssignment.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Set the assigned_by field to the current user if not provided
         # Ensure the assignment is created in the user's department
@@ -801,6 +920,7 @@ class ThermometerVerificationAssignmentViewSet(viewsets.ModelViewSet):
             serializer.save(assigned_by=self.request.user)
     
     @action(detail=False, methods=['get'], url_path='current-assignment')
+    @conditional_response(ThermometerVerificationAssignment)
     def current_assignment(self, request):
         """
         Returns the current active thermometer verification assignment for the user's department.
@@ -823,6 +943,7 @@ class ThermometerVerificationAssignmentViewSet(viewsets.ModelViewSet):
             return Response({"detail": "User profile not found."}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'], url_path='my-assignment')
+    @conditional_response(ThermometerVerificationAssignment)
     def my_assignment(self, request):
         """
         Returns the current active thermometer verification assignment for the requesting user.
@@ -851,29 +972,9 @@ class TemperatureCheckAssignmentViewSet(viewsets.ModelViewSet):
     permission_classes = [CanManageTemperatureCheckAssignments]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return TemperatureCheckAssignment.objects.none()
-        
-        if user.is_superuser:
-            return TemperatureCheckAssignment.objects.all()
-        
-        # Filter by user's role and department
-        try:
-            if user.profile.role == 'manager' and user.profile.department:
-                # Managers can see all assignments in their department
-                return TemperatureCheckAssignment.objects.filter(
-                    department=user.profile.department
-                )
-            elif user.profile.role == 'staff':
-                # Staff can only see their own assignments
-                return TemperatureCheckAssignment.objects.filter(
-                    staff_member=user
-                )
-            return TemperatureCheckAssignment.objects.none()
-        except AttributeError:
-            return TemperatureCheckAssignment.objects.none()
-    
+        # Managers see their department's assignments; staff only their own
+        return TemperatureCheckAssignment.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Set the assigned_by field to the current user if not provided
         # Ensure the assignment is created in the user's department
@@ -886,6 +987,7 @@ class TemperatureCheckAssignmentViewSet(viewsets.ModelViewSet):
             serializer.save(assigned_by=self.request.user)
     
     @action(detail=False, methods=['get'], url_path='current-assignments')
+    @conditional_response(TemperatureCheckAssignment)
     def current_assignments(self, request):
         """
         Returns the current active temperature check assignments for the user's department.
@@ -916,6 +1018,7 @@ class TemperatureCheckAssignmentViewSet(viewsets.ModelViewSet):
             return Response({"detail": "User profile not found."}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'], url_path='my-assignments')
+    @conditional_response(TemperatureCheckAssignment)
     def my_assignments(self, request):
         """
         Returns the current active temperature check assignments for the requesting user.
@@ -952,21 +1055,8 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
     permission_classes = [CanLogTemperatures]
     
     def get_queryset(self):
-        user = self.request.user
-        if not user.is_authenticated:
-            return TemperatureLog.objects.none()
-        
-        if user.is_superuser:
-            return TemperatureLog.objects.all()
-        
-        # Filter by user's department
-        try:
-            if user.profile and user.profile.department:
-                return TemperatureLog.objects.filter(department=user.profile.department)
-            return TemperatureLog.objects.none()
-        except AttributeError:
-            return TemperatureLog.objects.none()
-    
+        return TemperatureLog.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Set the logged_by field to the current user if not provided
         # Ensure the log is created in the user's department
@@ -1002,12 +1092,13 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
         """
         Returns temperature logs for the current day.
         """
-        today = timezone.now().date()
-        queryset = self.get_queryset().filter(log_datetime__date=today)
+        today = timezone.localdate()
+        queryset = self.get_queryset().on_dates(today)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
         
     @action(detail=False, methods=['get'], url_path='by-date/(?P<date>\d{4}-\d{2}-\d{2})')
+    @reporting_reads()
     def logs_by_date(self, request, date=None):
         """
         Returns temperature logs for a specific date.
@@ -1018,17 +1109,19 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
             parsed_date = datetime_date.fromisoformat(date)
             
             # Filter logs by the specified date
-            queryset = self.get_queryset().filter(log_datetime__date=parsed_date)
+            queryset = self.get_queryset().on_dates(parsed_date)
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
         except ValueError:
             return Response({"detail": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'], url_path='areas-with-status')
+    @conditional_response(TemperatureLog, AreaUnit)
+    @caching.cache_response('temperature-area-status', depends_on=(TemperatureLog, AreaUnit))
     def areas_with_status(self, request):
         """Get all areas with their logged status for the current day"""
         # Get the current date
-        today = timezone.now().date()
+        today = timezone.localdate()
         
         # Get the user's department
         user = request.user
@@ -1041,10 +1134,7 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
         area_units = AreaUnit.objects.filter(department_id=department_id)
         
         # Get today's logs for this department
-        today_logs = self.get_queryset().filter(
-            log_datetime__date=today,
-            department_id=department_id
-        )
+        today_logs = self.get_queryset().on_dates(today).filter(department_id=department_id)
         
         # Create a dictionary to track which areas have been logged for each time period
         logged_areas = {}
@@ -1081,6 +1171,7 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
         return Response(result)
 
     @action(detail=False, methods=['get'], url_path='manager-summary')
+    @caching.cache_response('temperature-area-status', depends_on=(TemperatureLog, AreaUnit))
     def manager_summary(self, request):
         """Get a summary of temperature logging status for managers"""
         # Get the user's department
@@ -1091,16 +1182,13 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
         department_id = user.profile.department.id
         
         # Get today's date
-        today = timezone.now().date()
+        today = timezone.localdate()
         
         # Get all area units for the department
         area_units = AreaUnit.objects.filter(department_id=department_id)
         
         # Get today's logs for this department
-        today_logs = self.get_queryset().filter(
-            log_datetime__date=today,
-            department_id=department_id
-        )
+        today_logs = self.get_queryset().on_dates(today).filter(department_id=department_id)
         
         # Prepare summary statistics
         total_areas = area_units.count()
@@ -1177,9 +1265,13 @@ class TemperatureLogViewSet(viewsets.ModelViewSet):
         
         return Response(result)
 
-from django.http import StreamingHttpResponse
+import shutil
+import tempfile
 from zipfile import ZipFile, ZIP_DEFLATED
-from io import BytesIO
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+# Archives up to this size are built in memory, larger ones spill to a temporary file.
+ZIP_SPOOL_BYTES = 1024 * 1024
 
 class DocumentViewSet(viewsets.ModelViewSet):
     """ViewSet for managing documents. Managers can upload/delete within their department; all authenticated users can view."""
@@ -1188,7 +1280,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        qs = Document.objects.all()
+        qs = Document.objects.select_related('department', 'folder', 'uploaded_by')
         # Optional filter by folder via query param
         folder_id = self.request.query_params.get('folder_id')
         if folder_id:
@@ -1204,6 +1296,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         serializer.save(uploaded_by=user, department=department or serializer.validated_data.get('department'))
 
     @action(detail=False, methods=['post'], url_path='bulk-download')
+    @memory_profiled
     def bulk_download(self, request):
         """Combine requested document files into a single ZIP and stream it back."""
         ids = request.data.get('ids', [])
@@ -1214,21 +1307,23 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not qs.exists():
             return Response({'detail': 'No documents found'}, status=status.HTTP_404_NOT_FOUND)
 
-        zip_buffer = BytesIO()
+        # Copy each file into the archive in chunks so memory doesn't grow
+        # with the number or size of the documents.
+        zip_buffer = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES)
         with ZipFile(zip_buffer, 'w', ZIP_DEFLATED) as zf:
             for doc in qs:
-                doc.file.open('rb')
-                data = doc.file.read()
-                doc.file.close()
                 filename = doc.file.name.split('/', 1)[-1]
-                zf.writestr(filename, data)
+                with doc.file.open('rb') as source, zf.open(filename, 'w', force_zip64=True) as target:
+                    shutil.copyfileobj(source, target)
         zip_buffer.seek(0)
-        resp = StreamingHttpResponse(zip_buffer, content_type='application/zip')
-        resp['Content-Disposition'] = 'attachment; filename="documents.zip"'
-        return resp
+        return FileResponse(zip_buffer, as_attachment=True, filename='documents.zip', content_type='application/zip')
 
     @action(detail=False, methods=['post'], url_path='bulk_upload')
+    @memory_profiled
     def bulk_upload(self, request):
+        # Spool every file to disk while parsing; the default handlers keep
+        # files under 2.5 MB in memory, which adds up across a large batch.
+        request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
         folder_id = request.data.get('folder_id')
         files = request.FILES.getlist('files')
         if not files:
@@ -1278,23 +1373,7 @@ class ReceivingRecordViewSet(viewsets.ReadOnlyModelViewSet):
         If the user has no department or the profile is missing, return an
         empty queryset to avoid leaking data.
         """
-        user = self.request.user
-        # Base queryset always comes from the traceability database
-        base_qs = ReceivingRecord.objects.using("traceability")
-
-        if not user.is_authenticated:
-            return base_qs.none()
-
-        if user.is_superuser:
-            return base_qs.all()
-
-        try:
-            dept = user.profile.department.name  # type: ignore[attr-defined]
-        except (AttributeError, UserProfile.DoesNotExist):
-            return base_qs.none()
-
-        # Limit to rows that mention the department name in storage_location
-        return base_qs.filter(storage_location__icontains=dept)
+        return ReceivingRecord.objects.for_user(self.request.user, self.request)
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -1307,14 +1386,8 @@ class SupplierViewSet(viewsets.ModelViewSet):
     permission_classes = [IsManagerForWriteOrAuthenticatedReadOnly]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.is_superuser:
-            return Supplier.objects.all()
-        elif hasattr(user, 'profile') and user.profile.department:
-            # Filter suppliers that have the user's department
-            return Supplier.objects.filter(departments=user.profile.department)
-        return Supplier.objects.none()
-    
+        return Supplier.objects.for_user(self.request.user, self.request)
+
     def perform_create(self, serializer):
         # Save the supplier first
         supplier = serializer.save()
@@ -0,0 +1,92 @@
+"""Compare the WSGI and ASGI serving profiles under concurrent load.
+
+Start the two servers against the same database, e.g.
+
+    gunicorn cleantrac_project.wsgi:application -w 2 -b 127.0.0.1:8001
+    gunicorn cleantrac_project.asgi:application -w 2 -k uvicorn.workers.UvicornWorker -b 127.0.0.1:8002
+
+then run
+
+    python scripts/loadtest_asgi_vs_wsgi.py --token <api token> \
+        --target wsgi=http://127.0.0.1:8001 --target asgi=http://127.0.0.1:8002
+
+Each target gets the same number of requests per endpoint at the same
+concurrency; the script prints throughput and latency percentiles side by
+side. Use --path to add endpoints (default: the receiving list). Only the
+standard library is used so it runs anywhere the API is reachable.
+"""
+
+import argparse
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PATHS = ["/api/receiving-records/"]
+
+
+def _fetch(url, token, timeout):
+    request = urllib.request.Request(url, headers={"Authorization": f"Token {token}"} if token else {})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = 200 <= response.status < 400
+    except (urllib.error.URLError, TimeoutError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run(base_url, path, token, requests, concurrency, timeout):
+    url = base_url.rstrip("/") + path
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _fetch(url, token, timeout), range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, ok in results if ok]
+    return {
+        "requests": requests,
+        "errors": sum(1 for _, ok in results if not ok),
+        "rps": requests / elapsed if elapsed else float("nan"),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", action="append", required=True, metavar="NAME=URL",
+                        help="Server to test, e.g. wsgi=http://127.0.0.1:8001. Repeat per server.")
+    parser.add_argument("--path", action="append", help="Endpoint path to hit. Repeatable.")
+    parser.add_argument("--token", help="API token sent as 'Authorization: Token ...'.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and target.")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent client threads.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds.")
+    args = parser.parse_args()
+
+    targets = [target.split("=", 1) for target in args.target]
+    header = f"{'endpoint':<40} {'target':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    for path in args.path or DEFAULT_PATHS:
+        for name, base_url in targets:
+            # One warm-up request so connection setup is not measured.
+            _fetch(base_url.rstrip("/") + path, args.token, args.timeout)
+            result = run(base_url, path, args.token, args.requests, args.concurrency, args.timeout)
+            print(f"{path:<40} {name:<8} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()